@@ -0,0 +1,86 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+class DecisionCache:
+    # Constants
+    CACHE_DIRECTORY = 'cache'
+    DEFAULT_MAX_ENTRIES = 100000
+
+    # Persistent cache of the ambiguity decisions of a pass, shared by all the conversions and all the runs.
+    # The decisions are keyed by the fingerprint of what they depend on (see fingerprint). The cache has a version: the digest
+    # of the files the decisions depend on (the rule workbooks and the script itself). When one of these files changes, the
+    # cache saved with the previous version is discarded. The least recently used decisions are evicted over max_entries.
+    def __init__(self, name, dependency_files, max_entries=DEFAULT_MAX_ENTRIES, log=print):
+        self.cache_file_name = os.path.join(self.CACHE_DIRECTORY, f"{name}_decisions.pkl")
+        self.max_entries = max_entries
+        self.log = log
+        self.version = self.compute_version(dependency_files)
+        self.entries = OrderedDict()
+
+        self.hit_count = 0
+        self.miss_count = 0
+        self.evicted_count = 0
+        self.invalidated_count = 0
+
+        self.load()
+
+    # Digest of the content of the files. A missing file is skipped with a warning; its name is part of the digest, so the
+    # cache is discarded when the file is added.
+    def compute_version(self, dependency_files):
+        digest = hashlib.sha256()
+        for dependency_file in dependency_files:
+            if not os.path.exists(dependency_file):
+                self.log(f"Warning: the cache dependency '{dependency_file}' does not exist. It is not part of the cache version.")
+                digest.update(f"missing:{dependency_file}".encode('utf-8'))
+                continue
+            with open(dependency_file, 'rb') as file:
+                digest.update(hashlib.sha256(file.read()).digest())
+        return digest.hexdigest()
+
+    # Fingerprint of the values a decision depends on (strings, numbers and nested tuples/lists of them)
+    @staticmethod
+    def fingerprint(*values):
+        return hashlib.sha1(repr(values).encode('utf-8')).digest()
+
+    def load(self):
+        if not os.path.exists(self.cache_file_name):
+            return
+        try:
+            with open(self.cache_file_name, 'rb') as file:
+                version, entries = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return
+        if version != self.version:
+            self.invalidated_count = len(entries)
+            return
+        self.entries = entries
+
+    # Saved to a temporary file first, so an interrupted run does not leave a truncated cache
+    def save(self):
+        os.makedirs(self.CACHE_DIRECTORY, exist_ok=True)
+        temporary_file_name = self.cache_file_name + '.tmp'
+        with open(temporary_file_name, 'wb') as file:
+            pickle.dump((self.version, self.entries), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_file_name, self.cache_file_name)
+
+    def get(self, key):
+        decision = self.entries.get(key)
+        if decision is None:
+            self.miss_count += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hit_count += 1
+        return decision
+
+    def put(self, key, decision):
+        self.entries[key] = decision
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evicted_count += 1
+
+    def statistics(self):
+        return (f"{self.hit_count} hits, {self.miss_count} misses, {len(self.entries)} decisions cached, {self.evicted_count} evicted, "
+                f"{self.invalidated_count} invalidated by a change of the rules.")
@@ -0,0 +1,559 @@
+import argparse
+import datetime
+import json
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from xml.sax.saxutils import escape, quoteattr
+
+class ConversionMapXsltExporter:
+    # Constants
+    XPATH_SEPARATOR = '/'
+    XSLT_NAMESPACE = 'http://www.w3.org/1999/XSL/Transform'
+    SOURCE_PREFIX = 's'
+    XSLT_DIRECTORY = 'conversion_maps/xslt'
+
+    # A node of a path with its predicates. Example: Address[AddressTypeCode='ST']
+    NODE_PATTERN = re.compile(r"[^/\[]+(?:\[[^\]]*\])*")
+    PREDICATE_PATTERN = re.compile(r"\[([^=\]]+)='([^']*)'\]")
+
+    def __init__(self, conversion_map, source_namespace=None, log=False):
+        self.conversion_map = conversion_map
+        self.source_namespace = source_namespace
+        self.log_enabled = log
+
+        # Create the file name with the timestamp
+        current_time = datetime.datetime.now()
+        self.timestamp = current_time.strftime("%Y%m%d_%H%M%S")
+        self.log_file_name = f"logfile_{self.timestamp}.log"
+        os.makedirs('log', exist_ok=True)
+
+        # The stylesheets are saved apart from the generated maps
+        os.makedirs(self.XSLT_DIRECTORY, exist_ok=True)
+        map_name = os.path.splitext(os.path.basename(conversion_map))[0]
+        self.xslt_output_file_name = os.path.join(self.XSLT_DIRECTORY, f'{map_name}.xsl')
+
+        with open(conversion_map, 'r') as file:
+            self.map = json.load(file)
+
+        self.build_model()
+
+    def log(self, message):
+        if self.log_enabled:
+            with open('log/' + self.log_file_name, 'a') as f:
+                print(message, file=f)
+        print(message)
+
+    # Split a path into its nodes, keeping the predicates with their node.
+    # Example:
+    # Input: ShippingLabel/Header/Address[AddressTypeCode='ST']/AddressName
+    # Output: ['ShippingLabel', 'Header', "Address[AddressTypeCode='ST']", 'AddressName']
+    @classmethod
+    def split_path(cls, xpath):
+        return cls.NODE_PATTERN.findall(xpath)
+
+    # Name of a node without its predicates
+    @staticmethod
+    def node_name(node):
+        return node.split('[', 1)[0]
+
+    # Predicates of a node as a list of (qualifier, value)
+    @classmethod
+    def node_predicates(cls, node):
+        return cls.PREDICATE_PATTERN.findall(node)
+
+    # Simplify the xpath by removing the predicate.
+    def remove_predicate(self, xpath):
+        return re.sub(r'\[.*?\]', '', xpath)
+
+    # The groups of the map are the entries that are the ancestor of another entry, once the predicates are removed (the other 
+    # entries are the fields). Return the groups without their predicates.
+    # Example:
+    # Input: ['ShippingLabel/Header/Address', "ShippingLabel/Header/Address[AddressTypeCode='ST']/AddressName"]
+    # Output: {'ShippingLabel', 'ShippingLabel/Header', 'ShippingLabel/Header/Address'}
+    def get_group_paths(self, source_paths):
+        group_paths = set()
+        for source_path in source_paths:
+            nodes = self.split_path(self.remove_predicate(source_path))
+            for depth in range(1, len(nodes)):
+                group_paths.add(self.XPATH_SEPARATOR.join(nodes[:depth]))
+        return group_paths
+
+    def new_tree_node(self, node):
+        tree_node = {'id': len(self.tree_nodes), 'node': node, 'rules': OrderedDict(), 'children': OrderedDict()}
+        self.tree_nodes.append(tree_node)
+        return tree_node
+
+    # A context is a source group mapped to a target group: the template of the group creates the target element once for each
+    # source element, and the entries of the context are output inside it. Their relative target paths form the tree of the
+    # context, so the target elements they share (e.g. OrderLevel) are created once.
+    def new_context(self, source_nodes, target_nodes):
+        context = {'id': len(self.contexts), 'source': source_nodes, 'target': target_nodes, 'tree': self.new_tree_node(None), 'qualifier_tests': OrderedDict()}
+        self.contexts.append(context)
+        self.contexts_by_source.setdefault(tuple(self.node_name(node) for node in source_nodes), []).append(context)
+        return context
+
+    # If a path is under a context path (its nodes can have predicates that the context nodes do not have), return its nodes
+    # from the first one having such predicates down to the position of the context node: the pattern tested on the context
+    # element. Return None if the path is not under the context path.
+    # Example:
+    # Input: ['ShippingLabel', 'Header', 'Address', 'Contacts'],
+    #        ['ShippingLabel', 'Header', "Address[AddressTypeCode='ST']", 'Contacts', 'ContactName']
+    # Output: ["Address[AddressTypeCode='ST']", 'Contacts']
+    def get_context_pattern(self, context_nodes, nodes):
+        if len(nodes) < len(context_nodes):
+            return None
+        first_predicated_depth = None
+        for depth, context_node in enumerate(context_nodes):
+            if nodes[depth] == context_node:
+                continue
+            if self.node_name(nodes[depth]) != context_node or '[' in context_node:
+                return None
+            if first_predicated_depth is None:
+                first_predicated_depth = depth
+        return [] if first_predicated_depth is None else nodes[first_predicated_depth:len(context_nodes)]
+
+    # Find the context of an entry: the deepest source group above the source path whose target group contains the target path
+    # (the root context if nothing closer). Return (context, source context pattern, target context node), the target context
+    # node being the node of the target path at the position of the context node when it has predicates that the context node
+    # does not have (None otherwise).
+    def find_context(self, source_nodes, target_nodes):
+        source_names = tuple(self.node_name(node) for node in source_nodes)
+        for depth in range(len(source_nodes) - 1, 1, -1):
+            found = None
+            for context in self.contexts_by_source.get(source_names[:depth], []):
+                if found is not None and len(context['target']) <= len(found[0]['target']):
+                    continue
+                source_context_pattern = self.get_context_pattern(context['source'], source_nodes)
+                target_context_pattern = self.get_context_pattern(context['target'], target_nodes)
+                if source_context_pattern is not None and target_context_pattern is not None:
+                    target_context_node = target_nodes[len(context['target']) - 1]
+                    found = (context, source_context_pattern, target_context_node if target_context_node != context['target'][-1] else None)
+            if found is not None:
+                return found
+        return (self.root_context, [], None)
+
+    # Add an entry to the tree of its context. The rules of a node of the tree are the templates of its mode: they match the
+    # source elements of the entries and create the target node. output is ('field', None) or ('group', context of the group).
+    def add_rule(self, source_nodes, target_nodes, output):
+        context, source_context_pattern, target_context_node = self.find_context(source_nodes, target_nodes)
+        relative_source = source_nodes[len(context['source']):]
+        tree_node = context['tree']
+        for node in target_nodes[len(context['target']):]:
+            if node not in tree_node['children']:
+                tree_node['children'][node] = self.new_tree_node(node)
+            tree_node = tree_node['children'][node]
+
+        # The predicates of the context node and its ancestors are tested on the context element
+        # (e.g. Address[AddressTypeCode='ST']/AddressName)
+        pattern = source_context_pattern + relative_source
+        key = self.XPATH_SEPARATOR.join(pattern)
+        if key not in tree_node['rules']:
+            # Predicated patterns win over the normalized ones when both match (like the generated maps expect)
+            priority = sum(len(self.node_predicates(node)) for node in pattern)
+            tree_node['rules'][key] = {'pattern': pattern, 'select': (tuple(source_context_pattern), tuple(relative_source)), 'priority': priority, 'outputs': []}
+        tree_node['rules'][key]['outputs'].append(output)
+
+        # The target predicates of the context node are written as qualifiers in the target element of the context when the
+        # source element has the source predicates
+        if len(source_context_pattern) > 0 and target_context_node is not None:
+            context['qualifier_tests'].setdefault(tuple(source_context_pattern), OrderedDict()).update(self.node_predicates(target_context_node))
+
+    # Build the model shared by the stylesheet and the pure-Python application of the map.
+    # Each (source group, target group) pair of the group entries is a context. The entries (fields and groups) are added to
+    # the tree of the deepest context above them.
+    def build_model(self):
+        self.contexts = []
+        self.contexts_by_source = {}
+        self.tree_nodes = []
+        source_paths = list(self.map.keys())
+        group_paths = self.get_group_paths(source_paths)
+        first_target_path = next(target_paths[0] for target_paths in self.map.values() if len(target_paths) > 0)
+        self.root_context = self.new_context(self.split_path(source_paths[0])[:1], self.split_path(first_target_path)[:1])
+
+        entries = []
+        for source_path in source_paths:
+            source_nodes = self.split_path(source_path)
+            is_group = self.remove_predicate(source_path) in group_paths
+            for target_path in self.map[source_path]:
+                target_nodes = self.split_path(target_path)
+                if source_nodes[:1] != self.root_context['source'] or target_nodes[:1] != self.root_context['target']:
+                    self.log(f"Skipping '{source_path}' => '{target_path}': not under '{self.root_context['source'][0]}' => '{self.root_context['target'][0]}'.")
+                    continue
+                # The root group is the root context
+                if len(source_nodes) > 1:
+                    entries.append((source_nodes, target_nodes, is_group))
+
+        # First create the contexts of all the groups, so the context of an entry can be found whatever the order of the map
+        group_contexts = {}
+        for source_nodes, target_nodes, is_group in entries:
+            if is_group:
+                group_contexts[(tuple(source_nodes), tuple(target_nodes))] = self.new_context(source_nodes, target_nodes)
+
+        # Then add the entries to the tree of their context, in the order of the map
+        for source_nodes, target_nodes, is_group in entries:
+            output = ('group', group_contexts[(tuple(source_nodes), tuple(target_nodes))]) if is_group else ('field', None)
+            self.add_rule(source_nodes, target_nodes, output)
+
+    # Rules of the descendants of a node of a tree
+    def get_subtree_rules(self, tree_node):
+        rules = []
+        for child in tree_node['children'].values():
+            rules += list(child['rules'].values()) + self.get_subtree_rules(child)
+        return rules
+
+    # Qualifiers written in a created target element: the predicates of its node, except the qualifiers created by its children
+    def get_written_qualifiers(self, node, child_tree_nodes):
+        child_names = {self.node_name(child_node) for child_node in child_tree_nodes}
+        return [(qualifier, value) for qualifier, value in self.node_predicates(node) if qualifier not in child_names]
+
+    # Qualifiers written in the target element of a context for each source context pattern
+    def get_qualifier_tests(self, context):
+        child_names = {self.node_name(child_node) for child_node in context['tree']['children']}
+        qualifier_tests = []
+        for source_context_pattern, predicates in context['qualifier_tests'].items():
+            qualifiers = [(qualifier, value) for qualifier, value in predicates.items() if qualifier not in child_names]
+            if len(qualifiers) > 0:
+                qualifier_tests.append((source_context_pattern, qualifiers))
+        return qualifier_tests
+
+    # XPath of source nodes (with the source namespace prefix if any)
+    def source_xpath(self, nodes):
+        if self.source_namespace is None:
+            return self.XPATH_SEPARATOR.join(nodes)
+        prefixed_nodes = []
+        for node in nodes:
+            prefixed_node = f"{self.SOURCE_PREFIX}:{self.node_name(node)}"
+            for qualifier, value in self.node_predicates(node):
+                prefixed_node += f"[{self.SOURCE_PREFIX}:{qualifier}='{value}']"
+            prefixed_nodes.append(prefixed_node)
+        return self.XPATH_SEPARATOR.join(prefixed_nodes)
+
+    # XPath testing a source context pattern on the context element
+    # Example:
+    # Input: ["Address[AddressTypeCode='ST']", 'Contacts']
+    # Output: self::Contacts[parent::Address[AddressTypeCode='ST']]
+    def context_xpath(self, source_context_pattern):
+        xpath = f"self::{self.source_xpath(source_context_pattern[-1:])}"
+        if len(source_context_pattern) > 1:
+            xpath += '[' + self.XPATH_SEPARATOR.join(f"parent::{self.source_xpath([node])}" for node in reversed(source_context_pattern[:-1])) + ']'
+        return xpath
+
+    # XPath selecting the source elements of a rule from the context element
+    def select_xpath(self, select):
+        source_context_pattern, relative_source = select
+        if len(source_context_pattern) == 0:
+            return self.source_xpath(relative_source)
+        return f"{self.context_xpath(source_context_pattern)}/{self.source_xpath(relative_source)}"
+
+    # Templates of a node of a tree: one apply-templates in the mode of the node selects all its source elements in document order
+    def output_apply_templates(self, lines, tree_node, indent):
+        if len(tree_node['rules']) == 0:
+            return
+        select = ' | '.join(self.select_xpath(rule['select']) for rule in tree_node['rules'].values())
+        lines.append(f'{indent}<xsl:apply-templates select={quoteattr(select)} mode="m{tree_node["id"]}"/>')
+
+    def output_element_start(self, lines, node, child_tree_nodes, indent):
+        lines.append(f'{indent}<{self.node_name(node)}>')
+        for qualifier, value in self.get_written_qualifiers(node, child_tree_nodes):
+            lines.append(f'{indent}\t<{qualifier}>{escape(value)}</{qualifier}>')
+
+    # A target node shared by the entries below it is created once, if at least one of their source elements exists
+    def output_tree_node(self, lines, tree_node, indent):
+        self.output_apply_templates(lines, tree_node, indent)
+        if len(tree_node['children']) == 0:
+            return
+        test = ' | '.join(OrderedDict.fromkeys(self.select_xpath(rule['select']) for rule in self.get_subtree_rules(tree_node)))
+        lines.append(f'{indent}<xsl:if test={quoteattr(test)}>')
+        self.output_element_start(lines, tree_node['node'], tree_node['children'], indent + '\t')
+        for child_node in tree_node['children'].values():
+            self.output_tree_node(lines, child_node, indent + '\t\t')
+        lines.append(f'{indent}\t</{self.node_name(tree_node["node"])}>')
+        lines.append(f'{indent}</xsl:if>')
+
+    # Content of the target element of a context
+    def output_context(self, lines, context, indent):
+        for source_context_pattern, qualifiers in self.get_qualifier_tests(context):
+            lines.append(f'{indent}<xsl:if test={quoteattr(self.context_xpath(source_context_pattern))}>')
+            for qualifier, value in qualifiers:
+                lines.append(f'{indent}\t<{qualifier}>{escape(value)}</{qualifier}>')
+            lines.append(f'{indent}</xsl:if>')
+        self.output_apply_templates(lines, context['tree'], indent)
+        for child_node in context['tree']['children'].values():
+            self.output_tree_node(lines, child_node, indent)
+
+    def output_rule_template(self, lines, tree_node, rule):
+        lines.append(f'\t<xsl:template match={quoteattr(self.source_xpath(rule["pattern"]))} mode="m{tree_node["id"]}" priority="{rule["priority"]}">')
+        for output_type, context in rule['outputs']:
+            # The entries mapped to the target of their context output in the target element of the context
+            if tree_node['node'] is None:
+                if output_type == 'field':
+                    lines.append('\t\t<xsl:value-of select="."/>')
+                else:
+                    self.output_context(lines, context, '\t\t')
+                continue
+            self.output_element_start(lines, tree_node['node'], context['tree']['children'] if output_type == 'group' else [], '\t\t')
+            if output_type == 'field':
+                lines.append('\t\t\t<xsl:value-of select="."/>')
+            else:
+                self.output_context(lines, context, '\t\t\t')
+            lines.append(f'\t\t</{self.node_name(tree_node["node"])}>')
+        lines.append('\t</xsl:template>')
+
+    # Compile the map into an XSLT 1.0 stylesheet
+    def to_xslt(self):
+        namespaces = f'xmlns:xsl="{self.XSLT_NAMESPACE}"'
+        if self.source_namespace is not None:
+            namespaces += f' xmlns:{self.SOURCE_PREFIX}={quoteattr(self.source_namespace)} exclude-result-prefixes="{self.SOURCE_PREFIX}"'
+
+        root_target_name = self.node_name(self.root_context['target'][0])
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 f'<xsl:stylesheet version="1.0" {namespaces}>',
+                 '\t<xsl:output method="xml" encoding="UTF-8" indent="no"/>',
+                 '\t<xsl:strip-space elements="*"/>',
+                 f'\t<xsl:template match="/{self.source_xpath(self.root_context["source"])}">',
+                 f'\t\t<{root_target_name}>']
+        self.output_context(lines, self.root_context, '\t\t\t')
+        lines.append(f'\t\t</{root_target_name}>')
+        lines.append('\t</xsl:template>')
+        for tree_node in self.tree_nodes:
+            for rule in tree_node['rules'].values():
+                self.output_rule_template(lines, tree_node, rule)
+        # Nothing else is output
+        lines.append('\t<xsl:template match="text()"/>')
+        lines.append('</xsl:stylesheet>')
+        return '\n'.join(lines) + '\n'
+
+    # Main processing function
+    def process(self):
+        self.log(f"Exporting '{self.conversion_map}' to XSLT.")
+        with open(self.xslt_output_file_name, 'w') as file:
+            file.write(self.to_xslt())
+        self.log(f"{len(self.contexts)} groups, {sum(len(tree_node['rules']) for tree_node in self.tree_nodes)} templates.")
+        self.log(f"Processing complete. Results saved to '{self.xslt_output_file_name}'.")
+
+class PythonMapApplier:
+    # Pure-Python application of the model of a ConversionMapXsltExporter. It follows the stylesheet semantics: the source
+    # elements of a node of a tree are processed in document order and the rule with the highest priority (the last one if
+    # equal) is applied.
+    def __init__(self, exporter):
+        self.exporter = exporter
+        self.source_namespace = exporter.source_namespace
+
+        # Name and predicates of each node of the patterns
+        self.parsed_nodes = {}
+
+        self.subtree_selects = {}
+        for tree_node in exporter.tree_nodes:
+            self.subtree_selects[tree_node['id']] = list(OrderedDict.fromkeys(rule['select'] for rule in exporter.get_subtree_rules(tree_node)))
+
+    def local_name(self, element):
+        if self.source_namespace is None:
+            return element.tag
+        return element.tag[len(self.source_namespace) + 2:] if element.tag.startswith('{') else element.tag
+
+    def child_value(self, element, name):
+        for child in element:
+            if self.local_name(child) == name:
+                return ''.join(child.itertext())
+        return None
+
+    def node_matches(self, element, node):
+        if node not in self.parsed_nodes:
+            self.parsed_nodes[node] = (self.exporter.node_name(node), self.exporter.node_predicates(node))
+        name, predicates = self.parsed_nodes[node]
+        if self.local_name(element) != name:
+            return False
+        return all(self.child_value(element, qualifier) == value for qualifier, value in predicates)
+
+    # Match a pattern from its last node, going up the ancestors of the element
+    def pattern_matches(self, ancestors, element, pattern):
+        if not self.node_matches(element, pattern[-1]):
+            return False
+        for position in range(2, len(pattern) + 1):
+            if position - 1 > len(ancestors) or not self.node_matches(ancestors[-(position - 1)], pattern[-position]):
+                return False
+        return True
+
+    # Source elements selected from the context element by a union of selects, in document order, with their ancestors.
+    # Only the first one if first_only (to test if there is one).
+    def select(self, selects, ancestors, context_element, first_only=False):
+        # The same context patterns are tested once
+        context_pattern_matches = {(): True}
+        relative_sources = []
+        for source_context_pattern, relative_source in selects:
+            if source_context_pattern not in context_pattern_matches:
+                context_pattern_matches[source_context_pattern] = self.pattern_matches(ancestors, context_element, source_context_pattern)
+            if context_pattern_matches[source_context_pattern]:
+                relative_sources.append(relative_source)
+        selected = []
+        if len(relative_sources) > 0:
+            self.select_descendants(relative_sources, ancestors + [context_element], [], context_element, selected, first_only)
+        return selected
+
+    # Only the children matching the next node of a relative source are walked
+    def select_descendants(self, relative_sources, ancestors, path, element, selected, first_only):
+        depth = len(path)
+        for child in element:
+            if not isinstance(child.tag, str):
+                continue
+            matching_sources = [relative_source for relative_source in relative_sources if self.node_matches(child, relative_source[depth])]
+            if len(matching_sources) == 0:
+                continue
+            if any(len(relative_source) == depth + 1 for relative_source in matching_sources):
+                selected.append((child, ancestors + path))
+                if first_only:
+                    return
+            deeper_sources = [relative_source for relative_source in matching_sources if len(relative_source) > depth + 1]
+            if len(deeper_sources) > 0:
+                self.select_descendants(deeper_sources, ancestors, path + [child], child, selected, first_only)
+                if first_only and len(selected) > 0:
+                    return
+
+    def select_rule(self, rules, ancestors, element):
+        selected_rule = None
+        for rule in rules:
+            if self.pattern_matches(ancestors, element, rule['pattern']):
+                if selected_rule is None or rule['priority'] >= selected_rule['priority']:
+                    selected_rule = rule
+        return selected_rule
+
+    # Add a text node at the end of an element
+    @staticmethod
+    def append_text(element, text):
+        if len(element) > 0:
+            element[-1].tail = (element[-1].tail or '') + text
+        else:
+            element.text = (element.text or '') + text
+
+    def create_element(self, target_parent, node, child_tree_nodes):
+        target_element = ET.SubElement(target_parent, self.exporter.node_name(node))
+        for qualifier, value in self.exporter.get_written_qualifiers(node, child_tree_nodes):
+            ET.SubElement(target_element, qualifier).text = value
+        return target_element
+
+    def apply(self, source_document):
+        source_root = source_document.getroot() if hasattr(source_document, 'getroot') else source_document
+        root_context = self.exporter.root_context
+        target_root = ET.Element(self.exporter.node_name(root_context['target'][0]))
+        if self.node_matches(source_root, root_context['source'][0]):
+            self.apply_context(root_context, [], source_root, target_root)
+        return target_root
+
+    def apply_context(self, context, ancestors, element, target_element):
+        for source_context_pattern, qualifiers in self.exporter.get_qualifier_tests(context):
+            if self.pattern_matches(ancestors, element, source_context_pattern):
+                for qualifier, value in qualifiers:
+                    ET.SubElement(target_element, qualifier).text = value
+        self.apply_rules(context['tree'], ancestors, element, target_element)
+        for child_node in context['tree']['children'].values():
+            self.apply_tree_node(child_node, ancestors, element, target_element)
+
+    def apply_tree_node(self, tree_node, ancestors, element, target_parent):
+        self.apply_rules(tree_node, ancestors, element, target_parent)
+        if len(tree_node['children']) == 0 or len(self.select(self.subtree_selects[tree_node['id']], ancestors, element, first_only=True)) == 0:
+            return
+        target_element = self.create_element(target_parent, tree_node['node'], tree_node['children'])
+        for child_node in tree_node['children'].values():
+            self.apply_tree_node(child_node, ancestors, element, target_element)
+
+    def apply_rules(self, tree_node, ancestors, element, target_parent):
+        if len(tree_node['rules']) == 0:
+            return
+        rules = list(tree_node['rules'].values())
+        for selected_element, selected_ancestors in self.select([rule['select'] for rule in rules], ancestors, element):
+            rule = self.select_rule(rules, selected_ancestors, selected_element)
+            for output_type, context in rule['outputs']:
+                target_element = target_parent
+                if tree_node['node'] is not None:
+                    target_element = self.create_element(target_parent, tree_node['node'], context['tree']['children'] if output_type == 'group' else [])
+                if output_type == 'field':
+                    self.append_text(target_element, ''.join(selected_element.itertext()))
+                else:
+                    self.apply_context(context, selected_ancestors, selected_element, target_element)
+
+# Generate a sample source document having all the fields of the map. The top level groups are repeated "repetitions" times.
+# The qualifiers of the predicated groups get the value of the predicate, the other fields get a generated value.
+def generate_sample_document(exporter, repetitions):
+    template = OrderedDict()
+    for source_path in exporter.map.keys():
+        node = template
+        for source_node in exporter.split_path(source_path):
+            node = node.setdefault(source_node, OrderedDict())
+
+    root_name, root_children = next(iter(template.items()))
+    root = ET.Element(exporter.node_name(root_name))
+    for repetition in range(repetitions):
+        for name, children in root_children.items():
+            generate_sample_element(exporter, root, name, children, repetition)
+    return ET.ElementTree(root)
+
+def generate_sample_element(exporter, parent, node, children, repetition):
+    element = ET.SubElement(parent, exporter.node_name(node))
+    predicates = OrderedDict(exporter.node_predicates(node))
+    for qualifier, value in predicates.items():
+        if not any(exporter.node_name(child) == qualifier for child in children):
+            ET.SubElement(element, qualifier).text = value
+    if len(children) == 0:
+        element.text = f'{exporter.node_name(node)}-{repetition}'
+        return
+    for child, grand_children in children.items():
+        child_name = exporter.node_name(child)
+        if child_name in predicates and len(grand_children) == 0:
+            ET.SubElement(element, child_name).text = predicates[child_name]
+        else:
+            generate_sample_element(exporter, element, child, grand_children, repetition)
+
+# Compare the throughput of the stylesheet (libxslt through lxml) with the pure-Python application of the same map
+def benchmark(exporter, documents, repetitions):
+    # Import here so the export does not depend on lxml
+    from lxml import etree
+
+    exporter.log(f"Benchmarking '{exporter.conversion_map}' on {documents} generated documents ({repetitions} repetitions of the top level groups)...")
+    sample_documents = [generate_sample_document(exporter, repetitions) for _ in range(documents)]
+    sample_bytes = [ET.tostring(document.getroot()) for document in sample_documents]
+    lxml_documents = [etree.fromstring(document_bytes) for document_bytes in sample_bytes]
+    total_megabytes = sum(len(document_bytes) for document_bytes in sample_bytes) / (1024 * 1024)
+
+    transform = etree.XSLT(etree.fromstring(exporter.to_xslt().encode('utf-8')))
+    applier = PythonMapApplier(exporter)
+
+    start = time.perf_counter()
+    xslt_results = [transform(document) for document in lxml_documents]
+    xslt_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    python_results = [applier.apply(document) for document in sample_documents]
+    python_seconds = time.perf_counter() - start
+
+    # Both must produce the same documents, otherwise the throughput of the stylesheet is meaningless. The pure-Python result
+    # is serialized by lxml too, so both serializations only differ by their content.
+    for document_bytes, xslt_result, python_result in zip(sample_bytes, xslt_results, python_results):
+        xslt_bytes = etree.tostring(xslt_result.getroot())
+        python_bytes = etree.tostring(etree.fromstring(ET.tostring(python_result)))
+        if xslt_bytes != python_bytes:
+            exporter.log(f"Source document:\n{document_bytes.decode('utf-8')}")
+            exporter.log(f"Stylesheet result:\n{xslt_bytes.decode('utf-8')}")
+            exporter.log(f"Pure-Python result:\n{python_bytes.decode('utf-8')}")
+            raise ValueError(f"The stylesheet and the pure-Python application of '{exporter.conversion_map}' produce different documents (see above).")
+
+    exporter.log(f"XSLT (lxml):  {xslt_seconds:.3f} s, {documents / xslt_seconds:.1f} documents/s, {total_megabytes / xslt_seconds:.2f} MB/s")
+    exporter.log(f"Pure Python: {python_seconds:.3f} s, {documents / python_seconds:.1f} documents/s, {total_megabytes / python_seconds:.2f} MB/s")
+    exporter.log(f"Speedup: {python_seconds / xslt_seconds:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export a conversion map generated by generates_pria_conversion_maps.py to an XSLT 1.0 stylesheet.')
+    parser.add_argument('conversion_map', type=str, help='Path to the JSON conversion map, e.g., conversion_maps/shippinglabel_3.0_to_shipment_7.7_conversion_v9.json')
+    parser.add_argument('--source_namespace', type=str, default=None, help='Namespace of the source documents if any (default: None)')
+    parser.add_argument('--benchmark', action='store_true', default=False, help='Compare the stylesheet with a pure-Python application of the map on generated documents. Needs lxml. (default: False)')
+    parser.add_argument('--documents', type=int, default=20, help='Number of generated documents for the benchmark (default: 20)')
+    parser.add_argument('--repetitions', type=int, default=5, help='Number of times the top level groups are repeated in the generated documents (default: 5)')
+    parser.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
+    args = parser.parse_args()
+
+    exporter = ConversionMapXsltExporter(args.conversion_map, args.source_namespace, args.log)
+    exporter.process()
+    if args.benchmark:
+        benchmark(exporter, args.documents, args.repetitions)
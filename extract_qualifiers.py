@@ -1,13 +1,7 @@
+import argparse
+import os
 import xml.etree.ElementTree as ET
 
-# Define the nodes we are interested in
-# Prompt for the XSD schema, the Business Object Name and the Business Object description
-path_to_your_list_of_paths = input("Enter the path to your file containing the possible list of qualifiers: ")
-qual_name = input("Enter the name of the qualifier you are extracting (for then name of the output file): ")
-
-# Specify the input and output file names
-output_file = 'qualifiers_extracts/' + qual_name + '.txt'
-
 def transform_string(s):
     # Uppercase the string
     s = s.upper()
@@ -49,6 +43,23 @@ def process_xml_file(input_file, output_file):
         # Recursively extract documentation values from the root element
         extract_documentation_values(root, file)
 
+# Extract the qualifiers of the file to qualifiers_extracts/<qual_name>.txt. Return an error message, or None.
+def extract_qualifiers(path_to_your_list_of_paths, qual_name):
+    # Specify the output file name
+    output_file = 'qualifiers_extracts/' + qual_name + '.txt'
+    os.makedirs('qualifiers_extracts', exist_ok=True)
+    return process_xml_file(path_to_your_list_of_paths, output_file)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Extract the qualifier values documented in an XSD file. The missing arguments are prompted for.')
+    parser.add_argument('qualifier_file', type=str, nargs='?', default=None, help='Path to your file containing the possible list of qualifiers')
+    parser.add_argument('qualifier_name', type=str, nargs='?', default=None, help='Name of the qualifier you are extracting (for the name of the output file)')
+    args = parser.parse_args()
+
+    # Prompt for the values that are not given on the command line
+    path_to_your_list_of_paths = args.qualifier_file if args.qualifier_file is not None else input("Enter the path to your file containing the possible list of qualifiers: ")
+    qual_name = args.qualifier_name if args.qualifier_name is not None else input("Enter the name of the qualifier you are extracting (for then name of the output file): ")
 
-# Call the function with the input and output file names
-process_xml_file(path_to_your_list_of_paths, output_file)
+    error = extract_qualifiers(path_to_your_list_of_paths, qual_name)
+    if error is not None:
+        print(error)
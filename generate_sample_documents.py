@@ -0,0 +1,359 @@
+import argparse
+import datetime
+import json
+import os
+import random
+import re
+import time
+import xml.etree.ElementTree as ET
+from multiprocessing import Pool
+from xml.sax.saxutils import escape
+
+# Generator used by each worker process (see init_worker)
+worker_generator = None
+# XML schema used by each worker process to validate the documents, if requested
+worker_schema = None
+
+# An element of the content model: a leaf (leaf_type is its XSD type) or a group of particles. A particle is
+# (ELEMENT, element model, minOccurs, maxOccurs) or (CHOICE, list of element particles, minOccurs, maxOccurs), maxOccurs
+# being None when unbounded. The qualifiers are the predicates of a source path (map models only): they are written as the
+# first children of the element.
+class ElementModel:
+    __slots__ = ('name', 'leaf_type', 'min_length', 'max_length', 'particles', 'qualifiers', 'children_by_node')
+
+    def __init__(self, name):
+        self.name = name
+        self.leaf_type = None
+        self.min_length = None
+        self.max_length = None
+        self.particles = []
+        self.qualifiers = []
+        self.children_by_node = {}
+
+class SampleDocumentGenerator:
+    # Constants
+    XSD_NAMESPACE = '{http://www.w3.org/2001/XMLSchema}'
+    XPATH_SEPARATOR = '/'
+    ELEMENT = 'element'
+    CHOICE = 'choice'
+    STRING_TYPE = 'xs:string'
+
+    # The levels whose repetition is tuned, with their names in the target schema and in the source canonicals
+    ORDER_LEVEL_NODES = ['OrderLevel']
+    PACK_LEVEL_NODES = ['PackLevel', 'Pallet', 'Pack']
+    ITEM_LEVEL_NODES = ['ItemLevel', 'Item']
+
+    QUALIFIERS_DIRECTORY = 'qualifiers_extracts'
+    SAMPLES_DIRECTORY = 'samples'
+
+    # Same splitting as the other scripts: on the separators that are not inside a predicate
+    SEPARATOR_PATTERN = re.compile(r"/(?![^\[]*\])")
+    PREDICATE_PATTERN = re.compile(r"\[([^=\]]+)='([^']*)'\]")
+
+    # Generate sample documents of a schema, for load testing the conversions and the consumers of the maps.
+    # The schema is an XSD (e.g. xsd/Shipments.xsd) or a JSON conversion map, whose source paths describe the source canonical
+    # (e.g. ShippingLabel 3.0): the predicates of the source paths become qualifier elements with their values.
+    # The size of the documents is tuned by the number of OrderLevel, PackLevel and ItemLevel under each parent level, the
+    # number of repetitions of the other repeatable elements and the share of optional elements that are written.
+    # The leaves named like a qualifier of qualifiers_extracts/ (e.g. WeightQualifier) get one of its values.
+    # The documents are written by a pool of processes, each document streamed to its own file: the memory does not depend
+    # on the size of the documents. The content of a document only depends on the seed and on its number.
+    def __init__(self, schema, root=None, namespace=None, order_levels=2, pack_levels=2, item_levels=3, repetitions=1, optional_rate=0.5, seed=0, log=False):
+        self.schema = schema
+        self.namespace = namespace
+        self.optional_rate = optional_rate
+        self.repetitions = repetitions
+        self.seed = seed
+        self.log_enabled = log
+
+        self.level_repetitions = {}
+        for nodes, level_repetitions in [(self.ORDER_LEVEL_NODES, order_levels), (self.PACK_LEVEL_NODES, pack_levels), (self.ITEM_LEVEL_NODES, item_levels)]:
+            for node in nodes:
+                self.level_repetitions[node] = level_repetitions
+        # Order of preference of the levels in a choice (e.g. OrderLevel or PackLevel or ItemLevel under Shipment)
+        self.level_order = self.ORDER_LEVEL_NODES + self.PACK_LEVEL_NODES + self.ITEM_LEVEL_NODES
+
+        # Create the file name with the timestamp
+        current_time = datetime.datetime.now()
+        self.timestamp = current_time.strftime("%Y%m%d_%H%M%S")
+        self.log_file_name = f"logfile_{self.timestamp}.log"
+        os.makedirs('log', exist_ok=True)
+
+        self.qualifier_values = self.load_qualifier_values()
+
+        self.element_count = 0
+        if schema.lower().endswith('.json'):
+            self.root_model = self.load_map_model(schema)
+        else:
+            self.global_declarations = {}
+            self.global_models = {}
+            self.root_model = self.load_xsd_model(schema, root)
+
+        schema_name = os.path.splitext(os.path.basename(schema))[0]
+        self.output_directory = os.path.join(self.SAMPLES_DIRECTORY, schema_name)
+
+    def log(self, message):
+        if self.log_enabled:
+            with open('log/' + self.log_file_name, 'a') as f:
+                print(message, file=f)
+        print(message)
+
+    # Values of each qualifier of qualifiers_extracts/ (the enumeration values of its XML file)
+    def load_qualifier_values(self):
+        qualifier_values = {}
+        if not os.path.isdir(self.QUALIFIERS_DIRECTORY):
+            return qualifier_values
+        for file_name in sorted(os.listdir(self.QUALIFIERS_DIRECTORY)):
+            if not file_name.endswith('.xml'):
+                continue
+            values = [element.get('value') for element in ET.parse(os.path.join(self.QUALIFIERS_DIRECTORY, file_name)).getroot().iter('enumeration')]
+            values = [value for value in values if value]
+            if len(values) > 0:
+                qualifier_values[os.path.splitext(file_name)[0]] = values
+        return qualifier_values
+
+    def load_xsd_model(self, xsd_file, root):
+        schema = ET.parse(xsd_file).getroot()
+        if self.namespace is None:
+            self.namespace = schema.get('targetNamespace')
+        for element in schema.findall(f'{self.XSD_NAMESPACE}element'):
+            self.global_declarations[element.get('name')] = element
+        if root is None:
+            root = next(iter(self.global_declarations))
+        if root not in self.global_declarations:
+            raise ValueError(f"The element '{root}' is not a global element of '{xsd_file}'. Global elements: {', '.join(self.global_declarations)}.")
+        return self.get_global_model(root)
+
+    def get_global_model(self, name):
+        if name not in self.global_models:
+            # Registered before it is parsed, because it can reference itself
+            model = ElementModel(name)
+            self.global_models[name] = model
+            self.fill_element_model(model, self.global_declarations[name])
+        return self.global_models[name]
+
+    def fill_element_model(self, model, element):
+        self.element_count += 1
+        complex_type = element.find(f'{self.XSD_NAMESPACE}complexType')
+        if complex_type is not None:
+            model.particles = self.parse_particles(complex_type)
+            return
+
+        model.leaf_type = element.get('type', self.STRING_TYPE)
+        restriction = element.find(f'{self.XSD_NAMESPACE}simpleType/{self.XSD_NAMESPACE}restriction')
+        if restriction is not None:
+            model.leaf_type = restriction.get('base', self.STRING_TYPE)
+            min_length = restriction.find(f'{self.XSD_NAMESPACE}minLength')
+            max_length = restriction.find(f'{self.XSD_NAMESPACE}maxLength')
+            model.min_length = int(min_length.get('value')) if min_length is not None else None
+            model.max_length = int(max_length.get('value')) if max_length is not None else None
+
+    @staticmethod
+    def occurrences(node):
+        max_occurs = node.get('maxOccurs', '1')
+        return int(node.get('minOccurs', '1')), None if max_occurs == 'unbounded' else int(max_occurs)
+
+    # Particles of a content model. The sequences are flattened; the choices are kept.
+    def parse_particles(self, node):
+        particles = []
+        for child in node:
+            if child.tag == f'{self.XSD_NAMESPACE}element':
+                if child.get('ref') is not None:
+                    model = self.get_global_model(child.get('ref'))
+                else:
+                    model = ElementModel(child.get('name'))
+                    self.fill_element_model(model, child)
+                particles.append((self.ELEMENT, model, *self.occurrences(child)))
+            elif child.tag in (f'{self.XSD_NAMESPACE}sequence', f'{self.XSD_NAMESPACE}all'):
+                particles += self.parse_particles(child)
+            elif child.tag == f'{self.XSD_NAMESPACE}choice':
+                particles.append((self.CHOICE, self.parse_particles(child), *self.occurrences(child)))
+        return particles
+
+    # Content model of the source canonical of a conversion map, built from its source paths. Each distinct node of a path
+    # (with its predicate) is an optional element; the levels can be repeated.
+    def load_map_model(self, conversion_map):
+        with open(conversion_map, 'r') as file:
+            source_paths = list(json.load(file).keys())
+
+        root_model = None
+        for source_path in source_paths:
+            nodes = self.SEPARATOR_PATTERN.split(source_path)
+            if root_model is None:
+                root_model = ElementModel(nodes[0])
+                self.element_count += 1
+            elif nodes[0] != root_model.name:
+                raise ValueError(f"The source paths of '{conversion_map}' have more than one root: '{root_model.name}' and '{nodes[0]}'.")
+
+            model = root_model
+            for node in nodes[1:]:
+                if node not in model.children_by_node:
+                    child = ElementModel(node.split('[', 1)[0])
+                    child.qualifiers = self.PREDICATE_PATTERN.findall(node)
+                    model.children_by_node[node] = child
+                    max_occurs = None if child.name in self.level_repetitions else 1
+                    model.particles.append((self.ELEMENT, child, 0, max_occurs))
+                    self.element_count += 1
+                model = model.children_by_node[node]
+
+        def set_leaf_types(model):
+            if len(model.particles) == 0:
+                model.leaf_type = self.STRING_TYPE
+            for _, child, _, _ in model.particles:
+                set_leaf_types(child)
+        set_leaf_types(root_model)
+        return root_model
+
+    # Value of a leaf
+    def leaf_value(self, model, generator_random):
+        if model.name in self.qualifier_values:
+            return generator_random.choice(self.qualifier_values[model.name])
+        leaf_type = model.leaf_type
+        if leaf_type == 'xs:decimal':
+            return f"{generator_random.uniform(1, 1000):.2f}"
+        if leaf_type in ('xs:int', 'xs:integer'):
+            return str(generator_random.randint(1, 1000))
+        if leaf_type == 'xs:date':
+            return (datetime.date(2020, 1, 1) + datetime.timedelta(days=generator_random.randint(0, 2000))).isoformat()
+        if leaf_type == 'xs:time':
+            return f"{generator_random.randint(0, 23):02d}:{generator_random.randint(0, 59):02d}:{generator_random.randint(0, 59):02d}"
+        if leaf_type == 'xs:boolean':
+            return generator_random.choice(['true', 'false'])
+        value = f"{model.name}{generator_random.randint(1, 99999)}"
+        if model.max_length is not None:
+            value = value[:model.max_length]
+        if model.min_length is not None and len(value) < model.min_length:
+            value = value.ljust(model.min_length, 'X')
+        return value
+
+    # Number of times an element is written
+    def element_repetitions(self, model, min_occurs, max_occurs, generator_random):
+        if model.name in self.level_repetitions:
+            count = self.level_repetitions[model.name]
+        elif min_occurs == 0 and generator_random.random() >= self.optional_rate:
+            count = 0
+        else:
+            count = self.repetitions if max_occurs is None else 1
+        count = max(count, min_occurs)
+        return count if max_occurs is None else min(count, max_occurs)
+
+    # Option of a choice: the preferred level that is not already an ancestor (so the levels go down, e.g. Shipment,
+    # OrderLevel, PackLevel, ItemLevel) or, if the choice is required, its first option that is not an ancestor.
+    # ancestors are the models of the elements being written.
+    def choose(self, options, min_occurs, ancestors):
+        ancestor_names = {ancestor.name for ancestor in ancestors}
+        for level in self.level_order:
+            if self.level_repetitions[level] == 0 or level in ancestor_names:
+                continue
+            for option in options:
+                if option[1].name == level:
+                    return option
+        if min_occurs > 0:
+            for option in options:
+                if option[1].name not in ancestor_names:
+                    return option
+        return None
+
+    def write_element(self, file, model, ancestors, generator_random, namespace_declaration=''):
+        indentation = '\t' * len(ancestors)
+        if model.leaf_type is not None:
+            file.write(f"{indentation}<{model.name}>{escape(self.leaf_value(model, generator_random))}</{model.name}>\n")
+            return
+
+        file.write(f"{indentation}<{model.name}{namespace_declaration}>\n")
+        ancestors = ancestors + (model,)
+        qualifier_names = set()
+        for qualifier_name, qualifier_value in model.qualifiers:
+            file.write(f"{indentation}\t<{qualifier_name}>{escape(qualifier_value)}</{qualifier_name}>\n")
+            qualifier_names.add(qualifier_name)
+        for kind, content, min_occurs, max_occurs in model.particles:
+            if kind == self.CHOICE:
+                particle = self.choose(content, min_occurs, ancestors)
+                if particle is None:
+                    continue
+                _, child, min_occurs, max_occurs = particle
+            else:
+                child = content
+            # A global element is not written again under itself (e.g. PackLevel under ItemLevel under PackLevel)
+            if child.name in qualifier_names or any(child is ancestor for ancestor in ancestors):
+                continue
+            for _ in range(self.element_repetitions(child, min_occurs, max_occurs, generator_random)):
+                self.write_element(file, child, ancestors, generator_random)
+        file.write(f"{indentation}</{model.name}>\n")
+
+    # Write one document. Return the name of its file.
+    def write_document(self, document_number):
+        generator_random = random.Random(f"{self.seed}-{document_number}")
+        file_name = os.path.join(self.output_directory, f"{self.root_model.name}_{document_number:06d}.xml")
+        namespace_declaration = f' xmlns="{self.namespace}"' if self.namespace else ''
+        with open(file_name, 'w', encoding='utf-8') as file:
+            file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            self.write_element(file, self.root_model, (), generator_random, namespace_declaration)
+        return file_name
+
+    # Main processing function
+    def process(self, documents, processes=None, validate=False):
+        os.makedirs(self.output_directory, exist_ok=True)
+        self.log(f"Generating {documents} documents of '{self.schema}' ({self.element_count} element declarations) to '{self.output_directory}'.")
+        self.log("...")
+
+        start = time.perf_counter()
+        total_bytes = 0
+        invalid_count = 0
+        initargs = (self.schema, self.root_model.name, self.namespace, self.level_repetitions[self.ORDER_LEVEL_NODES[0]], self.level_repetitions[self.PACK_LEVEL_NODES[0]],
+                    self.level_repetitions[self.ITEM_LEVEL_NODES[0]], self.repetitions, self.optional_rate, self.seed, validate)
+        with Pool(processes, initializer=init_worker, initargs=initargs) as pool:
+            for file_name, file_bytes, error in pool.imap_unordered(generate_document, range(documents), chunksize=4):
+                total_bytes += file_bytes
+                if error is not None:
+                    invalid_count += 1
+                    self.log(f"Invalid document '{file_name}': {error}")
+        seconds = time.perf_counter() - start
+
+        self.log("...")
+        if validate:
+            self.log(f"{documents - invalid_count} documents valid, {invalid_count} invalid.")
+        self.log(f"{documents} documents, {total_bytes / 1e6:.2f} MB ({total_bytes / 1e3 / max(documents, 1):.0f} KB per document) in {seconds:.2f} s: "
+                 f"{documents / seconds:.1f} documents/s, {total_bytes / 1e6 / seconds:.2f} MB/s.")
+        self.log(f"Processing complete. Results saved to '{self.output_directory}'.")
+
+def init_worker(schema, root, namespace, order_levels, pack_levels, item_levels, repetitions, optional_rate, seed, validate):
+    global worker_generator, worker_schema
+    worker_generator = SampleDocumentGenerator(schema, root, namespace, order_levels, pack_levels, item_levels, repetitions, optional_rate, seed)
+    if validate:
+        # Import here so the generator does not depend on lxml
+        from lxml import etree
+        worker_schema = etree.XMLSchema(etree.parse(schema))
+
+# Write one document in a worker process. Return (file name, size in bytes, validation error or None).
+def generate_document(document_number):
+    file_name = worker_generator.write_document(document_number)
+    error = None
+    if worker_schema is not None:
+        from lxml import etree
+        if not worker_schema.validate(etree.parse(file_name)):
+            error = str(worker_schema.error_log.last_error)
+    return file_name, os.path.getsize(file_name), error
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate sample documents of an XSD schema or of the source canonical of a conversion map, for load testing.')
+    parser.add_argument('schema', type=str, help='XSD schema (e.g., xsd/Shipments.xsd) or JSON conversion map whose source paths describe the source canonical')
+    parser.add_argument('--documents', type=int, default=10, help='Number of documents (default: 10)')
+    parser.add_argument('--root', type=str, default=None, help='Root element of the documents, for an XSD schema (default: its first global element)')
+    parser.add_argument('--namespace', type=str, default=None, help='Namespace of the documents (default: the target namespace of the XSD schema, none for a conversion map)')
+    parser.add_argument('--order_levels', type=int, default=2, help='Number of OrderLevel under each parent level (default: 2)')
+    parser.add_argument('--pack_levels', type=int, default=2, help='Number of PackLevel (Pack, Pallet) under each parent level (default: 2)')
+    parser.add_argument('--item_levels', type=int, default=3, help='Number of ItemLevel (Item) under each parent level (default: 3)')
+    parser.add_argument('--repetitions', type=int, default=1, help='Number of repetitions of the other repeatable elements (default: 1)')
+    parser.add_argument('--optional_rate', type=float, default=0.5, help='Share of the optional elements written (default: 0.5)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random values (default: 0)')
+    parser.add_argument('--processes', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--validate', action='store_true', default=False, help='Validate each document against the XSD schema. Needs lxml. (default: False)')
+    parser.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
+    args = parser.parse_args()
+
+    if args.validate and args.schema.lower().endswith('.json'):
+        parser.error("--validate needs an XSD schema")
+
+    generator = SampleDocumentGenerator(args.schema, args.root, args.namespace, args.order_levels, args.pack_levels, args.item_levels, args.repetitions, args.optional_rate, args.seed, args.log)
+    generator.process(args.documents, args.processes, args.validate)
@@ -5,6 +5,10 @@ import re
 import pandas as pd
 import argparse
 from collections import OrderedDict
+from itertools import product
+from keystone_report_reader import KeystoneReportReader
+from minimize_conversion_map import ConversionMapMinimizer
+from sqlite_report_store import SqliteReportStore
 
 # Set the display options
 pd.set_option('display.max_rows', None)
@@ -23,13 +27,21 @@ class PRIAConversionMapGenerator:
     DO_GROUP_NEEDS_PREDICATES_COLUMN = 'GROUP_NEEDS_PREDICATES'
     GROUP_IS_SELECTED_COLUMN = 'GROUP_IS_SELECTED'
 
-    def __init__(self, augmented_keystone_report, source, target, run_test=True, log=False, generate_csv=False):
+    XPATH_SEPARATOR = '/'
+
+    # Split a path on the separators that are not inside a predicate
+    SEPARATOR_PATTERN = re.compile(r"/(?![^\[]*\])")
+
+    def __init__(self, augmented_keystone_report, source, target, run_test=True, log=False, generate_csv=False, streaming=False, sqlite=False, minimize=False):
         self.non_ambiguous_keystone_report = augmented_keystone_report
         self.source = source
         self.target = target
         self.run_test = run_test
         self.log = log
         self.generate_csv = generate_csv
+        self.streaming = streaming
+        self.sqlite = sqlite
+        self.minimize = minimize
 
         self.log_message("Initializing dataframes...")
 
@@ -48,21 +60,32 @@ class PRIAConversionMapGenerator:
         # Load the data. The data is assumed to be in an Excel file with the columns 'SOURCE_PATH', 'TARGET_PATH', 'IS_SELECTED', and 'DO NOT MAP'.
         # You will obtain this file by running the script select_default_conversions_pass1.py on the Keystone report first, and then 
         # select_group_default_conversions_pass3.py that will run on the file generated by the first script.
-        self.df = pd.read_excel(augmented_keystone_report)
-
-        # Create a new dataframe that contains only the groups that need predicates. If a group is in this dataframe, it means that the group needs 
-        # to use qualifiers.
-        self.group_needs_predicate = self.df[(self.df[self.DO_GROUP_NEEDS_PREDICATES_COLUMN] == "YES") & (self.df[self.GROUP_IS_SELECTED_COLUMN] == "YES")]
-
-        # Create working dataframes. This is the data that will be used to generate the conversion maps. It filtered out the rows that are not selected,
-        # IS_SELECTED_COLUMN: Indicate the row that is selected among the group of rows that have the same source path.
-        # DO_NOT_MAP_CULUMN: Indicate the row that should not be mapped. This occurs when we chose a normalized path instead of a qualified path. 
-        #                    In this case, we don't map the qualifier (for instance).
-        # GROUP_IS_SELECTED_COLUMN: All groups are marked with this flag. If a group is used among the selected field, it will be marked as selected.
-        self.selected_df = self.df[(self.df[self.IS_SELECTED_COLUMN] == "YES") & (self.df[self.DO_NOT_MAP_COLUMN] != 'DO NOT MAP') & (self.df[self.GROUP_IS_SELECTED_COLUMN] == "YES")]
-        
-        # Just the field now
-        self.selected_field_df = self.selected_df[(self.selected_df[self.TYPE_COLUMN] != self.TYPE_COLUMN_VALUE_GROUP)]
+        if self.sqlite:
+            # The report is loaded in an on-disk database. The selected groups are read one at a time when generating the conversion
+            # maps. The groups that need predicates (see parent_group_needs_predicate and get_ancestors_needing_predicate) and the
+            # predicated fields (see get_predicated_groups) are queried from the database: nothing else is kept in memory.
+            self.report_store = SqliteReportStore(augmented_keystone_report)
+        elif self.streaming:
+            # The report is not loaded in memory. The groups of the report will be read one at a time when generating the conversion
+            # maps. We only keep the rows needed to add the predicates (see load_predicate_rows).
+            self.keystone_report_reader = KeystoneReportReader(augmented_keystone_report)
+            self.load_predicate_rows()
+        else:
+            self.df = pd.read_excel(augmented_keystone_report)
+
+            # Create a new dataframe that contains only the groups that need predicates. If a group is in this dataframe, it means that the group needs 
+            # to use qualifiers.
+            self.group_needs_predicate = self.df[(self.df[self.DO_GROUP_NEEDS_PREDICATES_COLUMN] == "YES") & (self.df[self.GROUP_IS_SELECTED_COLUMN] == "YES")]
+
+            # Create working dataframes. This is the data that will be used to generate the conversion maps. It filtered out the rows that are not selected,
+            # IS_SELECTED_COLUMN: Indicate the row that is selected among the group of rows that have the same source path.
+            # DO_NOT_MAP_CULUMN: Indicate the row that should not be mapped. This occurs when we chose a normalized path instead of a qualified path. 
+            #                    In this case, we don't map the qualifier (for instance).
+            # GROUP_IS_SELECTED_COLUMN: All groups are marked with this flag. If a group is used among the selected field, it will be marked as selected.
+            self.selected_df = self.select_rows(self.df)
+            
+            # Just the field now
+            self.selected_field_df = self.selected_df[(self.selected_df[self.TYPE_COLUMN] != self.TYPE_COLUMN_VALUE_GROUP)]
 
         # Because we are simplyfing the xpath (removong predicate when we can), we need to check if the xpath is already processed. We will use a 
         # set to store the processed values.
@@ -71,9 +94,43 @@ class PRIAConversionMapGenerator:
         
         self.node_not_output = set()
 
+        # The expansion of a predicated group only depends on the (source, target) ancestor pair needing predicate. We will
+        # compute it once per pair and keep it as a tuple of (predicated source, predicated target) tuples.
+        self.predicated_groups_cache = {}
+
         self.log_message("...")
 
 
+    # Keep the rows that are selected to generate the conversion maps (see the description of the columns in __init__).
+    def select_rows(self, df):
+        return df[(df[self.IS_SELECTED_COLUMN] == "YES") & (df[self.DO_NOT_MAP_COLUMN] != 'DO NOT MAP') & (df[self.GROUP_IS_SELECTED_COLUMN] == "YES")]
+
+    # SQL condition of the rows selected to generate the conversion maps (same as select_rows)
+    def selected_rows_condition(self):
+        return (f"{self.IS_SELECTED_COLUMN} = 'YES' AND {self.report_store.quote(self.DO_NOT_MAP_COLUMN)} IS NOT 'DO NOT MAP' AND "
+                f"{self.GROUP_IS_SELECTED_COLUMN} = 'YES'")
+
+    # SQL condition of the groups that need predicates (same as group_needs_predicate)
+    def group_needs_predicate_condition(self):
+        return f"{self.DO_GROUP_NEEDS_PREDICATES_COLUMN} = 'YES' AND {self.GROUP_IS_SELECTED_COLUMN} = 'YES'"
+
+    # Streaming mode only: read the report once to keep the groups that need predicates and the selected fields having a predicate.
+    # Those are the only rows used by "process_group" outside of the group being processed ("get_predicated_groups" only looks for 
+    # predicated fields), so the memory depends on the number of qualified fields and not on the size of the report.
+    def load_predicate_rows(self):
+        group_needs_predicate_rows = []
+        selected_field_rows = []
+        for record in self.keystone_report_reader.iter_records():
+            if record[self.DO_GROUP_NEEDS_PREDICATES_COLUMN] == "YES" and record[self.GROUP_IS_SELECTED_COLUMN] == "YES":
+                group_needs_predicate_rows.append(record)
+            if (record[self.IS_SELECTED_COLUMN] == "YES" and record[self.DO_NOT_MAP_COLUMN] != 'DO NOT MAP' and record[self.GROUP_IS_SELECTED_COLUMN] == "YES" and
+                record[self.TYPE_COLUMN] != self.TYPE_COLUMN_VALUE_GROUP and '[' in str(record[self.SOURCE_COLUMN])):
+                selected_field_rows.append(record)
+
+        columns = self.keystone_report_reader.columns
+        self.group_needs_predicate = pd.DataFrame(group_needs_predicate_rows, columns=columns)
+        self.selected_field_df = pd.DataFrame(selected_field_rows, columns=columns)
+
     def log_message(self, message):
         if self.log:
             with open('log/' + self.log_file_name, 'a') as f:
@@ -151,6 +208,146 @@ class PRIAConversionMapGenerator:
         # Check if the compared XPath is an ancestor
         return column_xpath == compared_xpath
 
+    # Is the parent of a predicated field, once its predicates are removed, a group needing predicate (see predicate_is_needed).
+    # In SQLite mode, the parent is looked up with the index on the source path.
+    def parent_group_needs_predicate(self, source_value):
+        if self.sqlite:
+            if '[' not in source_value:
+                return False
+            parent_xpath = self.extract_ancestor_xpath(self.remove_predicate(source_value), 1)
+            return self.report_store.execute(f'''
+                SELECT EXISTS (SELECT 1 FROM {self.report_store.TABLE}
+                               WHERE {self.SOURCE_COLUMN} = ? AND {self.group_needs_predicate_condition()})''', (parent_xpath,)).fetchone()[0] == 1
+        return self.group_needs_predicate[self.SOURCE_COLUMN].apply(lambda x: self.predicate_is_needed(x, source_value)).any()
+
+    # Return the (source, target) paths of the groups needing predicate that are an ancestor of a field (see is_ancestor), in
+    # the order of the report. In SQLite mode, the ancestors are the source paths that are a prefix of the field's ancestor path:
+    # each prefix is looked up with the index on the source path.
+    def get_ancestors_needing_predicate(self, source_value):
+        if self.sqlite:
+            ancestor_xpath = self.extract_ancestor_xpath(source_value, 2 if '[' in source_value else 1)
+            return self.report_store.execute(f'''
+                WITH RECURSIVE prefix_lengths(length) AS (SELECT 1 UNION ALL SELECT length + 1 FROM prefix_lengths WHERE length < LENGTH(?1))
+                SELECT {self.SOURCE_COLUMN}, {self.TARGET_COLUMN} FROM {self.report_store.TABLE}
+                WHERE {self.SOURCE_COLUMN} IN (SELECT SUBSTR(?1, 1, length) FROM prefix_lengths) AND {self.group_needs_predicate_condition()}
+                ORDER BY {self.report_store.ROW_ID_COLUMN}''', (ancestor_xpath,)).fetchall()
+        need_predicate_boolean_mask = self.group_needs_predicate[self.SOURCE_COLUMN].apply(lambda x: self.is_ancestor(x, source_value))
+        applicable_predicated_group_df = self.group_needs_predicate[need_predicate_boolean_mask]
+        return list(zip(applicable_predicated_group_df[self.SOURCE_COLUMN], applicable_predicated_group_df[self.TARGET_COLUMN]))
+
+    # Source paths of the groups needing predicate, without duplicates, in the order of the report
+    def get_group_needing_predicate_sources(self):
+        if self.sqlite:
+            rows = self.report_store.execute(f'''
+                SELECT {self.SOURCE_COLUMN} FROM {self.report_store.TABLE}
+                WHERE {self.group_needs_predicate_condition()} ORDER BY {self.report_store.ROW_ID_COLUMN}''')
+            source_values = [source_value for source_value, in rows]
+        else:
+            source_values = self.group_needs_predicate[self.SOURCE_COLUMN]
+        return list(OrderedDict.fromkeys(source_values))
+
+    # Return the list of predicated (source, target) paths of a group needing predicate. 
+    # Example: 
+    # Input: PackingSlip/Header/References, Shipment/Header/References
+    # Output: (("PackingSlip/Header/References[ReferenceQual='BL']", "Shipment/Header/References[ReferenceQual='BL']"), ...)
+    def get_predicated_groups(self, source_ancestor_needing_predicate, target_ancestor_needing_predicate):
+        key = (source_ancestor_needing_predicate, target_ancestor_needing_predicate)
+        if key in self.predicated_groups_cache:
+            return self.predicated_groups_cache[key]
+
+        # Filter the selected fields to only include the children of the predicated group. In SQLite mode, the prefixes are
+        # searched with the indexes on the source and target paths.
+        if self.sqlite:
+            predicated_fields = self.report_store.execute(f'''
+                SELECT {self.SOURCE_COLUMN}, {self.TARGET_COLUMN} FROM {self.report_store.TABLE}
+                WHERE {self.selected_rows_condition()} AND {self.TYPE_COLUMN} IS NOT '{self.TYPE_COLUMN_VALUE_GROUP}'
+                      AND {self.SOURCE_COLUMN} >= ? AND {self.SOURCE_COLUMN} < ? AND {self.TARGET_COLUMN} >= ? AND {self.TARGET_COLUMN} < ?
+                ORDER BY {self.report_store.ROW_ID_COLUMN}''',
+                (source_ancestor_needing_predicate + '[', source_ancestor_needing_predicate + '[' + self.report_store.PREFIX_END,
+                 target_ancestor_needing_predicate + '[', target_ancestor_needing_predicate + '[' + self.report_store.PREFIX_END)).fetchall()
+        else:
+            temp_df_predicated_groups = self.selected_field_df[
+                (self.selected_field_df[self.SOURCE_COLUMN].str.startswith(source_ancestor_needing_predicate + '[')) & 
+                (self.selected_field_df[self.TARGET_COLUMN].str.startswith(target_ancestor_needing_predicate + '['))
+            ]
+            predicated_fields = zip(temp_df_predicated_groups[self.SOURCE_COLUMN], temp_df_predicated_groups[self.TARGET_COLUMN])
+
+        # Remove the last node from the source path (the field), so the last node will become the predicate. Because we 
+        # removed the fields, we created duplicates. We only keep the first occurrence of each predicated source.
+        predicated_groups = []
+        seen_predicated_sources = set()
+        for source_field, target_field in predicated_fields:
+            predicated_source_field = self.remove_last_node(source_field)
+            if predicated_source_field in seen_predicated_sources:
+                continue
+            seen_predicated_sources.add(predicated_source_field)
+            predicated_groups.append((predicated_source_field, self.extract_ancestor_xpath(target_field, 1)))
+
+        self.predicated_groups_cache[key] = tuple(predicated_groups)
+        return self.predicated_groups_cache[key]
+
+    # Replace the node of the ancestor needing predicate in the path by the same node of the predicated group (the node with
+    # its predicate and, for the innermost group, the nodes after it). The nodes before it are kept, so the predicates already
+    # added by the outer groups are kept too.
+    # Example:
+    # Input: PackingSlip/Header/Address[AddressTypeCode='ST']/References/ReferenceID, PackingSlip/Header/Address/References,
+    #        PackingSlip/Header/Address/References[ReferenceQual='BL']
+    # Output: PackingSlip/Header/Address[AddressTypeCode='ST']/References[ReferenceQual='BL']/ReferenceID
+    def graft_predicated_group(self, path, ancestor_needing_predicate, predicated_group):
+        depth = len(self.SEPARATOR_PATTERN.split(ancestor_needing_predicate))
+        nodes = self.SEPARATOR_PATTERN.split(path)
+        predicated_nodes = self.SEPARATOR_PATTERN.split(predicated_group)
+        return self.XPATH_SEPARATOR.join(nodes[:depth - 1] + predicated_nodes[depth - 1:] + nodes[depth:])
+
+    # Lazily yield the predicated (source, target) paths of a field for the given ancestors needing predicate, ordered 
+    # from the outermost to the innermost group. Each level grafts every predicated path of its group on the path, then 
+    # the inner levels are expanded on the grafted path. The predicated paths of a group are looked up with its own 
+    # (unpredicated) paths: the report has no field with the predicates of two groups. Only one generator per level is 
+    # alive at a time, so the memory depends on the depth and not on the number of combinations.
+    # Example: 
+    # Input: PackingSlip/Header/Address/References/ReferenceID, Shipment/Header/Address/References/ReferenceID,
+    #        ((PackingSlip/Header/Address, Shipment/Header/Address), 
+    #         (PackingSlip/Header/Address/References, Shipment/Header/Address/References))
+    # Output: ("PackingSlip/Header/Address[AddressTypeCode='ST']/References[ReferenceQual='BL']/ReferenceID",
+    #          "Shipment/Header/Address[AddressTypeCode='ST']/References[ReferenceQual='BL']/ReferenceID"), ...
+    def expand_predicated_paths(self, source_path, target_path, ancestors_needing_predicate):
+        if len(ancestors_needing_predicate) == 0:
+            yield source_path, target_path
+            return
+
+        (source_ancestor_needing_predicate, target_ancestor_needing_predicate) = ancestors_needing_predicate[0]
+        inner_ancestors_needing_predicate = ancestors_needing_predicate[1:]
+
+        # Get the predicated paths of the group (computed once per group needing predicate)
+        predicated_groups = self.get_predicated_groups(source_ancestor_needing_predicate, target_ancestor_needing_predicate)
+        
+        if len(predicated_groups) == 0:
+            print(f"Not suppose to happen!!!!!!!!!!! =====> temp_df_predicated_groups is empty. source_ancestor_needing_predicate: {source_ancestor_needing_predicate}, target_ancestor_needing_predicate: {target_ancestor_needing_predicate}")
+
+        # When there are inner levels, only keep the predicated path down to the group itself. The inner groups
+        # will be predicated by their own level.
+        source_depth = len(self.SEPARATOR_PATTERN.split(source_ancestor_needing_predicate))
+        target_depth = len(self.SEPARATOR_PATTERN.split(target_ancestor_needing_predicate))
+        processed_predicated_groups = set()
+
+        # Loop all predicated path of the group
+        for predicated_source_field, predicated_target_field in predicated_groups:
+            if len(inner_ancestors_needing_predicate) > 0:
+                predicated_source_field = self.XPATH_SEPARATOR.join(self.SEPARATOR_PATTERN.split(predicated_source_field)[:source_depth])
+                predicated_target_field = self.XPATH_SEPARATOR.join(self.SEPARATOR_PATTERN.split(predicated_target_field)[:target_depth])
+                if (predicated_source_field, predicated_target_field) in processed_predicated_groups:
+                    continue
+                processed_predicated_groups.add((predicated_source_field, predicated_target_field))
+
+            if '[' not in predicated_target_field: # That should not happen
+                print(f"Not suppose to happen!!!!!!!!!!! =====> predicated_target_field: {predicated_target_field}")
+            
+            # Replace the node of the group in the source and target paths with the predicated one.
+            modified_source_path = self.graft_predicated_group(source_path, source_ancestor_needing_predicate, predicated_source_field)
+            modified_target_path = self.graft_predicated_group(target_path, target_ancestor_needing_predicate, predicated_target_field)
+
+            yield from self.expand_predicated_paths(modified_source_path, modified_target_path, inner_ancestors_needing_predicate)
+
     # Process a group of rows with the same source path (if more than one row = ambiguity).
     # Output the conversion map for the group to the Json file.
     def process_group(self, data):
@@ -165,21 +362,15 @@ class PRIAConversionMapGenerator:
             
             # First:
             # Validate if this source belongs to group that has and needs predicate. This information is given 
-            # by appplying the "is_predicate" function on the "group_needs_predicate" dataframe's source column. 
-            # "group_needs_predicate" is a filter on the augmented Keystone report wich say for each group if it 
-            # needs predicate or not. 
+            # by appplying the "predicate_is_needed" function on the groups needing predicate (see
+            # parent_group_needs_predicate). "group_needs_predicate" is a filter on the augmented Keystone report wich
+            # say for each group if it needs predicate or not. 
             # 
             # If the The source already contains a predicate, we need to know if we can simplify the xpath 
             # by removing the predicate. Thus, if the group to which the source belongs is not present in 
             # "group_needs_predicate", we will simplify the xpath by removing the predicate of the source and the 
             # target.
-            need_predicate_boolean_mask1 = self.group_needs_predicate[self.SOURCE_COLUMN].apply(lambda x: self.predicate_is_needed(x, source_value))
-
-            # Filter the DataFrame using the boolean mask
-            applicable_predicated_group_df1 = self.group_needs_predicate[need_predicate_boolean_mask1]
-            
-            # If the result is empty, it means that the predicate is not needed               
-            is_predicate_can_be_removed = len(applicable_predicated_group_df1) == 0 and '[' in source_value
+            is_predicate_can_be_removed = not self.parent_group_needs_predicate(source_value) and '[' in source_value
                 
             # This block is just to return the function if predicate is not needed but the resulted simplified xpath
             # has already been processed.
@@ -203,31 +394,35 @@ class PRIAConversionMapGenerator:
             
             # Second:
             # Do the source (containing or not a predicate) need additional predicate? This information is given 
-            # by appplying the "is_ancestor" function on the "group_needs_predicate" dataframe's source column. 
+            # by appplying the "is_ancestor" function on the groups needing predicate (see get_ancestors_needing_predicate). 
             # If the source has at least one ancestor that needs a predicate, we will then need to add the 
             # predicates to the appropriate group of the source and the target. 
             # 
-            # NB1: Theoricaly, the source can have more than one group that needs predicate, thus the first "for" 
-            # loop. But the code is written to handle only one group needing predicate.
+            # NB1: The source can have more than one group that needs predicate (nested qualified groups such as 
+            # References inside a qualified Address). Each of these groups is a level of the expansion and the 
+            # predicated paths of all levels are combined lazily by "expand_predicated_paths".
             # 
             # NB2: The "is_ancestor" function will not look for the first group starting on the right if the source
             # already contains a predicate. That is because this would be a case of simplification of the xpath
             # (which is done in the previous block above).
-            need_predicate_boolean_mask2 = self.group_needs_predicate[self.SOURCE_COLUMN].apply(lambda x: self.is_ancestor(x, source_value))
+            applicable_ancestors = self.get_ancestors_needing_predicate(source_value)
             
-            if need_predicate_boolean_mask2.any():
-                # Filter the DataFrame using the Boolean Series
-                applicable_predicated_group_df2 = self.group_needs_predicate[need_predicate_boolean_mask2]
-                
-                # Loop all groups that need predicate (according to exsiting use cases, it should be only one group)
-                for index1, row_needs_additional_predicate in applicable_predicated_group_df2.iterrows():
-                    source_ancestor_needing_predicate = row_needs_additional_predicate[self.SOURCE_COLUMN]
-                    target_ancestor_needing_predicate = row_needs_additional_predicate[self.TARGET_COLUMN]
+            if len(applicable_ancestors) > 0:
+                # Group the ancestors needing predicate by source ancestor (one level per source ancestor), from the
+                # outermost to the innermost group. A source ancestor can have more than one target ancestor.
+                levels = OrderedDict()
+                for source_ancestor, target_ancestor in applicable_ancestors:
+                    levels.setdefault(source_ancestor, []).append((source_ancestor, target_ancestor))
+                levels = sorted(levels.values(), key=lambda rows: rows[0][0].count(self.XPATH_SEPARATOR))
+
+                # Loop all combinations of (source, target) ancestors needing predicate, one per level. According to 
+                # existing use cases, there is only one level.
+                for ancestors_needing_predicate in product(*levels):
                     
                     # Loop all target of the group. Since ambiguity is resolved, there should be only one target.
                     for index, target_value in data[self.TARGET_COLUMN].items():
-                        # Make sure the "row_needs_additional_predicate" Serie does apply to the current group.
-                        if not target_value.startswith(target_ancestor_needing_predicate):
+                        # Make sure the combination of ancestors does apply to the current group.
+                        if not all(target_value.startswith(target_ancestor) for _, target_ancestor in ancestors_needing_predicate):
                             continue
                         
                         # Handle the case where the source already contains a predicate but needs to be simplified as well
@@ -238,37 +433,9 @@ class PRIAConversionMapGenerator:
                         if is_predicate_can_be_removed:
                             working_source_value = self.remove_predicate(source_value)
                             working_target_value = self.remove_predicate(target_value)
-                    
-                        # Filter the selected_field_df DataFrame to only include the children of the predicated group
-                        temp_df_predicated_groups = self.selected_field_df[
-                            (self.selected_field_df[self.SOURCE_COLUMN].str.startswith(source_ancestor_needing_predicate + '[')) & 
-                            (self.selected_field_df[self.TARGET_COLUMN].str.startswith(target_ancestor_needing_predicate + '['))
-                        ]        
-                        
-                        if len(temp_df_predicated_groups) == 0:
-                            print(f"Not suppose to happen!!!!!!!!!!! =====> temp_df_predicated_groups is empty. source_ancestor_needing_predicate: {source_ancestor_needing_predicate}, target_ancestor_needing_predicate: {target_ancestor_needing_predicate}")
-                                
-                        # Create a new dataframe that contains only the predicated groups. If a group is in this dataframe, 
-                        # it means that the group needs to use qualifiers.
-                        df_predicated_groups = temp_df_predicated_groups.copy()
-                        # Remove the last node from the source path (teh field), so he last node wil become the predicate.
-                        df_predicated_groups[self.SOURCE_COLUMN] = df_predicated_groups[self.SOURCE_COLUMN].apply(self.remove_last_node)
-                        # Because we removed the fields, we created duplicates. Let's remove them.
-                        df_predicated_groups = df_predicated_groups.drop_duplicates(subset=[self.SOURCE_COLUMN])
-
-                        # Loop all predicated path of the group
-                        # List of predicated nodes
-                        for index2, predicated_row in df_predicated_groups.iterrows():
-                            predicated_source_field = predicated_row[self.SOURCE_COLUMN]
-                            predicated_target_field = self.extract_ancestor_xpath(predicated_row[self.TARGET_COLUMN], 1)
-
-                            if '[' not in predicated_target_field: # That should not happen
-                                print(f"Not suppose to happen!!!!!!!!!!! =====> predicated_target_field: {predicated_target_field}")
-                            
-                            # Remove the base path from the source and target fields and replace it with the predicated one.
-                            modified_source_path = self.replace_base_path(source_ancestor_needing_predicate, predicated_source_field, working_source_value)
-                            modified_target_path = self.replace_base_path(target_ancestor_needing_predicate, predicated_target_field, working_target_value)
-                            
+
+                        # Loop all predicated paths of the source and the target
+                        for modified_source_path, modified_target_path in self.expand_predicated_paths(working_source_value, working_target_value, ancestors_needing_predicate):
                             self.output_json(f'\t"{modified_source_path}": [')
                             self.output_json(f'\t\t"{modified_target_path}"')
                             self.output_json('\t],')
@@ -327,39 +494,58 @@ class PRIAConversionMapGenerator:
     def generate_conversion_maps(self):
         self.log_message("Processing...")
 
-        # Write the first bracket
-        self.output_json("{")
-        self.selected_df.groupby(self.SOURCE_COLUMN, group_keys=False).apply(self.process_group)
+        # The database of the SQLite mode is deleted even if the generation fails
+        try:
+            # Write the first bracket
+            self.output_json("{")
+            if self.sqlite:
+                # Process the selected groups one at a time, in the same order as the groupby below
+                for data in self.report_store.iter_groups(row_filter=self.selected_rows_condition()):
+                    self.process_group(data)
+            elif self.streaming:
+                # Process the groups one at a time, in the same order as the groupby below
+                for data in self.keystone_report_reader.iter_groups():
+                    selected_data = self.select_rows(data)
+                    if len(selected_data) > 0:
+                        self.process_group(selected_data)
+            else:
+                self.selected_df.groupby(self.SOURCE_COLUMN, group_keys=False).apply(self.process_group)
 
-        # Replace the last line in the JSON file with a closing bracket without a comma
-        # Assuming json_output_file_name is defined and contains the path to the file
-        with open('conversion_maps/' + self.json_output_file_name, 'r') as file:
-            lines = file.readlines()
+            # Replace the last line in the JSON file with a closing bracket without a comma
+            # Assuming json_output_file_name is defined and contains the path to the file
+            with open('conversion_maps/' + self.json_output_file_name, 'r') as file:
+                lines = file.readlines()
 
-        # Replace the last line
-        lines[-1] = '\t]\n'
+            # Replace the last line
+            lines[-1] = '\t]\n'
 
-        # Write all lines back to the file
-        with open('conversion_maps/' + self.json_output_file_name, 'w') as file:
-            file.writelines(lines)
+            # Write all lines back to the file
+            with open('conversion_maps/' + self.json_output_file_name, 'w') as file:
+                file.writelines(lines)
 
-        # Close the first bracket
-        self.output_json("}")
+            # Close the first bracket
+            self.output_json("}")
 
-        # Output list of qualified groups if requested
-        if self.generate_csv:
-            self.output_csv("QUALIFIED_GROUPS")
-            self.processed_additional_predicated_node.clear()
-            for index, row in self.group_needs_predicate.iterrows():
-                if row[self.SOURCE_COLUMN] not in self.processed_additional_predicated_node:
-                    self.output_csv(row[self.SOURCE_COLUMN])
-                    self.processed_additional_predicated_node.add(row[self.SOURCE_COLUMN])
+            # Output list of qualified groups if requested
+            if self.generate_csv:
+                self.output_csv("QUALIFIED_GROUPS")
+                for source_value in self.get_group_needing_predicate_sources():
+                    self.output_csv(source_value)
 
-            self.log_message(f"Processing complete. Results saved to 'conversion_maps/{self.json_output_file_name}'.")
+                self.log_message(f"Processing complete. Results saved to 'conversion_maps/{self.json_output_file_name}'.")
         
-        if len(self.node_not_output) > 0:
-            for node in self.node_not_output:
-                print(f"Node not output: {node}")
+            if len(self.node_not_output) > 0:
+                for node in self.node_not_output:
+                    print(f"Node not output: {node}")
+
+        finally:
+            if self.sqlite:
+                self.report_store.close()
+
+        # Write the minimized map too. It is verified to expand back to the map.
+        if self.minimize:
+            minimizer = ConversionMapMinimizer('conversion_maps/' + self.json_output_file_name, self.log)
+            minimizer.process()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Generate PRIA conversion maps for a non-ambiguous conversion. Need to run select_default_conversions.py prior to this script.')
@@ -369,7 +555,10 @@ if __name__ == "__main__":
     parser.add_argument('--run_test', action='store_true', default=True, help='Run the test at the end (default: False)')
     parser.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
     parser.add_argument('--generate_csv', action='store_true', default=False, help='Will generate a CSV file that contains all the group that will need to use qualifiers. (default: False)')
+    parser.add_argument('--streaming', action='store_true', default=False, help='Will read the report one group at a time instead of loading it in memory. (default: False)')
+    parser.add_argument('--sqlite', action='store_true', default=False, help='Will load the report in an on-disk SQLite database instead of loading it in memory. (default: False)')
+    parser.add_argument('--minimize', action='store_true', default=False, help='Will also write the minimized conversion map in conversion_maps/minimized. (default: False)')
     args = parser.parse_args()
 
-    generator = PRIAConversionMapGenerator(args.non_ambiguous_keystone_report, args.source, args.target, args.run_test, args.log, args.generate_csv)
+    generator = PRIAConversionMapGenerator(args.non_ambiguous_keystone_report, args.source, args.target, args.run_test, args.log, args.generate_csv, args.streaming, args.sqlite, args.minimize)
     generator.generate_conversion_maps()
\ No newline at end of file
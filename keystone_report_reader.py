@@ -0,0 +1,137 @@
+import csv
+import heapq
+import os
+import pickle
+import tempfile
+from itertools import chain, groupby
+import pandas as pd
+
+class KeystoneReportReader:
+    # Constants
+    SOURCE_COLUMN = 'SOURCE_PATH'
+
+    # Number of rows kept in memory when the report needs to be sorted on disk
+    DEFAULT_CHUNK_SIZE = 100000
+
+    def __init__(self, keystone_report, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.keystone_report = keystone_report
+        self.chunk_size = chunk_size
+        self.columns = None
+
+    # Stream the rows of the report (without the header) as tuples. The header is kept in self.columns.
+    # The Excel file is opened in read-only mode so the rows are never all loaded in memory. Empty cells
+    # are returned as None.
+    def iter_rows(self):
+        if self.keystone_report.lower().endswith('.csv'):
+            with open(self.keystone_report, 'r', newline='') as file:
+                rows = csv.reader(file)
+                self.columns = next(rows)
+                for row in rows:
+                    yield tuple(value if value != '' else None for value in row)
+        else:
+            # Import here so the CSV reader does not depend on openpyxl
+            import openpyxl
+            workbook = openpyxl.load_workbook(self.keystone_report, read_only=True, data_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                header = next(rows)
+                # Trailing empty header cells are not columns
+                while len(header) > 0 and header[-1] is None:
+                    header = header[:-1]
+                self.columns = list(header)
+                for row in rows:
+                    # Skip the empty rows at the end of the sheet
+                    if all(value is None for value in row):
+                        continue
+                    row = tuple(row[:len(self.columns)])
+                    yield row + (None,) * (len(self.columns) - len(row))
+            finally:
+                workbook.close()
+
+    # Stream the rows of the report as dictionaries (column name -> value).
+    def iter_records(self):
+        for row in self.iter_rows():
+            yield dict(zip(self.columns, row))
+
+    # Check, in one pass and without keeping the rows, if the report is already sorted by source path.
+    def is_sorted(self):
+        previous_key = None
+        source_index = None
+        for row in self.iter_rows():
+            if source_index is None:
+                source_index = self.columns.index(self.SOURCE_COLUMN)
+            key = row[source_index]
+            if key is None:
+                continue
+            if previous_key is not None and key < previous_key:
+                return False
+            previous_key = key
+        return True
+
+    # Stream the rows of the report sorted by source path as (row number, row) tuples. The rows sharing
+    # the same source path keep their original order. If the report is not already sorted, it is sorted
+    # on disk: sorted runs of chunk_size rows are written in a temporary directory and merged back.
+    # Rows without source path are skipped (like pandas' groupby does).
+    def iter_sorted_rows(self):
+        if self.is_sorted():
+            source_index = self.columns.index(self.SOURCE_COLUMN)
+            for row_number, row in enumerate(self.iter_rows()):
+                if row[source_index] is not None:
+                    yield row_number, row
+            return
+
+        with tempfile.TemporaryDirectory(prefix='keystone_report_') as temp_dir:
+            run_files = []
+            chunk = []
+            source_index = None
+            for row_number, row in enumerate(self.iter_rows()):
+                if source_index is None:
+                    source_index = self.columns.index(self.SOURCE_COLUMN)
+                if row[source_index] is None:
+                    continue
+                chunk.append((row[source_index], row_number, row))
+                if len(chunk) >= self.chunk_size:
+                    run_files.append(self._write_sorted_run(chunk, temp_dir, len(run_files)))
+                    chunk = []
+            if len(chunk) > 0:
+                run_files.append(self._write_sorted_run(chunk, temp_dir, len(run_files)))
+                chunk = []
+
+            for key, row_number, row in heapq.merge(*[self._read_sorted_run(run_file) for run_file in run_files]):
+                yield row_number, row
+
+    def _write_sorted_run(self, chunk, temp_dir, run_number):
+        chunk.sort(key=lambda record: (record[0], record[1]))
+        run_file = os.path.join(temp_dir, f'run_{run_number}.pkl')
+        with open(run_file, 'wb') as file:
+            for record in chunk:
+                pickle.dump(record, file, protocol=pickle.HIGHEST_PROTOCOL)
+        return run_file
+
+    def _read_sorted_run(self, run_file):
+        with open(run_file, 'rb') as file:
+            while True:
+                try:
+                    yield pickle.load(file)
+                except EOFError:
+                    return
+
+    # Stream the groups of rows sharing the same source path, in the same order as pandas' groupby on the
+    # source path. Each group is a DataFrame indexed by the row number in the report, so only the largest
+    # group needs to fit in memory.
+    def iter_groups(self):
+        sorted_rows = self.iter_sorted_rows()
+
+        # The columns are only known once the first row has been read
+        first_row = next(sorted_rows, None)
+        if first_row is None:
+            return
+        source_index = self.columns.index(self.SOURCE_COLUMN)
+
+        for key, group_rows in groupby(chain([first_row], sorted_rows), key=lambda record: record[1][source_index]):
+            yield self._to_dataframe(list(group_rows))
+
+    def _to_dataframe(self, group_rows):
+        return pd.DataFrame([row for row_number, row in group_rows],
+                            columns=self.columns,
+                            index=[row_number for row_number, row in group_rows])
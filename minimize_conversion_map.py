@@ -0,0 +1,200 @@
+import argparse
+import datetime
+import json
+import os
+import re
+import time
+
+class ConversionMapMinimizer:
+    # Constants
+    XPATH_SEPARATOR = '/'
+    MINIMIZED_DIRECTORY = 'conversion_maps/minimized'
+
+    # Number of loads of the maps to measure their load time (the best time is kept)
+    LOAD_TIME_REPETITIONS = 3
+
+    # Value of a source path that inherits all the target paths of its group
+    INHERITED = True
+
+    # Split a path on the separators that are not inside a predicate. Example:
+    # Input: ShippingLabel/Header/Address[AddressTypeCode='ST']/AddressName
+    # Output: ['ShippingLabel', 'Header', "Address[AddressTypeCode='ST']", 'AddressName']
+    SEPARATOR_PATTERN = re.compile(r"/(?![^\[]*\])")
+
+    # Minimize a conversion map. Most field entries only repeat the mapping of their group with the rest of their path appended:
+    #   "ShippingLabel/Header/Address": ["Shipment/Header/Address", "Shipment/OrderLevel/Address"]
+    #   "ShippingLabel/Header/Address[AddressTypeCode='ST']/AddressName": ["Shipment/OrderLevel/Address[AddressTypeCode='ST']/AddressName"]
+    # The group of a source path is its nearest ancestor that is a source path of the map, as is or without the predicate of
+    # its last node (the predicate is then added to the target paths of the group, e.g. Address[AddressTypeCode='ST'] above).
+    # In the minimized map, an entry derived from its group is replaced by a flag:
+    #   true: the entry inherits all the target paths of its group, with the rest of its path appended.
+    #   [1]: the entry inherits only the target paths of its group at these positions (here, the second one).
+    # The other entries are unchanged. The keys keep their order, so expand gives back the original map exactly.
+    def __init__(self, conversion_map, log=False):
+        self.conversion_map = conversion_map
+        self.log_enabled = log
+
+        # Create the file name with the timestamp
+        current_time = datetime.datetime.now()
+        self.timestamp = current_time.strftime("%Y%m%d_%H%M%S")
+        self.log_file_name = f"logfile_{self.timestamp}.log"
+        os.makedirs('log', exist_ok=True)
+
+        os.makedirs(self.MINIMIZED_DIRECTORY, exist_ok=True)
+        self.output_file_name = os.path.join(self.MINIMIZED_DIRECTORY, os.path.basename(conversion_map))
+
+    def log(self, message):
+        if self.log_enabled:
+            with open('log/' + self.log_file_name, 'a') as f:
+                print(message, file=f)
+        print(message)
+
+    # Entries of a map file as a list of (source path, value), in the order of the file and with the duplicate keys
+    @staticmethod
+    def load_entries(map_file):
+        with open(map_file, 'r') as file:
+            return json.load(file, object_pairs_hook=list)
+
+    # Group of a source path: (source path of the group, predicate to add to the target paths of the group, rest of the path)
+    # or None. source_paths are all the source paths of the map.
+    @classmethod
+    def find_group(cls, source_path, source_paths):
+        nodes = cls.SEPARATOR_PATTERN.split(source_path)
+        for depth in range(len(nodes) - 1, 0, -1):
+            rest_of_path = cls.XPATH_SEPARATOR.join(nodes[depth:])
+            ancestor = cls.XPATH_SEPARATOR.join(nodes[:depth])
+            if ancestor in source_paths:
+                return ancestor, '', rest_of_path
+            if '[' in nodes[depth - 1]:
+                name, predicate = nodes[depth - 1].split('[', 1)
+                ancestor = cls.XPATH_SEPARATOR.join(nodes[:depth - 1] + [name])
+                if ancestor in source_paths:
+                    return ancestor, '[' + predicate, rest_of_path
+        return None
+
+    # Target paths of a source path derived from the target paths of its group
+    @classmethod
+    def derive_target_paths(cls, group_target_paths, predicate, rest_of_path):
+        return [target_path + predicate + cls.XPATH_SEPARATOR + rest_of_path for target_path in group_target_paths]
+
+    @classmethod
+    def minimize(cls, entries):
+        target_paths_by_source_path = dict(entries)
+        minimized_entries = []
+        for source_path, target_paths in entries:
+            value = target_paths
+            group = cls.find_group(source_path, target_paths_by_source_path)
+            if group is not None:
+                group_source_path, predicate, rest_of_path = group
+                derived_target_paths = cls.derive_target_paths(target_paths_by_source_path[group_source_path], predicate, rest_of_path)
+                if target_paths == derived_target_paths:
+                    value = cls.INHERITED
+                elif len(target_paths) > 0 and all(target_path in derived_target_paths for target_path in target_paths):
+                    value = [derived_target_paths.index(target_path) for target_path in target_paths]
+            minimized_entries.append((source_path, value))
+        return minimized_entries
+
+    # Target paths of one source path of a minimized map, for the consumers that look up a few source paths without expanding
+    # the whole map. values is the minimized map as a dictionary. The target paths of the groups are expanded first when they
+    # are minimized too, and kept in expanded_target_paths.
+    @classmethod
+    def lookup(cls, values, source_path, expanded_target_paths):
+        if source_path not in expanded_target_paths:
+            value = values[source_path]
+            if isinstance(value, list) and all(isinstance(target_path, str) for target_path in value):
+                target_paths = value
+            else:
+                group_source_path, predicate, rest_of_path = cls.find_group(source_path, values)
+                derived_target_paths = cls.derive_target_paths(cls.lookup(values, group_source_path, expanded_target_paths), predicate, rest_of_path)
+                target_paths = derived_target_paths if value is cls.INHERITED else [derived_target_paths[position] for position in value]
+            expanded_target_paths[source_path] = target_paths
+        return expanded_target_paths[source_path]
+
+    # Expand a minimized map (list of (source path, value)) back to the entries of the original map
+    @classmethod
+    def expand(cls, minimized_entries):
+        values = dict(minimized_entries)
+        expanded_target_paths = {}
+        return [(source_path, cls.lookup(values, source_path, expanded_target_paths)) for source_path, _ in minimized_entries]
+
+    # Write the entries with the layout of the generated maps, the flags on the line of their source path
+    @staticmethod
+    def write_entries(entries, output_file_name):
+        with open(output_file_name, 'w') as file:
+            file.write('{\n')
+            for index, (source_path, value) in enumerate(entries):
+                separator = ',' if index < len(entries) - 1 else ''
+                if isinstance(value, list) and len(value) > 0 and isinstance(value[0], str):
+                    target_lines = ',\n'.join(f'\t\t{json.dumps(target_path)}' for target_path in value)
+                    file.write(f'\t{json.dumps(source_path)}: [\n{target_lines}\n\t]{separator}\n')
+                else:
+                    file.write(f'\t{json.dumps(source_path)}: {json.dumps(value)}{separator}\n')
+            file.write('}\n')
+
+    # Check that the minimized map expands back to the original map: same source paths in the same order, same target paths in
+    # the same order. Return None or the first difference.
+    @classmethod
+    def verify(cls, entries, minimized_entries):
+        expanded_entries = cls.expand(minimized_entries)
+        if len(expanded_entries) != len(entries):
+            return f"{len(expanded_entries)} entries instead of {len(entries)}"
+        for (source_path, target_paths), (expanded_source_path, expanded_target_paths) in zip(entries, expanded_entries):
+            if source_path != expanded_source_path:
+                return f"'{expanded_source_path}' instead of '{source_path}'"
+            if target_paths != expanded_target_paths:
+                return f"'{source_path}' is expanded to {expanded_target_paths} instead of {target_paths}"
+        return None
+
+    def measure_load_time(self, map_file):
+        load_seconds = []
+        for _ in range(self.LOAD_TIME_REPETITIONS):
+            start = time.perf_counter()
+            self.load_entries(map_file)
+            load_seconds.append(time.perf_counter() - start)
+        return min(load_seconds)
+
+    # Main processing function. Raise a ValueError if the map cannot be minimized or if the minimized map is not equivalent.
+    def process(self):
+        self.log(f"Minimizing '{self.conversion_map}'.")
+
+        entries = self.load_entries(self.conversion_map)
+        source_paths = set()
+        for source_path, _ in entries:
+            if source_path in source_paths:
+                raise ValueError(f"The source path '{source_path}' is defined more than once in '{self.conversion_map}'. Run validate_json.py.")
+            source_paths.add(source_path)
+
+        minimized_entries = self.minimize(entries)
+        self.write_entries(minimized_entries, self.output_file_name)
+
+        # Verify the file that was written, not the entries in memory
+        written_entries = self.load_entries(self.output_file_name)
+        difference = self.verify(entries, written_entries)
+        if difference is not None:
+            os.remove(self.output_file_name)
+            raise ValueError(f"The minimized map of '{self.conversion_map}' does not expand to the original map: {difference}")
+
+        original_load_seconds = self.measure_load_time(self.conversion_map)
+        load_seconds = self.measure_load_time(self.output_file_name)
+        start = time.perf_counter()
+        self.expand(written_entries)
+        expand_seconds = time.perf_counter() - start
+
+        inherited_count = sum(1 for _, value in minimized_entries if value is self.INHERITED)
+        partially_inherited_count = sum(1 for _, value in minimized_entries if isinstance(value, list) and len(value) > 0 and isinstance(value[0], int))
+        original_size = os.path.getsize(self.conversion_map)
+        minimized_size = os.path.getsize(self.output_file_name)
+        self.log(f"{len(entries)} entries: {inherited_count} inherit all the target paths of their group, {partially_inherited_count} inherit some of them.")
+        self.log(f"Size: {original_size / 1e6:.2f} MB -> {minimized_size / 1e6:.2f} MB ({100 * (1 - minimized_size / original_size):.0f}% smaller). "
+                 f"Load time: {original_load_seconds * 1000:.0f} ms -> {load_seconds * 1000:.0f} ms ({expand_seconds * 1000:.0f} ms more to expand it).")
+        self.log("Verified: the minimized map expands back to the original map.")
+        self.log(f"Processing complete. Results saved to '{self.output_file_name}'.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Minimize a conversion map: the entries derived from the mapping of their group are replaced by a flag.')
+    parser.add_argument('conversion_map', type=str, help='Path to the JSON conversion map, e.g., conversion_maps/shippinglabel_3.0_to_shipment_7.7_conversion_v9.json')
+    parser.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
+    args = parser.parse_args()
+
+    minimizer = ConversionMapMinimizer(args.conversion_map, args.log)
+    minimizer.process()
@@ -0,0 +1,141 @@
+import argparse
+import os
+import sys
+
+# Single entry point of the scripts. Each subcommand imports its script only when it runs: pandas, openpyxl and the XML
+# libraries are not imported by the light subcommands (extract-paths, extract-qualifiers, validate), which start quickly.
+# The scripts can still be run on their own.
+
+# Maximum number of decisions in the cache: the default of the decision cache when --cache_size is not given. It is resolved
+# here and not in the parser, so decision_cache is only imported by the passes.
+def get_cache_size(args):
+    from decision_cache import DecisionCache
+
+    return DecisionCache.DEFAULT_MAX_ENTRIES if args.cache_size is None else args.cache_size
+
+# Run the first pass and return the name of its report
+def select_field_conversions(args):
+    from select_default_conversions_pass1 import ConversionSelector
+
+    selector = ConversionSelector(args.keystone_report, args.source, args.target, args.run_test, args.log, args.streaming, args.cache, get_cache_size(args), args.sqlite)
+    return selector.process()
+
+# Run the second pass and return the name of its report
+def select_group_conversions(args):
+    from select_group_default_conversions_pass2 import GroupConversionSelector
+
+    selector = GroupConversionSelector(args.keystone_report, args.source, args.target, args.run_test, args.log, args.cache, get_cache_size(args), args.sqlite)
+    return selector.process()
+
+def run_pass1(args):
+    select_field_conversions(args)
+
+def run_pass2(args):
+    select_group_conversions(args)
+
+def run_generate(args):
+    from generates_pria_conversion_maps import PRIAConversionMapGenerator
+
+    generator = PRIAConversionMapGenerator(args.keystone_report, args.source, args.target, args.run_test, args.log, args.generate_csv, args.streaming, args.sqlite, args.minimize)
+    generator.generate_conversion_maps()
+
+# The three steps in sequence, each one reading the report of the previous one
+def run_pipeline(args):
+    os.makedirs('conversion_analysis', exist_ok=True)
+    os.makedirs('conversion_maps', exist_ok=True)
+
+    args.keystone_report = select_field_conversions(args)
+    args.keystone_report = select_group_conversions(args)
+    run_generate(args)
+
+def run_extract_paths(args):
+    from extract_path import extract_paths
+
+    os.makedirs('path_extracts', exist_ok=True)
+    extract_paths(args.path_file, args.nodes, args.mode)
+
+def run_extract_qualifiers(args):
+    from extract_qualifiers import extract_qualifiers
+
+    error = extract_qualifiers(args.qualifier_file, args.qualifier_name)
+    if error is not None:
+        print(error)
+        return 1
+
+def run_validate(args):
+    from validate_json import ConversionMapValidator
+
+    validator = ConversionMapValidator(args.paths, args.processes, args.fix, args.log)
+    if validator.process() > 0:
+        return 1
+
+def add_conversion_arguments(parser, report_help):
+    parser.add_argument('keystone_report', type=str, help=report_help)
+    parser.add_argument('source', type=str, help='Name and version of the canonical source, e.g., ShippingLabel 3.0')
+    parser.add_argument('target', type=str, help='Name and version of the canonical target, e.g., Shipment 7.7')
+    parser.add_argument('--run_test', action='store_true', default=True, help='Run the test at the end (default: False)')
+    parser.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
+    parser.add_argument('--sqlite', action='store_true', default=False, help='Will load the report in an on-disk SQLite database instead of loading it in memory. (default: False)')
+
+def add_cache_arguments(parser):
+    parser.add_argument('--cache', action='store_true', default=False, help='Will reuse the decisions of the previous runs, saved in the cache subdirectory. (default: False)')
+    parser.add_argument('--cache_size', type=int, default=None, help='Maximum number of decisions in the cache (default: DecisionCache.DEFAULT_MAX_ENTRIES of decision_cache.py)')
+
+def add_streaming_argument(parser):
+    parser.add_argument('--streaming', action='store_true', default=False, help='Will read the report one group at a time instead of loading it in memory. (default: False)')
+
+def add_generate_arguments(parser):
+    parser.add_argument('--generate_csv', action='store_true', default=False, help='Will generate a CSV file that contains all the group that will need to use qualifiers. (default: False)')
+    parser.add_argument('--minimize', action='store_true', default=False, help='Will also write the minimized conversion map in conversion_maps/minimized. (default: False)')
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Generate PRIA conversion maps and run the related tools.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pass1 = subparsers.add_parser('pass1', help='Select the default conversions of the fields (select_default_conversions_pass1.py)')
+    add_conversion_arguments(pass1, 'Path to your Keystone report')
+    add_streaming_argument(pass1)
+    add_cache_arguments(pass1)
+    pass1.set_defaults(handler=run_pass1)
+
+    pass2 = subparsers.add_parser('pass2', help='Select the default conversions of the groups (select_group_default_conversions_pass2.py)')
+    add_conversion_arguments(pass2, 'Path to the report of the first pass')
+    add_cache_arguments(pass2)
+    pass2.set_defaults(handler=run_pass2)
+
+    generate = subparsers.add_parser('generate', help='Generate the PRIA conversion map (generates_pria_conversion_maps.py)')
+    add_conversion_arguments(generate, 'Path to the report of the second pass')
+    add_generate_arguments(generate)
+    add_streaming_argument(generate)
+    generate.set_defaults(handler=run_generate)
+
+    pipeline = subparsers.add_parser('pipeline', help='Run pass1, pass2 and generate in sequence')
+    add_conversion_arguments(pipeline, 'Path to your Keystone report')
+    add_generate_arguments(pipeline)
+    pipeline.add_argument('--streaming', action='store_true', default=False, help='Will read the report one group at a time in the first pass and the generation. (default: False)')
+    add_cache_arguments(pipeline)
+    pipeline.set_defaults(handler=run_pipeline)
+
+    extract_paths = subparsers.add_parser('extract-paths', help='Extract the paths containing some nodes from a list of paths (extract_path.py)')
+    extract_paths.add_argument('path_file', type=str, help='Path to your file containing the possible list of paths, e.g., path_extracts/Shipments.txt')
+    extract_paths.add_argument('nodes', type=str, help='Comma separated nodes you are looking for, e.g., OrderLevel,Address')
+    extract_paths.add_argument('mode', type=str, choices=['all', 'any', 'leaf'], help='all: only these nodes, any: at least one of these nodes, leaf: the leaf node is one of these nodes')
+    extract_paths.set_defaults(handler=run_extract_paths)
+
+    extract_qualifiers = subparsers.add_parser('extract-qualifiers', help='Extract the qualifier values documented in an XSD file (extract_qualifiers.py)')
+    extract_qualifiers.add_argument('qualifier_file', type=str, help='Path to your file containing the possible list of qualifiers')
+    extract_qualifiers.add_argument('qualifier_name', type=str, help='Name of the qualifier, the output is qualifiers_extracts/<qualifier_name>.txt')
+    extract_qualifiers.set_defaults(handler=run_extract_qualifiers)
+
+    validate = subparsers.add_parser('validate', help='Validate the JSON conversion maps (validate_json.py)')
+    validate.add_argument('paths', type=str, nargs='*', default=['conversion_maps'], help='JSON files or directories of JSON files to validate (default: conversion_maps)')
+    validate.add_argument('--processes', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    validate.add_argument('--fix', action='store_true', default=False, help='Will remove the trailing commas of the maps that have no other syntax error. (default: False)')
+    validate.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
+    validate.set_defaults(handler=run_validate)
+
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    sys.exit(args.handler(args) or 0)
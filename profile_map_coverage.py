@@ -0,0 +1,206 @@
+import argparse
+import csv
+import datetime
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+from collections import Counter
+from multiprocessing import Pool
+
+# Prefix index of the conversion map loaded in each worker process (see init_worker)
+map_index = None
+
+class MapCoverageProfiler:
+    # Constants
+    SOURCE_COLUMN = 'SOURCE_PATH'
+    HIT_COUNT_COLUMN = 'HIT_COUNT'
+    STATUS_COLUMN = 'STATUS'
+    STATUS_HIT = 'HIT'
+    STATUS_DEAD = 'DEAD'
+    STATUS_UNMAPPED = 'UNMAPPED'
+
+    # A node of a source path, with an optional predicate. Example: Address[AddressTypeCode='ST']
+    NODE_PATTERN = re.compile(r"([^/\[]+)(?:\[([^=\]]+)='([^']*)'\])?")
+
+    def __init__(self, conversion_map, samples_directory, processes=None, log=False):
+        self.conversion_map = conversion_map
+        self.samples_directory = samples_directory
+        self.processes = processes
+        self.log_enabled = log
+
+        # Create the file name with the timestamp
+        current_time = datetime.datetime.now()
+        self.timestamp = current_time.strftime("%Y%m%d_%H%M%S")
+        self.log_file_name = f"logfile_{self.timestamp}.log"
+        os.makedirs('log', exist_ok=True)
+
+        map_name = os.path.splitext(os.path.basename(conversion_map))[0]
+        os.makedirs('conversion_analysis', exist_ok=True)
+        self.output_file_name = f'conversion_analysis/coverage_of_{map_name}.csv'
+
+    def log(self, message):
+        if self.log_enabled:
+            with open('log/' + self.log_file_name, 'a') as f:
+                print(message, file=f)
+        print(message)
+
+    # Split a source path into its nodes: (name, qualifier name, qualifier value). The qualifier is None if there is no predicate.
+    # Example:
+    # Input: ShippingLabel/Header/Address[AddressTypeCode='ST']/AddressName
+    # Output: [('ShippingLabel', None, None), ('Header', None, None), ('Address', 'AddressTypeCode', 'ST'), ('AddressName', None, None)]
+    @classmethod
+    def split_path(cls, xpath):
+        return [(match.group(1), match.group(2), match.group(3)) for match in cls.NODE_PATTERN.finditer(xpath)]
+
+    # Build a prefix index (a tree of nested dictionaries) of the source paths of the conversion map. Each node of the index is:
+    # {'entry': source path if a map entry ends here or None, 'children': {name: [(qualifier name, qualifier value, node), ...]}}
+    @classmethod
+    def build_map_index(cls, source_paths):
+        root = {'entry': None, 'children': {}}
+        for source_path in source_paths:
+            node = root
+            for name, qualifier, qualifier_value in cls.split_path(source_path):
+                children = node['children'].setdefault(name, [])
+                for child_qualifier, child_qualifier_value, child in children:
+                    if child_qualifier == qualifier and child_qualifier_value == qualifier_value:
+                        node = child
+                        break
+                else:
+                    child = {'entry': None, 'children': {}}
+                    children.append((qualifier, qualifier_value, child))
+                    node = child
+            node['entry'] = source_path
+        return root
+
+    def load_source_paths(self):
+        with open(self.conversion_map, 'r') as file:
+            return list(json.load(file).keys())
+
+    def list_sample_files(self):
+        sample_files = []
+        for directory, _, file_names in os.walk(self.samples_directory):
+            for file_name in sorted(file_names):
+                if file_name.lower().endswith('.xml'):
+                    sample_files.append(os.path.join(directory, file_name))
+        return sorted(sample_files)
+
+    # Main processing function
+    def process(self):
+        self.log(f"Profiling the coverage of '{self.conversion_map}' with the documents of '{self.samples_directory}'.")
+        self.log("...")
+        self.log("Processing...")
+
+        source_paths = self.load_source_paths()
+        sample_files = self.list_sample_files()
+
+        entry_hits = Counter()
+        unmapped_paths = Counter()
+        with Pool(self.processes, initializer=init_worker, initargs=(source_paths,)) as pool:
+            for file_name, file_entry_hits, file_unmapped_paths, error in pool.imap_unordered(profile_document, sample_files, chunksize=16):
+                if error is not None:
+                    self.log(f"Could not parse '{file_name}': {error}")
+                    continue
+                entry_hits.update(file_entry_hits)
+                unmapped_paths.update(file_unmapped_paths)
+
+        # The hot entries first, then the dead entries in the order of the map, then the unmapped source paths
+        with open(self.output_file_name, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow([self.SOURCE_COLUMN, self.HIT_COUNT_COLUMN, self.STATUS_COLUMN])
+            for source_path, hit_count in entry_hits.most_common():
+                writer.writerow([source_path, hit_count, self.STATUS_HIT])
+            dead_entries = [source_path for source_path in dict.fromkeys(source_paths) if source_path not in entry_hits]
+            for source_path in dead_entries:
+                writer.writerow([source_path, 0, self.STATUS_DEAD])
+            for source_path, hit_count in unmapped_paths.most_common():
+                writer.writerow([source_path, hit_count, self.STATUS_UNMAPPED])
+
+        self.log("...")
+        self.log(f"{len(sample_files)} documents, {len(entry_hits)} entries hit, {len(dead_entries)} dead entries, {len(unmapped_paths)} unmapped source paths.")
+        self.log(f"Processing complete. Results saved to '{self.output_file_name}'.")
+
+def init_worker(source_paths):
+    global map_index
+    map_index = MapCoverageProfiler.build_map_index(source_paths)
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+# Match an element (and its descendants) against the nodes of the map index reached by its parent.
+# A map node applies to the element if it has the same name and, when it has a predicate, if the element has a
+# child with the qualifier name and value. Leaf elements that do not reach any map entry are unmapped: their path
+# is given with the predicates of the map index when the element has the qualifier. The qualifiers of the predicated
+# nodes that apply to the parent (parent_qualifiers) are consumed by the predicates: they are not unmapped.
+def match_element(element, parent_nodes, parent_path, entry_hits, unmapped_paths, parent_qualifiers=frozenset()):
+    name = local_name(element.tag)
+    children = list(element)
+    leaf_values = {local_name(child.tag): (child.text or '').strip() for child in children if len(child) == 0}
+
+    nodes = []
+    qualifiers = set()
+    path_predicate = ''
+    for parent_node in parent_nodes:
+        for qualifier, qualifier_value, node in parent_node['children'].get(name, []):
+            if qualifier is None:
+                nodes.append(node)
+            elif leaf_values.get(qualifier) == qualifier_value:
+                nodes.append(node)
+                qualifiers.add(qualifier)
+                path_predicate = f"[{qualifier}='{qualifier_value}']"
+            elif path_predicate == '' and qualifier in leaf_values:
+                path_predicate = f"[{qualifier}='{leaf_values[qualifier]}']"
+    path = f"{parent_path}/{name}{path_predicate}" if parent_path else f"{name}{path_predicate}"
+
+    is_mapped = False
+    for node in nodes:
+        if node['entry'] is not None:
+            entry_hits[node['entry']] += 1
+            is_mapped = True
+
+    if len(children) == 0:
+        if not is_mapped and name not in parent_qualifiers:
+            unmapped_paths[path] += 1
+        return
+
+    for child in children:
+        match_element(child, nodes, path, entry_hits, unmapped_paths, qualifiers)
+
+# Profile one sample document. The document is streamed with iterparse: each child of the root element is matched
+# and cleared as soon as it is parsed, so the memory depends on the largest child of the root and not on the document.
+def profile_document(file_name):
+    entry_hits = Counter()
+    unmapped_paths = Counter()
+    try:
+        depth = 0
+        root = None
+        root_nodes = None
+        for event, element in ET.iterparse(file_name, events=('start', 'end')):
+            if event == 'start':
+                if depth == 0:
+                    root = element
+                    root_nodes = [node for qualifier, qualifier_value, node in map_index['children'].get(local_name(root.tag), []) if qualifier is None]
+                    for node in root_nodes:
+                        if node['entry'] is not None:
+                            entry_hits[node['entry']] += 1
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth == 1:
+                match_element(element, root_nodes, local_name(root.tag), entry_hits, unmapped_paths)
+                root.remove(element)
+        return file_name, entry_hits, unmapped_paths, None
+    except (ET.ParseError, OSError) as e:
+        return file_name, None, None, str(e)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Profile which entries of a conversion map are used by a directory of sample XML documents.')
+    parser.add_argument('conversion_map', type=str, help='Path to the JSON conversion map, e.g., conversion_maps/shippinglabel_3.0_to_shipment_7.7_conversion_v9.json')
+    parser.add_argument('samples_directory', type=str, help='Directory containing the sample XML documents of the source canonical (searched recursively).')
+    parser.add_argument('--processes', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
+    args = parser.parse_args()
+
+    profiler = MapCoverageProfiler(args.conversion_map, args.samples_directory, args.processes, args.log)
+    profiler.process()
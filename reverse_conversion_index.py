@@ -0,0 +1,231 @@
+import argparse
+import csv
+import datetime
+import glob
+import json
+import os
+import re
+import sys
+import time
+from array import array
+from bisect import bisect_left
+
+class ReverseConversionIndex:
+    # Constants
+    XPATH_SEPARATOR = '/'
+    TARGET_COLUMN = 'TARGET_PATH'
+    MAP_COLUMN = 'CONVERSION_MAP'
+    SOURCE_COLUMN = 'SOURCE_PATHS'
+
+    # A node of a path with its predicates. Example: Address[AddressTypeCode='ST']
+    NODE_PATTERN = re.compile(r"[^/\[]+(?:\[[^\]]*\])*")
+
+    # Node id of the (virtual) root of the path tree
+    ROOT_NODE = 0
+
+    def __init__(self, maps_directory='conversion_maps', log=False):
+        self.maps_directory = maps_directory
+        self.log_enabled = log
+
+        # Create the file name with the timestamp
+        current_time = datetime.datetime.now()
+        self.timestamp = current_time.strftime("%Y%m%d_%H%M%S")
+        self.log_file_name = f"logfile_{self.timestamp}.log"
+        os.makedirs('log', exist_ok=True)
+
+        self.build()
+
+    def log(self, message):
+        if self.log_enabled:
+            with open('log/' + self.log_file_name, 'a') as f:
+                print(message, file=f)
+        print(message)
+
+    # Split a path into its nodes, keeping the predicates with their node.
+    # Example:
+    # Input: Shipment/Header/Address[AddressTypeCode='ST']/AddressName
+    # Output: ['Shipment', 'Header', "Address[AddressTypeCode='ST']", 'AddressName']
+    @classmethod
+    def split_path(cls, xpath):
+        return cls.NODE_PATTERN.findall(xpath)
+
+    # Build the index of all the maps of the directory.
+    # All the source and target paths of all the maps are stored once in a tree of interned path nodes (segments): a path is
+    # the integer id of its last node. Once built, the tree and the postings (target node -> (map id, source node)) are stored
+    # in flat integer arrays (children sorted by segment for each node, postings sorted by target node), so the index of all
+    # the maps takes a few MB.
+    def build(self):
+        start = time.perf_counter()
+
+        self.map_names = []
+        self.segments = []
+        self.segment_ids = {}
+
+        # Temporary structures, only used while building
+        node_parents = [self.ROOT_NODE]
+        node_segments = [0]
+        children = {}
+        postings = []
+
+        for map_file in sorted(glob.glob(os.path.join(self.maps_directory, '*.json'))):
+            try:
+                with open(map_file, 'r') as file:
+                    conversion_map = json.load(file)
+            except json.JSONDecodeError as e:
+                self.log(f"Skipping '{map_file}': JSON format error: {e}")
+                continue
+
+            map_id = len(self.map_names)
+            self.map_names.append(os.path.basename(map_file))
+            for source_path, target_paths in conversion_map.items():
+                source_node = self.add_path(source_path, node_parents, node_segments, children)
+                for target_path in target_paths:
+                    target_node = self.add_path(target_path, node_parents, node_segments, children)
+                    postings.append((target_node, map_id, source_node))
+
+        # Children of each node, sorted by segment id: the children of node n are child_nodes[child_start[n]:child_start[n + 1]]
+        node_count = len(node_parents)
+        sorted_children = sorted(children.items(), key=lambda item: (item[0][0], item[0][1]))
+        self.node_parents = array('I', node_parents)
+        self.node_segments = array('I', node_segments)
+        self.child_nodes = array('I', (node for (parent, segment), node in sorted_children))
+        self.child_segments = array('I', (segment for (parent, segment), node in sorted_children))
+        self.child_start = array('I', [0]) * (node_count + 1)
+        for (parent, segment), node in sorted_children:
+            self.child_start[parent + 1] += 1
+        for node in range(node_count):
+            self.child_start[node + 1] += self.child_start[node]
+
+        # Postings of each target node: posting_maps[posting_start[n]:posting_start[n + 1]] and the same range of posting_sources
+        postings.sort()
+        self.posting_maps = array('H', (map_id for target_node, map_id, source_node in postings))
+        self.posting_sources = array('I', (source_node for target_node, map_id, source_node in postings))
+        self.posting_start = array('I', [0]) * (node_count + 1)
+        for target_node, map_id, source_node in postings:
+            self.posting_start[target_node + 1] += 1
+        for node in range(node_count):
+            self.posting_start[node + 1] += self.posting_start[node]
+
+        self.build_seconds = time.perf_counter() - start
+
+    def add_path(self, xpath, node_parents, node_segments, children):
+        node = self.ROOT_NODE
+        for segment in self.split_path(xpath):
+            segment_id = self.segment_ids.get(segment)
+            if segment_id is None:
+                segment_id = len(self.segments)
+                self.segments.append(segment)
+                self.segment_ids[segment] = segment_id
+            child = children.get((node, segment_id))
+            if child is None:
+                child = len(node_parents)
+                node_parents.append(node)
+                node_segments.append(segment_id)
+                children[(node, segment_id)] = child
+            node = child
+        return node
+
+    # Size in bytes of the index: the arrays, the interned segments (the list, the dictionary and the strings, shared by both)
+    # and the map names
+    def size_in_bytes(self):
+        arrays = [self.node_parents, self.node_segments, self.child_nodes, self.child_segments, self.child_start,
+                  self.posting_maps, self.posting_sources, self.posting_start]
+        size = sum(sys.getsizeof(values) for values in arrays)
+        size += sys.getsizeof(self.segments) + sys.getsizeof(self.segment_ids) + sum(sys.getsizeof(segment) for segment in self.segments)
+        size += sys.getsizeof(self.map_names) + sum(sys.getsizeof(map_name) for map_name in self.map_names)
+        return size
+
+    # Node id of a path, or None if the path is not in any map
+    def find_node(self, xpath):
+        node = self.ROOT_NODE
+        for segment in self.split_path(xpath):
+            segment_id = self.segment_ids.get(segment)
+            if segment_id is None:
+                return None
+            low = self.child_start[node]
+            high = self.child_start[node + 1]
+            position = bisect_left(self.child_segments, segment_id, low, high)
+            if position == high or self.child_segments[position] != segment_id:
+                return None
+            node = self.child_nodes[position]
+        return node
+
+    # Path of a node id
+    def node_path(self, node):
+        segments = []
+        while node != self.ROOT_NODE:
+            segments.append(self.segments[self.node_segments[node]])
+            node = self.node_parents[node]
+        return self.XPATH_SEPARATOR.join(reversed(segments))
+
+    # Postings of a node as a list of (map id, source node)
+    def node_postings(self, node):
+        return list(zip(self.posting_maps[self.posting_start[node]:self.posting_start[node + 1]],
+                        self.posting_sources[self.posting_start[node]:self.posting_start[node + 1]]))
+
+    # All the (map name, source path) converted to the given target path
+    def lookup(self, target_path):
+        node = self.find_node(target_path)
+        if node is None:
+            return []
+        return [(self.map_names[map_id], self.node_path(source_node)) for map_id, source_node in self.node_postings(node)]
+
+    # Impact analysis: all the (target path, map name, source path) converted to the given target path or to any of its descendants
+    def lookup_descendants(self, target_path):
+        node = self.find_node(target_path)
+        if node is None:
+            return []
+        results = []
+        nodes = [node]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            for map_id, source_node in self.node_postings(node):
+                results.append((self.node_path(node), self.map_names[map_id], self.node_path(source_node)))
+            nodes.extend(reversed(self.child_nodes[self.child_start[node]:self.child_start[node + 1]]))
+        return results
+
+    # Many-to-one collisions: target paths converted from more than one source path in the same map. The reverse conversion
+    # of those target paths is ambiguous. Yield (target path, map name, source paths).
+    def iter_collisions(self):
+        for node in range(len(self.node_parents)):
+            sources_by_map = {}
+            for map_id, source_node in self.node_postings(node):
+                sources_by_map.setdefault(map_id, set()).add(source_node)
+            for map_id, source_nodes in sources_by_map.items():
+                if len(source_nodes) > 1:
+                    yield self.node_path(node), self.map_names[map_id], sorted(self.node_path(source_node) for source_node in source_nodes)
+
+    # Main processing function
+    def process(self, queries, descendants=False):
+        self.log(f"Built the reverse index of {len(self.map_names)} maps of '{self.maps_directory}' in {self.build_seconds:.2f} s.")
+        self.log(f"{len(self.node_parents) - 1} path nodes, {len(self.segments)} segments, {len(self.posting_sources)} postings, {self.size_in_bytes() / (1024 * 1024):.2f} MB.")
+
+        os.makedirs('conversion_analysis', exist_ok=True)
+        output_file_name = 'conversion_analysis/reverse_index_collisions.csv'
+        collision_count = 0
+        with open(output_file_name, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow([self.TARGET_COLUMN, self.MAP_COLUMN, self.SOURCE_COLUMN])
+            for target_path, map_name, source_paths in self.iter_collisions():
+                writer.writerow([target_path, map_name, ' | '.join(source_paths)])
+                collision_count += 1
+        self.log(f"{collision_count} many-to-one collisions saved to '{output_file_name}'.")
+
+        for query in queries:
+            start = time.perf_counter()
+            results = self.lookup_descendants(query) if descendants else self.lookup(query)
+            elapsed_microseconds = (time.perf_counter() - start) * 1000000
+            self.log(f"{query} ({len(results)} results in {elapsed_microseconds:.0f} us):")
+            for result in results:
+                self.log('\t' + ' <= '.join(result) if descendants else f"\t{result[0]}: {result[1]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the reverse index (target path -> source paths) of all the conversion maps and report the many-to-one collisions.')
+    parser.add_argument('queries', type=str, nargs='*', help='Target paths to look up, e.g., Shipment/Header/ShipmentHeader/BillOfLadingNumber')
+    parser.add_argument('--maps_directory', type=str, default='conversion_maps', help='Directory containing the JSON conversion maps (default: conversion_maps)')
+    parser.add_argument('--descendants', action='store_true', default=False, help='Also look up the descendants of the target paths, for impact analysis (default: False)')
+    parser.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
+    args = parser.parse_args()
+
+    index = ReverseConversionIndex(args.maps_directory, args.log)
+    index.process(args.queries, args.descendants)
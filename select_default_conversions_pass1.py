@@ -1,8 +1,14 @@
 import datetime
 import os
 import re
+import sys
 import pandas as pd
 import argparse
+import pickle
+import tempfile
+from keystone_report_reader import KeystoneReportReader
+from decision_cache import DecisionCache
+from sqlite_report_store import SqliteReportStore
 
 class ConversionSelector:
     TYPE_COLUMN = 'TYPE' 
@@ -15,6 +21,10 @@ class ConversionSelector:
 
     IS_SELECTED_COLUMN = 'IS_SELECTED'
     VALIDATION_COLUMN = 'VALIDATION'
+
+    # Rule files of the input directory
+    RULE_FILES = ["./input/header_vs_order_level_rules_simplified.xlsx", "./input/do_not_normalized_rules.xlsx",
+                  "./input/donotmap_qualifiers_rules.xlsx"]
     HEADER = '/Header/'
     ORDER_LEVEL = '/OrderLevel/'
     ITEM_LEVEL = '/ItemLevel/'
@@ -27,12 +37,21 @@ class ConversionSelector:
     AMBIGUITY_WITH_REF_VS_PRODDESC = '_AMBIGUITY_WITH_REF_VS_PRODDESC'
     DO_NOT_MAP = 'DO NOT MAP'
 
-    def __init__(self, keystone_report, source, target, run_test=True, log=False):
+    # Columns set by the ambiguity resolution (see select_unique_path_with_cache)
+    DECISION_COLUMNS = [AMBIGUITY_WITH_ORDER_LEVEL_VS_ITEMLEVEL, AMBIGUITY_WITH_ORDER_LEVEL_VS_HEADER, AMBIGUITY_NORM_VS_QUAL,
+                        AMBIGUITY_WITH_ADDRESS_ALTNAME, AMBIGUITY_WITH_REF_VS_PRODDESC, IS_SELECTED_COLUMN]
+
+    # Table of the qualified fields that should not be mapped (SQLite mode only)
+    DO_NOT_MAP_TARGETS_TABLE = 'do_not_map_targets'
+
+    def __init__(self, keystone_report, source, target, run_test=True, log=False, streaming=False, cache=False, cache_size=DecisionCache.DEFAULT_MAX_ENTRIES, sqlite=False):
         self.keystone_report = keystone_report
         self.source = source
         self.target = target
         self.run_test = run_test
         self.log_enabled = log
+        self.streaming = streaming
+        self.sqlite = sqlite
         self.collected_target_not_to_map = []
 
         # Set the display options
@@ -47,19 +66,11 @@ class ConversionSelector:
         self.log_file_name = f"logfile_{self.timestamp}.log"
         os.makedirs('log', exist_ok=True)
 
-        # Load the data
-        self.df = pd.read_excel(self.keystone_report)
-
-        # Initialize columns
-        self.df[self.AMBIGUITY_WITH_ORDER_LEVEL_VS_ITEMLEVEL] = ''
-        self.df[self.AMBIGUITY_WITH_ORDER_LEVEL_VS_HEADER] = ''
-        self.df[self.AMBIGUITY_NORM_VS_QUAL] = ''
-        self.df[self.AMBIGUITY_WITH_ADDRESS_ALTNAME] = ''
-        self.df[self.AMBIGUITY_WITH_REF_VS_PRODDESC] = ''
-        self.df[self.DO_NOT_MAP] = ''
-        self.df[self.IS_SELECTED_COLUMN] = ''
-        if self.run_test:
-            self.df[self.VALIDATION_COLUMN] = ''
+        # Check the rule files before loading the report
+        missing_rule_files = [rule_file for rule_file in self.RULE_FILES if not os.path.exists(rule_file)]
+        if missing_rule_files:
+            self.log(f"Missing rule file(s): {', '.join(missing_rule_files)}. The first pass needs all the rule files of the input directory.")
+            sys.exit(1)
 
         # Load input files
         #
@@ -79,6 +90,36 @@ class ConversionSelector:
         self.do_not_map_qualifiers_rules_df = pd.read_excel("./input/donotmap_qualifiers_rules.xlsx")
         self.do_not_map_column = 'DO NOT MAP QUALS'
 
+        # Load the cache of the ambiguity decisions of the previous runs. The decisions depend on the rule files above and on
+        # this script: the cache is discarded when one of them changes.
+        self.decision_cache = None
+        if cache:
+            self.decision_cache = DecisionCache('pass1', self.RULE_FILES + [__file__], cache_size, self.log)
+
+        # Load the data. In streaming mode, the report is not loaded in memory: the groups of the report will be read one at a time.
+        # In SQLite mode, the report is loaded in an on-disk database, last, so the database is not left behind when the rules
+        # cannot be loaded (see process_sqlite).
+        if self.sqlite:
+            self.report_store = SqliteReportStore(self.keystone_report, self.added_columns())
+        elif self.streaming:
+            self.keystone_report_reader = KeystoneReportReader(self.keystone_report)
+        else:
+            self.df = pd.read_excel(self.keystone_report)
+            self.initialize_columns(self.df)
+
+    # Columns added to the report
+    def added_columns(self):
+        columns = [self.AMBIGUITY_WITH_ORDER_LEVEL_VS_ITEMLEVEL, self.AMBIGUITY_WITH_ORDER_LEVEL_VS_HEADER, self.AMBIGUITY_NORM_VS_QUAL,
+                   self.AMBIGUITY_WITH_ADDRESS_ALTNAME, self.AMBIGUITY_WITH_REF_VS_PRODDESC, self.DO_NOT_MAP, self.IS_SELECTED_COLUMN]
+        if self.run_test:
+            columns.append(self.VALIDATION_COLUMN)
+        return columns
+
+    # Initialize columns
+    def initialize_columns(self, df):
+        for column in self.added_columns():
+            df[column] = ''
+
     def log(self, message):
         if self.log_enabled:
             with open('log/' + self.log_file_name, 'a') as f:
@@ -303,6 +344,28 @@ class ConversionSelector:
             
         return data
 
+    # Select a unique path, reusing the decision of a previous run or of another conversion when there is one.
+    # Only the ambiguities are cached. A decision depends on the source path and on its target paths: it is the value of the
+    # decision columns of each row and the qualified fields that should not be mapped (collected_target_not_to_map).
+    def select_unique_path_with_cache(self, data):
+        if self.decision_cache is None or data[self.TYPE_COLUMN].iloc[0] == self.TYPE_COLUMN_VALUE_GROUP or len(data) == 1:
+            return self.select_unique_path(data)
+
+        key = DecisionCache.fingerprint(data[self.SOURCE_COLUMN].iloc[0], tuple(data[self.TARGET_COLUMN]))
+        decision = self.decision_cache.get(key)
+        if decision is None:
+            collected_count = len(self.collected_target_not_to_map)
+            data = self.select_unique_path(data)
+            decision = (tuple(tuple(data[column]) for column in self.DECISION_COLUMNS), tuple(self.collected_target_not_to_map[collected_count:]))
+            self.decision_cache.put(key, decision)
+            return data
+
+        column_values, target_not_to_map = decision
+        for column, values in zip(self.DECISION_COLUMNS, column_values):
+            data[column] = list(values)
+        self.collected_target_not_to_map.extend(target_not_to_map)
+        return data
+
     # Validate that all fields have been selected unambiguously 
     def check_errors(self, data):
         is_selected_column_has_selected_filter = data[self.IS_SELECTED_COLUMN] == 'YES'
@@ -315,30 +378,106 @@ class ConversionSelector:
             data[self.VALIDATION_COLUMN] = 'OK'
         return data
 
+    # Streaming version of the processing: the groups are read one at a time from the report. Because the rows that should not be 
+    # mapped are only known once all the groups are processed, the processed groups are first written to a temporary file. They 
+    # are then read back one at a time to indicate the rows that should not be mapped and saved to the Excel file.
+    # The rows of the Excel file are ordered by 'SOURCE_PATH'.
+    def process_streaming(self, output_file_name):
+        # Import here so the default processing does not depend on openpyxl
+        import openpyxl
+
+        with tempfile.TemporaryFile() as processed_groups_file:
+            columns = None
+            for data in self.keystone_report_reader.iter_groups():
+                self.initialize_columns(data)
+                data = self.select_unique_path_with_cache(data)
+                if self.run_test:
+                    data = self.check_errors(data)
+                columns = list(data.columns)
+                pickle.dump(data, processed_groups_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+            target_not_to_map = set(self.collected_target_not_to_map)
+
+            workbook = openpyxl.Workbook(write_only=True)
+            worksheet = workbook.create_sheet()
+            if columns is not None:
+                worksheet.append(columns)
+            processed_groups_file.seek(0)
+            while True:
+                try:
+                    data = pickle.load(processed_groups_file)
+                except EOFError:
+                    break
+
+                # Indicates all the rows that should not be mapped (captured dusring the ambiguity resolution)
+                data.loc[data[self.TARGET_COLUMN].isin(target_not_to_map), self.DO_NOT_MAP] = 'DO NOT MAP'
+                for row in data.itertuples(index=False):
+                    worksheet.append([None if pd.isna(value) else value for value in row])
+            workbook.save(output_file_name)
+
+    # SQLite version of the processing. The groups (all selected) and the source paths with a single target (selected) are 
+    # resolved with one SQL update. Only the ambiguities are read from the database, one group at a time, and resolved by 
+    # select_unique_path. Their decisions and the qualified fields that should not be mapped are written back to the database,
+    # the validation is computed with a window function over each source path and the report is saved in its original order.
+    def process_sqlite(self, output_file_name):
+        with self.report_store as store:
+            store.update_groups(f"{self.IS_SELECTED_COLUMN} = 'YES'",
+                                group_filter=f"{store.GROUP_TYPE_COLUMN} IS '{self.TYPE_COLUMN_VALUE_GROUP}' OR {store.GROUP_SIZE_COLUMN} = 1")
+
+            store.execute(f'CREATE TABLE {self.DO_NOT_MAP_TARGETS_TABLE} ({self.TARGET_COLUMN} PRIMARY KEY)')
+            for data in store.iter_groups(group_filter=f"{store.GROUP_TYPE_COLUMN} IS NOT '{self.TYPE_COLUMN_VALUE_GROUP}' AND {store.GROUP_SIZE_COLUMN} > 1"):
+                data = self.select_unique_path_with_cache(data)
+                store.stage_updates(self.DECISION_COLUMNS, zip(data.index, *(data[column] for column in self.DECISION_COLUMNS)))
+                store.executemany(f'INSERT OR IGNORE INTO {self.DO_NOT_MAP_TARGETS_TABLE} VALUES (?)', ((target,) for target in self.collected_target_not_to_map))
+                self.collected_target_not_to_map.clear()
+            store.apply_staged_updates(self.DECISION_COLUMNS)
+
+            # Validate that all fields have been selected unambiguously (see check_errors)
+            if self.run_test:
+                store.update_from_group_count(self.VALIDATION_COLUMN, f"{self.IS_SELECTED_COLUMN} = 'YES'",
+                                              "CASE WHEN SELECTED_COUNT = 0 THEN 'NO SELECTION' WHEN SELECTED_COUNT > 1 THEN 'MULTIPLE SELECTIONS' ELSE 'OK' END")
+
+            # Indicates all the rows that should not be mapped (captured dusring the ambiguity resolution)
+            store.execute(f'''UPDATE {store.TABLE} SET {store.quote(self.DO_NOT_MAP)} = 'DO NOT MAP'
+                              WHERE {self.TARGET_COLUMN} IN (SELECT {self.TARGET_COLUMN} FROM {self.DO_NOT_MAP_TARGETS_TABLE})''')
+
+            store.write_excel(output_file_name)
+
     # Main processing function
     def process(self):
         self.log(f"Analyzing the conversion ambiguities on the TARGET side of {self.source} to {self.target} conversion.")
         self.log("...")
         self.log("Processing...")
 
-        # Group by 'SOURCE_PATH' and apply the select_unique_path function to resolve the field's ambiguities
-        self.df = self.df.groupby(self.SOURCE_COLUMN, group_keys=False).apply(self.select_unique_path)
-        
-        # Group by 'SOURCE_PATH' and apply the check_errors function if requested
-        if self.run_test:
-            self.df = self.df.groupby(self.SOURCE_COLUMN, group_keys=False).apply(self.check_errors)
+        output_file_name = f'conversion_analysis/select_{self.TARGET_COLUMN.lower()}_field_ambiguities_of_{self.source}_to_{self.target}_conversion_pass1.xlsx'
 
-        # Indicates all the rows that should not be mapped (captured dusring the ambiguity resolution)
-        for value in self.collected_target_not_to_map:
-            row_index = self.df.loc[self.df[self.TARGET_COLUMN] == value].index
-            self.df.loc[row_index, self.DO_NOT_MAP] = 'DO NOT MAP'
+        if self.sqlite:
+            self.process_sqlite(output_file_name)
+        elif self.streaming:
+            self.process_streaming(output_file_name)
+        else:
+            # Group by 'SOURCE_PATH' and apply the select_unique_path function to resolve the field's ambiguities
+            self.df = self.df.groupby(self.SOURCE_COLUMN, group_keys=False).apply(self.select_unique_path_with_cache)
+            
+            # Group by 'SOURCE_PATH' and apply the check_errors function if requested
+            if self.run_test:
+                self.df = self.df.groupby(self.SOURCE_COLUMN, group_keys=False).apply(self.check_errors)
 
-        # Save the results to an Excel file
-        output_file_name = f'conversion_analysis/select_{self.TARGET_COLUMN.lower()}_field_ambiguities_of_{self.source}_to_{self.target}_conversion_pass1.xlsx'
-        self.df.to_excel(output_file_name, index=False)
+            # Indicates all the rows that should not be mapped (captured dusring the ambiguity resolution)
+            for value in self.collected_target_not_to_map:
+                row_index = self.df.loc[self.df[self.TARGET_COLUMN] == value].index
+                self.df.loc[row_index, self.DO_NOT_MAP] = 'DO NOT MAP'
+
+            # Save the results to an Excel file
+            self.df.to_excel(output_file_name, index=False)
+
+        if self.decision_cache is not None:
+            self.decision_cache.save()
+            self.log(f"Decision cache: {self.decision_cache.statistics()}")
 
         self.log("...")
         self.log(f"Processing complete. Results saved to '{output_file_name}'.")
+        return output_file_name
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Select default conversion for a source given a Keystone report.')
@@ -347,7 +486,11 @@ if __name__ == "__main__":
     parser.add_argument('target', type=str, help='Name and version of the canonical target, e.g., Shipment 7.7')
     parser.add_argument('--run_test', action='store_true', default=True, help='Run the test at the end (default: False)')
     parser.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
+    parser.add_argument('--streaming', action='store_true', default=False, help='Will read the report one group at a time instead of loading it in memory. (default: False)')
+    parser.add_argument('--cache', action='store_true', default=False, help='Will reuse the ambiguity decisions of the previous runs, saved in the cache subdirectory. (default: False)')
+    parser.add_argument('--cache_size', type=int, default=DecisionCache.DEFAULT_MAX_ENTRIES, help=f'Maximum number of decisions in the cache (default: {DecisionCache.DEFAULT_MAX_ENTRIES})')
+    parser.add_argument('--sqlite', action='store_true', default=False, help='Will load the report in an on-disk SQLite database instead of loading it in memory. (default: False)')
     args = parser.parse_args()
 
-    selector = ConversionSelector(args.keystone_report, args.source, args.target, args.run_test, args.log)
+    selector = ConversionSelector(args.keystone_report, args.source, args.target, args.run_test, args.log, args.streaming, args.cache, args.cache_size, args.sqlite)
     selector.process()
\ No newline at end of file
@@ -3,6 +3,9 @@ import os
 import re
 import pandas as pd
 import argparse
+from bisect import bisect_left
+from decision_cache import DecisionCache
+from sqlite_report_store import SqliteReportStore
 
 class GroupConversionSelector:
     # Constants for column names and values
@@ -19,12 +22,16 @@ class GroupConversionSelector:
     XPATH_SEPARATOR = '/'
     QUALIFIED_FIELD = '='
 
-    def __init__(self, keystone_report, source, target, run_test=True, log=False):
+    # Columns set by the group selection (see select_unique_group_with_cache)
+    DECISION_COLUMNS = [GROUP_IS_SELECTED_COLUMN, GROUP_NEEDS_PREDICATES]
+
+    def __init__(self, keystone_report, source, target, run_test=True, log=False, cache=False, cache_size=DecisionCache.DEFAULT_MAX_ENTRIES, sqlite=False):
         self.keystone_report = keystone_report
         self.source = source
         self.target = target
         self.run_test = run_test
         self.log_enabled = log
+        self.sqlite = sqlite
 
         # Set the display options for pandas
         pd.set_option('display.max_rows', None)
@@ -38,17 +45,31 @@ class GroupConversionSelector:
         self.log_file_name = f"logfile_{self.timestamp}.log"
         os.makedirs('log', exist_ok=True)
 
-        # Load the Keystone report data
-        self.df = pd.read_excel(self.keystone_report)
-        self.selected_field_df = self.df[(self.df[self.IS_SELECTED_COLUMN] == "YES") & 
-                                         (self.df[self.DO_NOT_MAP_COLUMN] != "DO NOT MAP") & 
-                                         (self.df[self.TYPE_COLUMN] != self.TYPE_COLUMN_VALUE_GROUP)]
-
-        # Initialize columns for group selection and validation
-        self.df[self.GROUP_IS_SELECTED_COLUMN] = ''
-        if self.run_test:
-            self.df[self.GROUP_VALIDATION_COLUMN] = ''
-        self.df[self.GROUP_NEEDS_PREDICATES] = ''
+        # Load the Keystone report data. In SQLite mode, the report is loaded in an on-disk database and the selected fields are
+        # queried from the database (see selected_field_condition).
+        if self.sqlite:
+            added_columns = [self.GROUP_IS_SELECTED_COLUMN] + ([self.GROUP_VALIDATION_COLUMN] if self.run_test else []) + [self.GROUP_NEEDS_PREDICATES]
+            self.report_store = SqliteReportStore(self.keystone_report, added_columns)
+        else:
+            self.df = pd.read_excel(self.keystone_report)
+            self.selected_field_df = self.df[(self.df[self.IS_SELECTED_COLUMN] == "YES") & 
+                                             (self.df[self.DO_NOT_MAP_COLUMN] != "DO NOT MAP") & 
+                                             (self.df[self.TYPE_COLUMN] != self.TYPE_COLUMN_VALUE_GROUP)]
+
+            # Initialize columns for group selection and validation
+            self.df[self.GROUP_IS_SELECTED_COLUMN] = ''
+            if self.run_test:
+                self.df[self.GROUP_VALIDATION_COLUMN] = ''
+            self.df[self.GROUP_NEEDS_PREDICATES] = ''
+
+        # Load the cache of the group decisions of the previous runs. The cache is discarded when this script changes.
+        # The selected fields are sorted by source path to find the fields under a group (see selected_fields_under).
+        self.decision_cache = None
+        if cache:
+            self.decision_cache = DecisionCache('pass2', [__file__], cache_size, self.log)
+        if cache and not self.sqlite:
+            self.selected_fields = sorted(zip(self.selected_field_df[self.SOURCE_COLUMN], self.selected_field_df[self.TARGET_COLUMN]))
+            self.selected_field_sources = [source_path for source_path, _ in self.selected_fields]
 
     def log(self, message):
         # Log messages to a file if logging is enabled
@@ -57,11 +78,24 @@ class GroupConversionSelector:
                 print(message, file=f)
         print(message)
 
+    def selected_field_condition(self):
+        # SQL condition of the selected fields (same as selected_field_df)
+        return (f"{self.IS_SELECTED_COLUMN} = 'YES' AND {SqliteReportStore.quote(self.DO_NOT_MAP_COLUMN)} IS NOT 'DO NOT MAP' AND "
+                f"{self.TYPE_COLUMN} IS NOT '{self.TYPE_COLUMN_VALUE_GROUP}'")
+
     def is_parent_of_a_selected_field(self, source_search_string, target_search_string):
         # Regular expression to match the pattern where search_string is the direct parent of a leaf
         source_pattern = re.compile(rf"^{re.escape(source_search_string)}(\[.*?\])?/[^/]+$")
         target_pattern = re.compile(rf"^{re.escape(target_search_string)}(\[.*?\])?/[^/]+$")
 
+        # In SQLite mode, the index on the source path restricts the search to the source paths starting with search_string
+        if self.sqlite:
+            return self.report_store.execute(f'''
+                SELECT EXISTS (SELECT 1 FROM {self.report_store.TABLE}
+                               WHERE {self.selected_field_condition()} AND {self.SOURCE_COLUMN} >= ? AND {self.SOURCE_COLUMN} < ?
+                                     AND {self.SOURCE_COLUMN} REGEXP ? AND {self.TARGET_COLUMN} REGEXP ?)''',
+                (source_search_string, source_search_string + self.report_store.PREFIX_END, source_pattern.pattern, target_pattern.pattern)).fetchone()[0] == 1
+
         # Check if any value in the target_column matches the pattern
         return self.selected_field_df.apply(lambda row: bool(source_pattern.match(row[self.SOURCE_COLUMN])) and 
                                             bool(target_pattern.match(row[self.TARGET_COLUMN])), axis=1).any()
@@ -102,7 +136,7 @@ class GroupConversionSelector:
                     data.loc[index, self.GROUP_IS_SELECTED_COLUMN] = 'NO'
 
             # If group is selected and there are multiple selections, check if the group needs predicates
-            if group_selected_count > 1 and self.selected_field_df[self.SOURCE_COLUMN].str.startswith(groupby_value + '[').any():
+            if group_selected_count > 1 and self.has_selected_field_with_predicate(groupby_value):
                 data[self.GROUP_NEEDS_PREDICATES] = 'YES'
             else: # in all otehr cases, the group does not need predicates. We will simplify the paths.
                 data[self.GROUP_NEEDS_PREDICATES] = 'NO'
@@ -111,23 +145,95 @@ class GroupConversionSelector:
             data[self.GROUP_IS_SELECTED_COLUMN] = 'YES'
         return data
 
+    def has_selected_field_with_predicate(self, source_search_string):
+        # Check if a selected field is under a predicate of the given source path
+        if self.sqlite:
+            return self.report_store.execute(f'''
+                SELECT EXISTS (SELECT 1 FROM {self.report_store.TABLE}
+                               WHERE {self.selected_field_condition()} AND {self.SOURCE_COLUMN} >= ? AND {self.SOURCE_COLUMN} < ?)''',
+                (source_search_string + '[', source_search_string + '[' + self.report_store.PREFIX_END)).fetchone()[0] == 1
+        return self.selected_field_df[self.SOURCE_COLUMN].str.startswith(source_search_string + '[').any()
+
+    def selected_fields_under(self, source_search_string):
+        # Selected fields (source, target) whose source path starts with the given source path
+        if self.sqlite:
+            return self.report_store.execute(f'''
+                SELECT {self.SOURCE_COLUMN}, {self.TARGET_COLUMN} FROM {self.report_store.TABLE}
+                WHERE {self.selected_field_condition()} AND {self.SOURCE_COLUMN} >= ? AND {self.SOURCE_COLUMN} < ?
+                ORDER BY {self.SOURCE_COLUMN}, {self.TARGET_COLUMN}''',
+                (source_search_string, source_search_string + self.report_store.PREFIX_END)).fetchall()
+        low = bisect_left(self.selected_field_sources, source_search_string)
+        high = bisect_left(self.selected_field_sources, source_search_string + '\uffff', low)
+        return self.selected_fields[low:high]
+
+    def select_unique_group_with_cache(self, data):
+        # Select a unique group, reusing the decision of a previous run or of another conversion when there is one.
+        # Only the ambiguous groups are cached. A decision depends on the group source path, its target paths, the selected
+        # fields directly under the group (see is_parent_of_a_selected_field) and whether a selected field under the group
+        # has a predicate on it.
+        if self.decision_cache is None or data[self.TYPE_COLUMN].iloc[0] != self.TYPE_COLUMN_VALUE_GROUP or len(data) == 1:
+            return self.select_unique_group(data)
+
+        groupby_value = data[self.SOURCE_COLUMN].iloc[0]
+        selected_fields_under_group = self.selected_fields_under(groupby_value)
+        source_pattern = re.compile(rf"^{re.escape(groupby_value)}(\[.*?\])?/[^/]+$")
+        key = DecisionCache.fingerprint(groupby_value, tuple(data[self.TARGET_COLUMN]),
+                                        tuple(field for field in selected_fields_under_group if source_pattern.match(field[0])),
+                                        any(source_path.startswith(groupby_value + '[') for source_path, _ in selected_fields_under_group))
+        decision = self.decision_cache.get(key)
+        if decision is None:
+            data = self.select_unique_group(data)
+            self.decision_cache.put(key, tuple(tuple(data[column]) for column in self.DECISION_COLUMNS))
+            return data
+
+        for column, values in zip(self.DECISION_COLUMNS, decision):
+            data[column] = list(values)
+        return data
+
+    def process_sqlite(self, output_file_name):
+        # SQLite version of the processing. The source paths that are not ambiguous groups are selected with one SQL update. Only the
+        # ambiguous groups are read from the database, one at a time, and resolved by select_unique_group. The validation is
+        # computed with a window function over each source path and the report is saved in its original order.
+        with self.report_store as store:
+            store.update_groups(f"{self.GROUP_NEEDS_PREDICATES} = 'NO', {self.GROUP_IS_SELECTED_COLUMN} = 'YES'",
+                                group_filter=f"{store.GROUP_TYPE_COLUMN} IS NOT '{self.TYPE_COLUMN_VALUE_GROUP}' OR {store.GROUP_SIZE_COLUMN} = 1")
+
+            for data in store.iter_groups(group_filter=f"{store.GROUP_TYPE_COLUMN} IS '{self.TYPE_COLUMN_VALUE_GROUP}' AND {store.GROUP_SIZE_COLUMN} > 1"):
+                data = self.select_unique_group_with_cache(data)
+                store.stage_updates(self.DECISION_COLUMNS, zip(data.index, *(data[column] for column in self.DECISION_COLUMNS)))
+            store.apply_staged_updates(self.DECISION_COLUMNS)
+
+            if self.run_test:
+                store.update_from_group_count(self.GROUP_VALIDATION_COLUMN, f"{self.GROUP_IS_SELECTED_COLUMN} = 'YES'",
+                                              "CASE WHEN SELECTED_COUNT = 0 THEN 'NO SELECTION' WHEN SELECTED_COUNT > 1 THEN 'MULTIPLE SELECTIONS' ELSE 'OK' END")
+
+            store.write_excel(output_file_name)
+
     def process(self):
         # Main processing function
         self.log("Processing...")
 
-        # Apply the selection logic
-        self.df = self.df.groupby(self.SOURCE_COLUMN, group_keys=False).apply(self.select_unique_group)
+        output_file_name = f'conversion_analysis/select_{self.TARGET_COLUMN.lower()}_ambiguous_group_of_{self.source}_to_{self.target}_conversion_pass2.xlsx'
+        if self.sqlite:
+            self.process_sqlite(output_file_name)
+        else:
+            # Apply the selection logic
+            self.df = self.df.groupby(self.SOURCE_COLUMN, group_keys=False).apply(self.select_unique_group_with_cache)
 
-        # Group by 'SOURCE_PATH' and apply the check_errors function
-        if self.run_test:
-            self.df = self.df.groupby(self.SOURCE_COLUMN, group_keys=False).apply(self.check_errors)
+            # Group by 'SOURCE_PATH' and apply the check_errors function
+            if self.run_test:
+                self.df = self.df.groupby(self.SOURCE_COLUMN, group_keys=False).apply(self.check_errors)
 
-        # Save the results to an Excel file
-        output_file_name = f'conversion_analysis/select_{self.TARGET_COLUMN.lower()}_ambiguous_group_of_{self.source}_to_{self.target}_conversion_pass2.xlsx'
-        self.df.to_excel(output_file_name, index=False)
+            # Save the results to an Excel file
+            self.df.to_excel(output_file_name, index=False)
+
+        if self.decision_cache is not None:
+            self.decision_cache.save()
+            self.log(f"Decision cache: {self.decision_cache.statistics()}")
 
         self.log("...")
         self.log(f"Processing complete. Results saved to '{output_file_name}'.")
+        return output_file_name
 
 if __name__ == "__main__":
     # Argument parser for command-line arguments
@@ -137,8 +243,11 @@ if __name__ == "__main__":
     parser.add_argument('target', type=str, help='Name and version of the canonical target, e.g., Shipment 7.7')
     parser.add_argument('--run_test', action='store_true', default=True, help='Run the test at the end (default: False)')
     parser.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
+    parser.add_argument('--cache', action='store_true', default=False, help='Will reuse the group decisions of the previous runs, saved in the cache subdirectory. (default: False)')
+    parser.add_argument('--cache_size', type=int, default=DecisionCache.DEFAULT_MAX_ENTRIES, help=f'Maximum number of decisions in the cache (default: {DecisionCache.DEFAULT_MAX_ENTRIES})')
+    parser.add_argument('--sqlite', action='store_true', default=False, help='Will load the report in an on-disk SQLite database instead of loading it in memory. (default: False)')
     args = parser.parse_args()
 
     # Create an instance of the GroupConversionSelector class and run the process
-    selector = GroupConversionSelector(args.keystone_report, args.source, args.target, args.run_test, args.log)
+    selector = GroupConversionSelector(args.keystone_report, args.source, args.target, args.run_test, args.log, args.cache, args.cache_size, args.sqlite)
     selector.process()
\ No newline at end of file
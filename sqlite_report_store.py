@@ -0,0 +1,185 @@
+import os
+import re
+import sqlite3
+import tempfile
+from itertools import chain, groupby
+import pandas as pd
+from keystone_report_reader import KeystoneReportReader
+
+class SqliteReportStore:
+    # Constants
+    TABLE = 'report'
+    STAGED_UPDATES_TABLE = 'staged_updates'
+    ROW_ID_COLUMN = 'ROW_ID'
+    TYPE_COLUMN = 'TYPE'
+    SOURCE_COLUMN = 'SOURCE_PATH'
+    TARGET_COLUMN = 'TARGET_PATH'
+    GROUP_SIZE_COLUMN = 'GROUP_SIZE'
+    GROUP_TYPE_COLUMN = 'GROUP_TYPE'
+
+    # Number of rows inserted or updated at a time
+    BATCH_SIZE = 10000
+
+    # Memory of the SQLite page cache, in KB. The database is on disk: the memory does not depend on the size of the report.
+    CACHE_SIZE_KB = 65536
+
+    # Greater than any character of a path: the paths starting with a prefix are the paths in [prefix, prefix + PREFIX_END)
+    PREFIX_END = chr(0x10FFFF)
+
+    # Keystone report loaded in an on-disk SQLite database, for the reports that do not fit in memory with pandas.
+    # The report is streamed from the Excel or CSV file into the table "report", with its row number (ROW_ID) and the columns
+    # added by the pass (initialized to ''). The source path (with the row number, to keep the order of the rows of a group)
+    # and the target path are indexed. The database is a temporary file, deleted by close(), also when the load fails. The store
+    # is a context manager: "with store:" closes it when the processing ends, even on an error.
+    def __init__(self, keystone_report, added_columns=()):
+        self.keystone_report = keystone_report
+
+        database_handle, self.database_file_name = tempfile.mkstemp(suffix='.sqlite')
+        os.close(database_handle)
+        self.connection = None
+        try:
+            self.connection = sqlite3.connect(self.database_file_name)
+            self.connection.execute('PRAGMA journal_mode = OFF')
+            self.connection.execute('PRAGMA synchronous = OFF')
+            self.connection.execute('PRAGMA temp_store = FILE')
+            self.connection.execute(f'PRAGMA cache_size = -{self.CACHE_SIZE_KB}')
+            self.connection.create_function('REGEXP', 2, self.regexp, deterministic=True)
+
+            self.load(added_columns)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+    @staticmethod
+    def quote(column):
+        return '"' + column.replace('"', '""') + '"'
+
+    # SQLite calls "X REGEXP Y" as REGEXP(Y, X)
+    @staticmethod
+    def regexp(pattern, value):
+        return value is not None and re.match(pattern, value) is not None
+
+    def load(self, added_columns):
+        reader = KeystoneReportReader(self.keystone_report)
+        rows = reader.iter_rows()
+        first_row = next(rows, None)
+        self.report_columns = list(reader.columns)
+        self.added_columns = [column for column in added_columns if column not in self.report_columns]
+        self.columns = self.report_columns + self.added_columns
+
+        column_definitions = [f'{self.ROW_ID_COLUMN} INTEGER PRIMARY KEY'] + [self.quote(column) for column in self.report_columns]
+        column_definitions += [f"{self.quote(column)} DEFAULT ''" for column in self.added_columns]
+        self.connection.execute(f'CREATE TABLE {self.TABLE} ({", ".join(column_definitions)})')
+
+        insert_columns = [self.ROW_ID_COLUMN] + [self.quote(column) for column in self.report_columns]
+        insert_statement = f'INSERT INTO {self.TABLE} ({", ".join(insert_columns)}) VALUES ({", ".join("?" * len(insert_columns))})'
+
+        batch = []
+        if first_row is not None:
+            for row_number, row in enumerate(chain([first_row], rows)):
+                batch.append((row_number,) + row)
+                if len(batch) == self.BATCH_SIZE:
+                    self.connection.executemany(insert_statement, batch)
+                    batch = []
+        if len(batch) > 0:
+            self.connection.executemany(insert_statement, batch)
+
+        self.connection.execute(f'CREATE INDEX source_index ON {self.TABLE} ({self.SOURCE_COLUMN}, {self.ROW_ID_COLUMN})')
+        self.connection.execute(f'CREATE INDEX target_index ON {self.TABLE} ({self.TARGET_COLUMN})')
+        self.connection.commit()
+
+    def execute(self, statement, parameters=()):
+        return self.connection.execute(statement, parameters)
+
+    def executemany(self, statement, parameters):
+        return self.connection.executemany(statement, parameters)
+
+    # Query of the rows whose source path group is selected by group_filter. group_filter can use GROUP_SIZE (the number of
+    # rows of the group) and GROUP_TYPE (the type of the first row of the group), both computed with window functions.
+    # row_filter selects the rows of the groups.
+    def grouped_rows_query(self, selected_columns, row_filter='1', group_filter='1'):
+        return f'''
+            SELECT {selected_columns} FROM (
+                SELECT *,
+                       COUNT(*) OVER source_group AS {self.GROUP_SIZE_COLUMN},
+                       FIRST_VALUE({self.TYPE_COLUMN}) OVER source_group AS {self.GROUP_TYPE_COLUMN}
+                FROM {self.TABLE}
+                WHERE {self.SOURCE_COLUMN} IS NOT NULL AND ({row_filter})
+                WINDOW source_group AS (PARTITION BY {self.SOURCE_COLUMN} ORDER BY {self.ROW_ID_COLUMN}
+                                        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING))
+            WHERE {group_filter}'''
+
+    # Stream the groups of rows having the same source path, in the order of pandas' groupby (sorted by source path, the rows of
+    # a group in the order of the report). Each group is a DataFrame indexed by ROW_ID with the columns of the report.
+    def iter_groups(self, row_filter='1', group_filter='1', parameters=()):
+        quoted_columns = ', '.join(self.quote(column) for column in self.columns)
+        statement = self.grouped_rows_query(f'{self.ROW_ID_COLUMN}, {quoted_columns}', row_filter, group_filter)
+        statement += f' ORDER BY {self.SOURCE_COLUMN}, {self.ROW_ID_COLUMN}'
+        source_index = self.columns.index(self.SOURCE_COLUMN) + 1
+        for _, rows in groupby(self.connection.execute(statement, parameters), key=lambda row: row[source_index]):
+            rows = list(rows)
+            yield pd.DataFrame([row[1:] for row in rows], columns=self.columns, index=[row[0] for row in rows])
+
+    # Set the columns of all the rows of the groups selected by group_filter (see grouped_rows_query)
+    def update_groups(self, assignments, row_filter='1', group_filter='1', parameters=()):
+        self.connection.execute(f'''
+            UPDATE {self.TABLE} SET {assignments}
+            WHERE {self.ROW_ID_COLUMN} IN ({self.grouped_rows_query(self.ROW_ID_COLUMN, row_filter, group_filter)})''', parameters)
+        self.connection.commit()
+
+    # Set a column from the number of rows of each source path group matching a condition (e.g. the number of selected rows),
+    # counted with a window function. value_expression uses that number as SELECTED_COUNT.
+    def update_from_group_count(self, column, condition, value_expression):
+        self.connection.execute(f'''
+            UPDATE {self.TABLE} SET {self.quote(column)} = counts.{self.quote(column)}
+            FROM (SELECT {self.ROW_ID_COLUMN}, {value_expression} AS {self.quote(column)}
+                  FROM (SELECT {self.ROW_ID_COLUMN}, SUM({condition}) OVER (PARTITION BY {self.SOURCE_COLUMN}) AS SELECTED_COUNT
+                        FROM {self.TABLE} WHERE {self.SOURCE_COLUMN} IS NOT NULL)) AS counts
+            WHERE {self.TABLE}.{self.ROW_ID_COLUMN} = counts.{self.ROW_ID_COLUMN}''')
+        self.connection.commit()
+
+    # Keep the new values of columns of some rows, given as (ROW_ID, value of each column) tuples. They are applied to the
+    # report by apply_staged_updates, so the report is not modified while its groups are read.
+    def stage_updates(self, columns, rows):
+        quoted_columns = [self.quote(column) for column in columns]
+        self.connection.execute(f'CREATE TABLE IF NOT EXISTS {self.STAGED_UPDATES_TABLE} ({self.ROW_ID_COLUMN} INTEGER PRIMARY KEY, {", ".join(quoted_columns)})')
+        self.connection.executemany(f'INSERT OR REPLACE INTO {self.STAGED_UPDATES_TABLE} VALUES ({", ".join("?" * (len(columns) + 1))})', rows)
+
+    def apply_staged_updates(self, columns):
+        if self.connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = ?", (self.STAGED_UPDATES_TABLE,)).fetchone()[0] == 0:
+            return
+        assignments = ', '.join(f'{self.quote(column)} = staged.{self.quote(column)}' for column in columns)
+        self.connection.execute(f'''
+            UPDATE {self.TABLE} SET {assignments}
+            FROM {self.STAGED_UPDATES_TABLE} AS staged
+            WHERE {self.TABLE}.{self.ROW_ID_COLUMN} = staged.{self.ROW_ID_COLUMN}''')
+        self.connection.execute(f'DROP TABLE {self.STAGED_UPDATES_TABLE}')
+        self.connection.commit()
+
+    # Save the rows having a source path (like pandas' groupby does) to an Excel file, in the order of the report.
+    # The workbook is written in write-only mode, so the rows are never all in memory.
+    def write_excel(self, output_file_name):
+        # Import here so the database does not depend on openpyxl
+        import openpyxl
+
+        workbook = openpyxl.Workbook(write_only=True)
+        worksheet = workbook.create_sheet()
+        worksheet.append(self.columns)
+        quoted_columns = ', '.join(self.quote(column) for column in self.columns)
+        for row in self.connection.execute(f'SELECT {quoted_columns} FROM {self.TABLE} WHERE {self.SOURCE_COLUMN} IS NOT NULL ORDER BY {self.ROW_ID_COLUMN}'):
+            worksheet.append(row)
+        workbook.save(output_file_name)
+
+    # Close the database and delete its file. Closing twice does nothing.
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        if os.path.exists(self.database_file_name):
+            os.remove(self.database_file_name)
@@ -0,0 +1,271 @@
+import argparse
+import datetime
+import heapq
+import os
+import re
+import sys
+import time
+from collections import Counter
+import pandas as pd
+from xsd_path_graph import XsdPathGraph
+
+class TargetPathSuggester:
+    # Constants for column names and values
+    TYPE_COLUMN = 'TYPE'
+    TYPE_COLUMN_VALUE_GROUP = 'GROUP'
+    SOURCE_COLUMN = 'SOURCE_PATH'
+    TARGET_COLUMN = 'TARGET_PATH'
+    IS_SELECTED_COLUMN = 'IS_SELECTED'
+    GROUP_IS_SELECTED_COLUMN = 'GROUP_IS_SELECTED'
+    VALIDATION_COLUMN = 'VALIDATION'
+    GROUP_VALIDATION_COLUMN = 'GROUP_VALIDATION'
+    FAILED_VALIDATIONS = ['NO SELECTION', 'MULTIPLE SELECTIONS']
+
+    SUGGESTIONS_SHEET = 'SUGGESTIONS'
+    RANK_COLUMN = 'RANK'
+    SUGGESTED_TARGET_COLUMN = 'SUGGESTED_TARGET_PATH'
+    SCORE_COLUMN = 'SCORE'
+    LEAF_SIMILARITY_COLUMN = 'LEAF_SIMILARITY'
+    LEVEL_MATCH_COLUMN = 'LEVEL_MATCH'
+    QUALIFIER_MATCH_COLUMN = 'QUALIFIER_MATCH'
+    CURRENT_TARGET_COLUMN = 'CURRENT_TARGET'
+
+    XPATH_SEPARATOR = '/'
+
+    # Weights of the leaf similarity, the structural level and the qualifier match in the score of a candidate
+    LEAF_WEIGHT = 0.6
+    LEVEL_WEIGHT = 0.25
+    QUALIFIER_WEIGHT = 0.15
+
+    # Structural levels of the source and target canonicals. The order level is the header of the order: the Header of the
+    # sources is converted to the Shipment Header or to the OrderLevel.
+    LEVEL_NODES = {'Header': 'Header', 'OrderLevel': 'Header', 'ContainerLevel': 'ContainerLevel', 'Pallet': 'PackLevel', 'Pack': 'PackLevel',
+                   'PackLevel': 'PackLevel', 'Item': 'ItemLevel', 'ItemLevel': 'ItemLevel'}
+
+    # Predicates of a path. Example: [AddressTypeCode='ST']
+    PREDICATE_PATTERN = re.compile(r"\[([^=\]]+)='([^']*)'\]")
+
+    # Words of a node name. Example: AddressAlternateName -> address, alternate, name
+    WORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+    def __init__(self, analysis_workbook, xsd_file='xsd/Shipments.xsd', top_k=5, log=False):
+        self.analysis_workbook = analysis_workbook
+        self.xsd_file = xsd_file
+        self.top_k = top_k
+        self.log_enabled = log
+
+        # Create the file name with the timestamp
+        current_time = datetime.datetime.now()
+        self.timestamp = current_time.strftime("%Y%m%d_%H%M%S")
+        self.log_file_name = f"logfile_{self.timestamp}.log"
+        os.makedirs('log', exist_ok=True)
+
+        self.df = pd.read_excel(self.analysis_workbook)
+
+        # The validation is recomputed from the selections when the passes were run without --run_test
+        if self.VALIDATION_COLUMN not in self.df.columns and self.IS_SELECTED_COLUMN not in self.df.columns:
+            self.log(f"'{self.analysis_workbook}' has neither a {self.VALIDATION_COLUMN} nor an {self.IS_SELECTED_COLUMN} column. "
+                     f"It must be the analysis workbook of the first or second pass.")
+            sys.exit(1)
+
+    def log(self, message):
+        if self.log_enabled:
+            with open('log/' + self.log_file_name, 'a') as f:
+                print(message, file=f)
+        print(message)
+
+    # Remove the predicates of a path
+    def remove_predicates(self, xpath):
+        return self.PREDICATE_PATTERN.sub('', xpath)
+
+    # Character trigrams of a node name, with the boundaries of the name
+    def trigrams(self, name):
+        padded = f"##{name.lower()}#"
+        return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    def words(self, name):
+        return frozenset(word.lower() for word in self.WORD_PATTERN.findall(name))
+
+    # Similarity of two sets (Dice coefficient) from the size of their intersection
+    def dice(self, common_count, count, other_count):
+        if count + other_count == 0:
+            return 0.0
+        return 2.0 * common_count / (count + other_count)
+
+    # Structural levels of a path. Example: ShippingLabel/Pack/Pack/Item/Dates/Date -> ('PackLevel', 'PackLevel', 'ItemLevel').
+    # The header is only kept for the paths that are not under a pack or an item.
+    def levels(self, xpath):
+        levels = tuple(self.LEVEL_NODES[node] for node in self.remove_predicates(xpath).split(self.XPATH_SEPARATOR)[:-1] if node in self.LEVEL_NODES)
+        pack_and_item_levels = tuple(level for level in levels if level != 'Header')
+        return pack_and_item_levels if len(pack_and_item_levels) > 0 else levels[:1]
+
+    def level_match(self, source_levels, target_levels):
+        if source_levels == target_levels:
+            return 1.0
+        common_count = 0
+        for source_level, target_level in zip(source_levels, target_levels):
+            if source_level != target_level:
+                break
+            common_count += 1
+        return common_count / max(len(source_levels), len(target_levels))
+
+    # 1 when the candidate has the same predicates as the source, 0.5 when it has the same qualifiers with other values
+    def qualifier_match(self, source_predicates, target_predicates):
+        if source_predicates == target_predicates:
+            return 1.0
+        if len(source_predicates) > 0 and set(qualifier for qualifier, _ in source_predicates) == set(qualifier for qualifier, _ in target_predicates):
+            return 0.5
+        return 0.0
+
+    # Build the candidate target paths and their inverted index.
+    # The candidates are all the paths of the target XSD (without predicates) and all the target paths of the workbook (with
+    # their predicates). The leaf names of the candidates are indexed by trigram and by word: the similarity of a source leaf
+    # with every indexed leaf is computed from the postings, without comparing the source leaf with all the candidates.
+    def build_index(self):
+        graph = XsdPathGraph(self.xsd_file)
+        xsd_paths = graph.expand()
+        group_paths = set(xsd_path.rsplit(self.XPATH_SEPARATOR, 1)[0] for xsd_path in xsd_paths)
+        candidate_types = {xsd_path: xsd_path in group_paths for xsd_path in xsd_paths}
+        for target_path, type_value in zip(self.df[self.TARGET_COLUMN], self.df[self.TYPE_COLUMN]):
+            if isinstance(target_path, str):
+                candidate_types.setdefault(target_path, type_value == self.TYPE_COLUMN_VALUE_GROUP)
+
+        # Candidates of each leaf name, with their structural levels and predicates, split between groups and fields
+        self.leaf_names = []
+        self.leaf_ids = {}
+        self.candidates_by_leaf = []
+        for candidate_path, is_group in candidate_types.items():
+            leaf_name = self.remove_predicates(candidate_path).split(self.XPATH_SEPARATOR)[-1]
+            leaf_id = self.leaf_ids.get(leaf_name)
+            if leaf_id is None:
+                leaf_id = len(self.leaf_names)
+                self.leaf_names.append(leaf_name)
+                self.leaf_ids[leaf_name] = leaf_id
+                self.candidates_by_leaf.append(([], []))
+            candidate = (candidate_path, self.levels(candidate_path), frozenset(self.PREDICATE_PATTERN.findall(candidate_path)))
+            self.candidates_by_leaf[leaf_id][0 if is_group else 1].append(candidate)
+
+        self.leaf_trigrams = [self.trigrams(leaf_name) for leaf_name in self.leaf_names]
+        self.leaf_words = [self.words(leaf_name) for leaf_name in self.leaf_names]
+        self.trigram_postings = {}
+        self.word_postings = {}
+        for leaf_id in range(len(self.leaf_names)):
+            for trigram in self.leaf_trigrams[leaf_id]:
+                self.trigram_postings.setdefault(trigram, []).append(leaf_id)
+            for word in self.leaf_words[leaf_id]:
+                self.word_postings.setdefault(word, []).append(leaf_id)
+        return len(candidate_types)
+
+    # Similarity of a source leaf name with the indexed leaf names that share at least a trigram: the average of the
+    # trigram and word similarities. Returns a list of (similarity, leaf id).
+    def leaf_similarities(self, leaf_name):
+        trigrams = self.trigrams(leaf_name)
+        words = self.words(leaf_name)
+        common_trigrams = Counter()
+        for trigram in trigrams:
+            common_trigrams.update(self.trigram_postings.get(trigram, ()))
+        common_words = Counter()
+        for word in words:
+            common_words.update(self.word_postings.get(word, ()))
+        return [((self.dice(common_count, len(trigrams), len(self.leaf_trigrams[leaf_id])) +
+                  self.dice(common_words[leaf_id], len(words), len(self.leaf_words[leaf_id]))) / 2, leaf_id)
+                for leaf_id, common_count in common_trigrams.items()]
+
+    # Top k candidates of a source path. The leaf names are visited by decreasing similarity and the visit stops when the
+    # best possible score of the next leaf name (its similarity with a perfect level and qualifier match) cannot enter the top k.
+    # For the same score, the current target paths of the source path come first, then the shortest paths.
+    def suggest(self, source_path, is_group, current_target_paths=()):
+        source_leaf_name = self.remove_predicates(source_path).split(self.XPATH_SEPARATOR)[-1]
+        source_levels = self.levels(source_path)
+        source_predicates = frozenset(self.PREDICATE_PATTERN.findall(source_path))
+
+        top_candidates = []
+        for leaf_similarity, leaf_id in sorted(self.leaf_similarities(source_leaf_name), reverse=True):
+            if len(top_candidates) == self.top_k and self.LEAF_WEIGHT * leaf_similarity + self.LEVEL_WEIGHT + self.QUALIFIER_WEIGHT < top_candidates[0][0]:
+                break
+            for candidate_path, candidate_levels, candidate_predicates in self.candidates_by_leaf[leaf_id][0 if is_group else 1]:
+                level_match = self.level_match(source_levels, candidate_levels)
+                qualifier_match = self.qualifier_match(source_predicates, candidate_predicates)
+                score = self.LEAF_WEIGHT * leaf_similarity + self.LEVEL_WEIGHT * level_match + self.QUALIFIER_WEIGHT * qualifier_match
+                suggestion = (score, candidate_path in current_target_paths, -candidate_path.count(self.XPATH_SEPARATOR), candidate_path,
+                              leaf_similarity, level_match, qualifier_match)
+                if len(top_candidates) < self.top_k:
+                    heapq.heappush(top_candidates, suggestion)
+                elif suggestion > top_candidates[0]:
+                    heapq.heapreplace(top_candidates, suggestion)
+        return sorted(top_candidates, reverse=True)
+
+    # Validation of the rows of each source path from the number of selected rows, as checked by the passes with --run_test
+    def validation_from_selections(self, is_selected_column):
+        selected_count = (self.df[is_selected_column] == 'YES').groupby(self.df[self.SOURCE_COLUMN]).transform('sum')
+        validation = pd.Series('OK', index=self.df.index)
+        validation[selected_count == 0] = 'NO SELECTION'
+        validation[selected_count > 1] = 'MULTIPLE SELECTIONS'
+        return validation
+
+    # Validation of a pass: the column of the workbook, or the validation recomputed from the selections when the pass
+    # was run without --run_test
+    def validation(self, validation_column, is_selected_column):
+        if validation_column in self.df.columns:
+            return self.df[validation_column]
+        if is_selected_column in self.df.columns:
+            self.log(f"No {validation_column} column in the workbook: it is recomputed from {is_selected_column}.")
+            return self.validation_from_selections(is_selected_column)
+        return None
+
+    # Source paths whose selection failed, with their validation and their current target paths. For the groups, the
+    # validation of the second pass (GROUP_VALIDATION) is used when the workbook has it.
+    def failing_groups(self):
+        validation = self.validation(self.VALIDATION_COLUMN, self.IS_SELECTED_COLUMN)
+        group_validation = self.validation(self.GROUP_VALIDATION_COLUMN, self.GROUP_IS_SELECTED_COLUMN)
+        if group_validation is not None:
+            is_group = self.df[self.TYPE_COLUMN] == self.TYPE_COLUMN_VALUE_GROUP
+            validation = validation.where(~is_group, group_validation)
+        failing_df = self.df[validation.isin(self.FAILED_VALIDATIONS)].assign(**{self.VALIDATION_COLUMN: validation})
+        for source_path, data in failing_df.groupby(self.SOURCE_COLUMN, sort=False):
+            yield source_path, data[self.TYPE_COLUMN].iloc[0], data[self.VALIDATION_COLUMN].iloc[0], set(data[self.TARGET_COLUMN])
+
+    # Main processing function
+    def process(self):
+        self.log(f"Suggesting target paths for the failing selections of '{self.analysis_workbook}'.")
+        self.log("...")
+        self.log("Processing...")
+
+        start = time.perf_counter()
+        candidate_count = self.build_index()
+        self.log(f"Indexed {candidate_count} candidate target paths ({len(self.leaf_names)} leaf names) in {time.perf_counter() - start:.2f} s.")
+
+        start = time.perf_counter()
+        rows = []
+        group_count = 0
+        for source_path, type_value, validation, current_target_paths in self.failing_groups():
+            group_count += 1
+            suggestions = self.suggest(source_path, type_value == self.TYPE_COLUMN_VALUE_GROUP, current_target_paths)
+            for rank, (score, is_current_target, _, candidate_path, leaf_similarity, level_match, qualifier_match) in enumerate(suggestions, start=1):
+                rows.append({self.SOURCE_COLUMN: source_path, self.TYPE_COLUMN: type_value, self.VALIDATION_COLUMN: validation,
+                             self.RANK_COLUMN: rank, self.SUGGESTED_TARGET_COLUMN: candidate_path, self.SCORE_COLUMN: round(score, 3),
+                             self.LEAF_SIMILARITY_COLUMN: round(leaf_similarity, 3), self.LEVEL_MATCH_COLUMN: round(level_match, 3),
+                             self.QUALIFIER_MATCH_COLUMN: qualifier_match,
+                             self.CURRENT_TARGET_COLUMN: 'YES' if is_current_target else 'NO'})
+        self.log(f"{group_count} failing source paths, top {self.top_k} suggestions found in {time.perf_counter() - start:.2f} s.")
+
+        # Save the suggestions in their own sheet of the analysis workbook
+        suggestions_df = pd.DataFrame(rows, columns=[self.SOURCE_COLUMN, self.TYPE_COLUMN, self.VALIDATION_COLUMN, self.RANK_COLUMN,
+                                                     self.SUGGESTED_TARGET_COLUMN, self.SCORE_COLUMN, self.LEAF_SIMILARITY_COLUMN,
+                                                     self.LEVEL_MATCH_COLUMN, self.QUALIFIER_MATCH_COLUMN, self.CURRENT_TARGET_COLUMN])
+        with pd.ExcelWriter(self.analysis_workbook, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
+            suggestions_df.to_excel(writer, sheet_name=self.SUGGESTIONS_SHEET, index=False)
+
+        self.log("...")
+        self.log(f"Processing complete. Suggestions saved to the '{self.SUGGESTIONS_SHEET}' sheet of '{self.analysis_workbook}'.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Suggest target paths for the source paths with NO SELECTION or MULTIPLE SELECTIONS in an analysis workbook.')
+    parser.add_argument('analysis_workbook', type=str, help='Path to the analysis workbook of the first or second pass, e.g., conversion_analysis/select_target_path_ambiguous_group_of_ShippingLabel 3.0_to_Shipment 7.7_conversion_pass2.xlsx')
+    parser.add_argument('--xsd_file', type=str, default='xsd/Shipments.xsd', help='Path to the XSD schema of the target (default: xsd/Shipments.xsd)')
+    parser.add_argument('--top_k', type=int, default=5, help='Number of suggestions for each source path (default: 5)')
+    parser.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
+    args = parser.parse_args()
+
+    suggester = TargetPathSuggester(args.analysis_workbook, args.xsd_file, args.top_k, args.log)
+    suggester.process()
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from decision_cache import DecisionCache
+
+def test_missing_dependency_is_skipped(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'rules.xlsx').write_bytes(b'rules')
+    messages = []
+
+    cache = DecisionCache('pass1', ['rules.xlsx', 'missing_rules.xlsx'], log=messages.append)
+    cache.put(b'key', 'decision')
+    cache.save()
+
+    assert len(messages) == 1 and 'missing_rules.xlsx' in messages[0]
+    assert DecisionCache('pass1', ['rules.xlsx', 'missing_rules.xlsx'], log=messages.append).get(b'key') == 'decision'
+
+    # The cache is discarded when the missing file is added
+    (tmp_path / 'missing_rules.xlsx').write_bytes(b'new rules')
+    cache = DecisionCache('pass1', ['rules.xlsx', 'missing_rules.xlsx'], log=messages.append)
+    assert cache.get(b'key') is None
+    assert cache.invalidated_count == 1
@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from export_conversion_map_xslt import ConversionMapXsltExporter, PythonMapApplier, generate_sample_document
+
+etree = pytest.importorskip('lxml.etree')
+
+# Map with a group shared by two fields, a predicated group and fields selected by the predicates of their group
+TINY_MAP = {
+    "SL/Header": ["Shipment/Header"],
+    "SL/Header/ShipmentID": ["Shipment/Header/ShipmentIdentification"],
+    "SL/Header/References": ["Shipment/OrderLevel/References"],
+    "SL/Header/References[ReferenceQual='BL']/ReferenceID": ["Shipment/OrderLevel/References[ReferenceQual='BL']/ReferenceID"],
+    "SL/Header/References[ReferenceQual='PO']/ReferenceID": ["Shipment/OrderLevel/OrderHeader/PurchaseOrderNumber"],
+    "SL/Header/Address[AddressTypeCode='ST']": ["Shipment/Header/Address[AddressTypeCode='ST']"],
+    "SL/Header/Address[AddressTypeCode='ST']/AddressName": ["Shipment/Header/Address[AddressTypeCode='ST']/AddressName"],
+}
+
+SOURCE_DOCUMENT = ('<SL><Header><ShipmentID>S1</ShipmentID>'
+                   '<References><ReferenceQual>BL</ReferenceQual><ReferenceID>B1</ReferenceID></References>'
+                   '<References><ReferenceQual>PO</ReferenceQual><ReferenceID>P1</ReferenceID></References>'
+                   '<Address><AddressTypeCode>BT</AddressTypeCode><AddressName>Bill</AddressName></Address>'
+                   '<Address><AddressTypeCode>ST</AddressTypeCode><AddressName>Ship</AddressName></Address>'
+                   '</Header></SL>')
+
+@pytest.fixture
+def exporter(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open('tiny.json', 'w') as file:
+        json.dump(TINY_MAP, file)
+    return ConversionMapXsltExporter('tiny.json')
+
+def convert(exporter, source_element):
+    transform = etree.XSLT(etree.fromstring(exporter.to_xslt().encode('utf-8')))
+    xslt_result = etree.tostring(transform(etree.fromstring(ET.tostring(source_element))).getroot())
+    python_result = etree.tostring(etree.fromstring(ET.tostring(PythonMapApplier(exporter).apply(source_element))))
+    return xslt_result, python_result
+
+def test_stylesheet_matches_python_application(exporter):
+    xslt_result, python_result = convert(exporter, ET.fromstring(SOURCE_DOCUMENT))
+
+    assert xslt_result == python_result
+    header = etree.fromstring(xslt_result).find('Header')
+    assert header.findtext('ShipmentIdentification') == 'S1'
+    # Only the ST address is converted, with its qualifier, in a single Header
+    assert [(address.findtext('AddressTypeCode'), address.findtext('AddressName')) for address in header.findall('Address')] == [('ST', 'Ship')]
+    assert etree.fromstring(xslt_result).findtext('OrderLevel/OrderHeader/PurchaseOrderNumber') == 'P1'
+
+@pytest.mark.parametrize('repetitions', [1, 3])
+def test_stylesheet_matches_python_application_on_sample_documents(exporter, repetitions):
+    xslt_result, python_result = convert(exporter, generate_sample_document(exporter, repetitions).getroot())
+
+    assert xslt_result == python_result
+
+def test_stylesheet_is_saved_apart_from_the_maps(exporter):
+    exporter.process()
+
+    assert os.path.exists(os.path.join('conversion_maps', 'xslt', 'tiny.xsl'))
@@ -0,0 +1,46 @@
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generates_pria_conversion_maps import PRIAConversionMapGenerator
+
+COLUMNS = ['TYPE', 'SOURCE_PATH', 'TARGET_PATH', 'IS_SELECTED', 'DO NOT MAP', 'GROUP_NEEDS_PREDICATES', 'GROUP_IS_SELECTED']
+
+# Report of the second pass where Address and References inside Address both need predicates
+NESTED_REPORT_ROWS = [
+    ['GROUP', 'PS/H/Address', 'Shipment/Header/Address', 'YES', '', 'YES', 'YES'],
+    ['GROUP', 'PS/H/Address/References', 'Shipment/Header/Address/References', 'YES', '', 'YES', 'YES'],
+    ['FIELD', "PS/H/Address[AddressTypeCode='ST']/AddressTypeCode", "Shipment/Header/Address[AddressTypeCode='ST']/AddressTypeCode", 'YES', '', 'NO', 'YES'],
+    ['FIELD', "PS/H/Address[AddressTypeCode='BT']/AddressTypeCode", "Shipment/Header/Address[AddressTypeCode='BT']/AddressTypeCode", 'YES', '', 'NO', 'YES'],
+    ['FIELD', 'PS/H/Address/AddressName', 'Shipment/Header/Address/AddressName', 'YES', '', 'NO', 'YES'],
+    ['FIELD', "PS/H/Address/References[ReferenceQual='BL']/ReferenceQual", "Shipment/Header/Address/References[ReferenceQual='BL']/ReferenceQual", 'YES', '', 'NO', 'YES'],
+    ['FIELD', "PS/H/Address/References[ReferenceQual='PO']/ReferenceQual", "Shipment/Header/Address/References[ReferenceQual='PO']/ReferenceQual", 'YES', '', 'NO', 'YES'],
+    ['FIELD', 'PS/H/Address/References/ReferenceID', 'Shipment/Header/Address/References/ReferenceID', 'YES', '', 'NO', 'YES'],
+]
+
+def generate(tmp_path, monkeypatch, **options):
+    monkeypatch.chdir(tmp_path)
+    report = tmp_path / 'nested_pass2.xlsx'
+    pd.DataFrame(NESTED_REPORT_ROWS, columns=COLUMNS).to_excel(report, index=False)
+    generator = PRIAConversionMapGenerator(str(report), 'PS 1.0', 'Shipment 7.7', **options)
+    generator.generate_conversion_maps()
+    with open(tmp_path / 'conversion_maps' / generator.json_output_file_name) as file:
+        return json.load(file), generator.node_not_output
+
+@pytest.mark.parametrize('options', [{}, {'streaming': True}, {'sqlite': True}])
+def test_nested_groups_needing_predicates(tmp_path, monkeypatch, options):
+    conversion_map, node_not_output = generate(tmp_path, monkeypatch, **options)
+
+    assert node_not_output == set()
+    expected = {}
+    for address_type in ['ST', 'BT']:
+        for reference_qualifier in ['BL', 'PO']:
+            predicates = f"Address[AddressTypeCode='{address_type}']/References[ReferenceQual='{reference_qualifier}']"
+            expected[f"PS/H/{predicates}/ReferenceID"] = [f"Shipment/Header/{predicates}/ReferenceID"]
+    assert {source: targets for source, targets in conversion_map.items() if source.endswith('/ReferenceID')} == expected
+    assert conversion_map["PS/H/Address[AddressTypeCode='BT']/AddressName"] == ["Shipment/Header/Address[AddressTypeCode='BT']/AddressName"]
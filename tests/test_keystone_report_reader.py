@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keystone_report_reader import KeystoneReportReader
+
+# Unsorted report: the rows of SL/H/Address are spread over several runs of 2 rows, and one row has no source path
+ROWS = [
+    ['FIELD', 'SL/H/Address/Name', 'Shipment/Header/Address/Name'],
+    ['GROUP', 'SL/H/Address', 'Shipment/Header/Address'],
+    ['FIELD', 'SL/H/Carrier', 'Shipment/Header/Carrier'],
+    ['GROUP', 'SL/H/Address', 'Shipment/OrderLevel/Address'],
+    ['FIELD', '', 'Shipment/Header/Unmapped'],
+    ['FIELD', 'SL/H/Address/Name', 'Shipment/OrderLevel/Address/Name'],
+    ['GROUP', 'SL/H/Address', 'Shipment/OrderLevel/Vendor/Address'],
+]
+
+@pytest.fixture
+def report(tmp_path):
+    report_file = tmp_path / 'report.csv'
+    pd.DataFrame(ROWS, columns=['TYPE', 'SOURCE_PATH', 'TARGET_PATH']).to_csv(report_file, index=False)
+    return str(report_file)
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 100])
+def test_groups_of_an_unsorted_report(report, monkeypatch, chunk_size):
+    reader = KeystoneReportReader(report, chunk_size)
+    run_files = []
+    write_sorted_run = reader._write_sorted_run
+    monkeypatch.setattr(reader, '_write_sorted_run', lambda *args: run_files.append(write_sorted_run(*args)) or run_files[-1])
+
+    groups = list(reader.iter_groups())
+
+    assert len(run_files) == -(-6 // chunk_size)
+    expected = pd.read_csv(report)
+    assert [group['SOURCE_PATH'].iloc[0] for group in groups] == sorted(expected['SOURCE_PATH'].dropna().unique())
+    for group, (_, expected_group) in zip(groups, expected.groupby('SOURCE_PATH')):
+        assert list(group.index) == list(expected_group.index)
+        assert list(group['TARGET_PATH']) == list(expected_group['TARGET_PATH'])
+
+def test_sorted_report_is_not_split_into_runs(tmp_path, monkeypatch):
+    report_file = tmp_path / 'sorted.csv'
+    pd.DataFrame(sorted(ROWS[:4], key=lambda row: row[1]), columns=['TYPE', 'SOURCE_PATH', 'TARGET_PATH']).to_csv(report_file, index=False)
+    reader = KeystoneReportReader(str(report_file), 1)
+    monkeypatch.setattr(reader, '_write_sorted_run', lambda *args: pytest.fail('the sorted report was sorted again'))
+
+    assert [row_number for row_number, _ in reader.iter_sorted_rows()] == [0, 1, 2, 3]
@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reverse_conversion_index import ReverseConversionIndex
+
+# In map_a, two source paths are converted to the same target path (many-to-one)
+MAP_A = {
+    "SL/Header/BOL": ["Shipment/Header/ShipmentHeader/BillOfLadingNumber"],
+    "SL/Header/References[ReferenceQual='BL']/ReferenceID": ["Shipment/Header/ShipmentHeader/BillOfLadingNumber"],
+    "SL/Header/Address[AddressTypeCode='ST']/AddressName": ["Shipment/Header/Address[AddressTypeCode='ST']/AddressName"],
+}
+MAP_B = {
+    "PS/Header/BOL": ["Shipment/Header/ShipmentHeader/BillOfLadingNumber"],
+    "PS/Header/Address[AddressTypeCode='ST']/AddressName": ["Shipment/Header/Address[AddressTypeCode='ST']/AddressName",
+                                                            "Shipment/OrderLevel/Address[AddressTypeCode='ST']/AddressName"],
+}
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('maps')
+    for name, conversion_map in [('map_a', MAP_A), ('map_b', MAP_B)]:
+        with open(os.path.join('maps', f'{name}.json'), 'w') as file:
+            json.dump(conversion_map, file)
+    return ReverseConversionIndex('maps')
+
+def test_lookup(index):
+    assert sorted(index.lookup('Shipment/Header/ShipmentHeader/BillOfLadingNumber')) == [
+        ('map_a.json', 'SL/Header/BOL'), ('map_a.json', "SL/Header/References[ReferenceQual='BL']/ReferenceID"),
+        ('map_b.json', 'PS/Header/BOL')]
+    assert index.lookup("Shipment/OrderLevel/Address[AddressTypeCode='ST']/AddressName") == [
+        ('map_b.json', "PS/Header/Address[AddressTypeCode='ST']/AddressName")]
+    # A path of the tree that is not a target, and paths that are not in any map
+    assert index.lookup('Shipment/Header') == []
+    assert index.lookup("Shipment/Header/Address[AddressTypeCode='BT']/AddressName") == []
+    assert index.lookup('Shipment/Unknown') == []
+
+def test_lookup_descendants(index):
+    assert sorted(index.lookup_descendants('Shipment/Header/Address')) == []
+    assert sorted(index.lookup_descendants("Shipment/Header/Address[AddressTypeCode='ST']")) == [
+        ("Shipment/Header/Address[AddressTypeCode='ST']/AddressName", 'map_a.json', "SL/Header/Address[AddressTypeCode='ST']/AddressName"),
+        ("Shipment/Header/Address[AddressTypeCode='ST']/AddressName", 'map_b.json', "PS/Header/Address[AddressTypeCode='ST']/AddressName")]
+
+def test_iter_collisions(index):
+    assert list(index.iter_collisions()) == [
+        ('Shipment/Header/ShipmentHeader/BillOfLadingNumber', 'map_a.json',
+         ['SL/Header/BOL', "SL/Header/References[ReferenceQual='BL']/ReferenceID"])]
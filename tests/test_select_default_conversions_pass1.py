@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from select_default_conversions_pass1 import ConversionSelector
+
+COLUMNS = ['TYPE', 'SOURCE_PATH', 'TARGET_PATH']
+
+# Unsorted Keystone report with the ambiguities resolved by the first pass: order level vs item level (Carrier), order level
+# vs header with a header rule (Weight), normalized vs qualified with a qualifier that should not be mapped (BOL), an
+# ambiguity that is not resolved (Note) and a row without source path
+REPORT_ROWS = [
+    ['FIELD', 'SL/H/Carrier', 'Shipment/OrderLevel/Carrier'],
+    ['GROUP', 'SL/H/Address', 'Shipment/Header/Address'],
+    ['FIELD', "SL/H/Address[AddressTypeCode='ST']/AddressName", "Shipment/Header/Address[AddressTypeCode='ST']/AddressName"],
+    ['FIELD', 'SL/H/Weight', 'Shipment/OrderLevel/Weight'],
+    ['FIELD', 'SL/H/BOL', 'Shipment/Header/ShipmentHeader/BillOfLadingNumber'],
+    ['GROUP', 'SL/H', 'Shipment/Header'],
+    ['FIELD', 'SL/H/Carrier', 'Shipment/PackLevel/ItemLevel/Carrier'],
+    ['FIELD', 'SL/H/Notes/Note', 'Shipment/Header/Notes/Note1'],
+    ['FIELD', None, 'Shipment/Header/Unmapped'],
+    ['GROUP', 'SL/H/Address', 'Shipment/OrderLevel/Address'],
+    ['FIELD', 'SL/H/BOL', "Shipment/Header/References[ReferenceQual='BL']/ReferenceID"],
+    ['FIELD', 'SL/H/Weight', 'Shipment/Header/Weight'],
+    ['FIELD', "SL/H/References[ReferenceQual='BL']/ReferenceQual", "Shipment/Header/References[ReferenceQual='BL']/ReferenceQual"],
+    ['GROUP', 'SL/H', 'Shipment/OrderLevel'],
+    ['FIELD', 'SL/H/Notes/Note', 'Shipment/Header/Notes/Note2'],
+    ['FIELD', "SL/H/Address[AddressTypeCode='BT']/AddressName", "Shipment/OrderLevel/Address[AddressTypeCode='BT']/AddressName"],
+    ['FIELD', 'SL/H/ShipmentID', 'Shipment/Header/ShipmentHeader/ShipmentIdentification'],
+]
+
+def run_pass1(tmp_path, monkeypatch, **options):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('input', exist_ok=True)
+    os.makedirs('conversion_analysis', exist_ok=True)
+    pd.DataFrame({'Paths to Header': ['SL/H']}).to_excel('input/header_vs_order_level_rules_simplified.xlsx', index=False)
+    pd.DataFrame({'Exception Groups': ['SL/Pack']}).to_excel('input/do_not_normalized_rules.xlsx', index=False)
+    pd.DataFrame({'DO NOT MAP QUALS': ['SL/Pack']}).to_excel('input/donotmap_qualifiers_rules.xlsx', index=False)
+    pd.DataFrame(REPORT_ROWS, columns=COLUMNS).to_excel('report.xlsx', index=False)
+    return pd.read_excel(ConversionSelector('report.xlsx', 'SL 1.0', 'Shipment 7.7', **options).process())
+
+@pytest.mark.parametrize('options', [{'sqlite': True}, {'sqlite': True, 'cache': True}])
+def test_sqlite_gives_the_same_workbook(tmp_path, monkeypatch, options):
+    expected = run_pass1(tmp_path, monkeypatch)
+    if options.get('cache'):
+        # The second run reuses the decisions of the first one
+        run_pass1(tmp_path, monkeypatch, **options)
+
+    result = run_pass1(tmp_path, monkeypatch, **options)
+
+    pd.testing.assert_frame_equal(result, expected)
+    validation = dict(zip(expected['SOURCE_PATH'], expected['VALIDATION']))
+    assert validation['SL/H/Carrier'] == validation['SL/H/Weight'] == validation['SL/H/BOL'] == 'OK'
+    assert validation['SL/H/Notes/Note'] == 'NO SELECTION'
+    assert list(expected.loc[expected['DO NOT MAP'] == 'DO NOT MAP', 'SOURCE_PATH']) == ["SL/H/References[ReferenceQual='BL']/ReferenceQual"]
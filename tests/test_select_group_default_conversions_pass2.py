@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from select_group_default_conversions_pass2 import GroupConversionSelector
+
+COLUMNS = ['TYPE', 'SOURCE_PATH', 'TARGET_PATH', 'IS_SELECTED', 'DO NOT MAP']
+
+# Unsorted workbook of the first pass. SL/H has a selected field under both targets, Address too and its fields have
+# predicates, References has no selected field under its second target and the qualified field is not mapped
+PASS1_ROWS = [
+    ['FIELD', 'SL/H/Carrier', 'Shipment/OrderLevel/Carrier', 'YES', None],
+    ['GROUP', 'SL/H/Address', 'Shipment/Header/Address', 'YES', None],
+    ['FIELD', "SL/H/Address[AddressTypeCode='ST']/AddressName", "Shipment/Header/Address[AddressTypeCode='ST']/AddressName", 'YES', None],
+    ['GROUP', 'SL/H/References', 'Shipment/Header/References', 'YES', None],
+    ['FIELD', 'SL/H/Weight', 'Shipment/Header/Weight', 'YES', None],
+    ['GROUP', 'SL/H', 'Shipment/Header', 'YES', None],
+    ['FIELD', 'SL/H/References/ReferenceID', 'Shipment/Header/References/ReferenceID', 'YES', None],
+    ['GROUP', 'SL/H/References', 'Shipment/OrderLevel/References', 'YES', None],
+    ['FIELD', "SL/H/References[ReferenceQual='BL']/ReferenceQual", "Shipment/OrderLevel/References[ReferenceQual='BL']/ReferenceQual", 'YES', 'DO NOT MAP'],
+    ['GROUP', 'SL/H/Address', 'Shipment/OrderLevel/Address', 'YES', None],
+    ['FIELD', None, 'Shipment/Header/Unmapped', None, None],
+    ['GROUP', 'SL/H', 'Shipment/OrderLevel', 'YES', None],
+    ['FIELD', "SL/H/Address[AddressTypeCode='BT']/AddressName", "Shipment/OrderLevel/Address[AddressTypeCode='BT']/AddressName", 'YES', None],
+    ['FIELD', 'SL/H/Notes/Note', 'Shipment/Header/Notes/Note', 'NO', None],
+    ['GROUP', 'SL/H/Notes', 'Shipment/Header/Notes', 'YES', None],
+    ['GROUP', 'SL/H/Notes', 'Shipment/OrderLevel/Notes', 'YES', None],
+]
+
+def run_pass2(tmp_path, monkeypatch, **options):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('conversion_analysis', exist_ok=True)
+    pd.DataFrame(PASS1_ROWS, columns=COLUMNS).to_excel('pass1.xlsx', index=False)
+    return pd.read_excel(GroupConversionSelector('pass1.xlsx', 'SL 1.0', 'Shipment 7.7', **options).process())
+
+@pytest.mark.parametrize('options', [{'sqlite': True}, {'sqlite': True, 'cache': True}])
+def test_sqlite_gives_the_same_workbook(tmp_path, monkeypatch, options):
+    expected = run_pass2(tmp_path, monkeypatch)
+    if options.get('cache'):
+        # The second run reuses the decisions of the first one
+        run_pass2(tmp_path, monkeypatch, **options)
+
+    result = run_pass2(tmp_path, monkeypatch, **options)
+
+    pd.testing.assert_frame_equal(result, expected)
+    groups = expected[expected['TYPE'] == 'GROUP']
+    decisions = {(source, target): (selected, needs_predicates, validation) for source, target, selected, needs_predicates, validation in
+                 zip(groups['SOURCE_PATH'], groups['TARGET_PATH'], groups['GROUP_IS_SELECTED'], groups['GROUP_NEEDS_PREDICATES'], groups['GROUP_VALIDATION'])}
+    assert decisions == {
+        ('SL/H', 'Shipment/Header'): ('YES', 'NO', 'MULTIPLE SELECTIONS'),
+        ('SL/H', 'Shipment/OrderLevel'): ('YES', 'NO', 'MULTIPLE SELECTIONS'),
+        ('SL/H/Address', 'Shipment/Header/Address'): ('YES', 'YES', 'MULTIPLE SELECTIONS'),
+        ('SL/H/Address', 'Shipment/OrderLevel/Address'): ('YES', 'YES', 'MULTIPLE SELECTIONS'),
+        ('SL/H/References', 'Shipment/Header/References'): ('YES', 'NO', 'OK'),
+        ('SL/H/References', 'Shipment/OrderLevel/References'): ('NO', 'NO', 'OK'),
+        ('SL/H/Notes', 'Shipment/Header/Notes'): ('NO', 'NO', 'NO SELECTION'),
+        ('SL/H/Notes', 'Shipment/OrderLevel/Notes'): ('NO', 'NO', 'NO SELECTION'),
+    }
@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlite_report_store import SqliteReportStore
+from select_group_default_conversions_pass2 import GroupConversionSelector
+
+COLUMNS = ['TYPE', 'SOURCE_PATH', 'TARGET_PATH', 'IS_SELECTED', 'DO NOT MAP']
+ROWS = [
+    ['GROUP', 'SL/H', 'Shipment/Header', 'YES', None],
+    ['GROUP', 'SL/H', 'Shipment/OrderLevel', 'YES', None],
+    ['FIELD', 'SL/H/Weight', 'Shipment/Header/Weight', 'YES', None],
+]
+
+@pytest.fixture
+def temporary_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('temp')
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path / 'temp'))
+    return tmp_path / 'temp'
+
+def test_database_is_deleted_when_closed(temporary_directory):
+    pd.DataFrame(ROWS, columns=COLUMNS).to_csv('report.csv', index=False)
+
+    with SqliteReportStore('report.csv') as store:
+        assert os.listdir(temporary_directory) == [os.path.basename(store.database_file_name)]
+        assert list(store.iter_groups())[0]['TARGET_PATH'].tolist() == ['Shipment/Header', 'Shipment/OrderLevel']
+    store.close()
+
+    assert os.listdir(temporary_directory) == []
+
+def test_database_is_deleted_when_the_load_fails(temporary_directory):
+    pd.DataFrame(ROWS, columns=COLUMNS).drop(columns=['SOURCE_PATH']).to_csv('report.csv', index=False)
+
+    with pytest.raises(sqlite3.OperationalError):
+        SqliteReportStore('report.csv')
+
+    assert os.listdir(temporary_directory) == []
+
+def test_database_is_deleted_when_the_processing_fails(temporary_directory, monkeypatch):
+    os.makedirs('conversion_analysis')
+    pd.DataFrame(ROWS, columns=COLUMNS).to_excel('pass1.xlsx', index=False)
+    selector = GroupConversionSelector('pass1.xlsx', 'SL 1.0', 'Shipment 7.7', sqlite=True)
+    assert len(os.listdir(temporary_directory)) == 1
+
+    def fail(data):
+        raise RuntimeError('selection failed')
+    monkeypatch.setattr(selector, 'select_unique_group', fail)
+    with pytest.raises(RuntimeError):
+        selector.process()
+
+    assert os.listdir(temporary_directory) == []
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suggest_target_paths import TargetPathSuggester
+
+# Workbook of the second pass with one unresolved field and one ambiguous group
+REPORT = pd.DataFrame({
+    'TYPE': ['FIELD', 'FIELD', 'FIELD', 'GROUP', 'GROUP'],
+    'SOURCE_PATH': ['SL/H/Carrier', 'SL/H/Weight', 'SL/H/Weight', 'SL/H/Address', 'SL/H/Address'],
+    'TARGET_PATH': ['Shipment/Header/Carrier', 'Shipment/Header/Weight', 'Shipment/Header/QuantityAndWeight/Weight',
+                    'Shipment/Header/Address', 'Shipment/OrderLevel/Address'],
+    'IS_SELECTED': ['', 'YES', 'NO', 'YES', 'YES'],
+    'VALIDATION': ['NO SELECTION', 'OK', 'OK', 'MULTIPLE SELECTIONS', 'MULTIPLE SELECTIONS'],
+    'GROUP_IS_SELECTED': ['', '', '', 'YES', 'YES'],
+    'GROUP_VALIDATION': ['NO SELECTION', 'NO SELECTION', 'NO SELECTION', 'MULTIPLE SELECTIONS', 'MULTIPLE SELECTIONS'],
+})
+
+def failing_groups(tmp_path, monkeypatch, report):
+    monkeypatch.chdir(tmp_path)
+    report.to_excel(tmp_path / 'pass2.xlsx', index=False)
+    return sorted((source_path, validation) for source_path, _, validation, _ in TargetPathSuggester('pass2.xlsx').failing_groups())
+
+@pytest.mark.parametrize('dropped_columns', [[], ['VALIDATION'], ['GROUP_VALIDATION'], ['VALIDATION', 'GROUP_VALIDATION']])
+def test_validation_is_recomputed_without_run_test(tmp_path, monkeypatch, dropped_columns):
+    assert failing_groups(tmp_path, monkeypatch, REPORT.drop(columns=dropped_columns)) == [
+        ('SL/H/Address', 'MULTIPLE SELECTIONS'), ('SL/H/Carrier', 'NO SELECTION')]
+
+def test_workbook_without_selections(tmp_path, monkeypatch):
+    with pytest.raises(SystemExit):
+        failing_groups(tmp_path, monkeypatch, REPORT[['TYPE', 'SOURCE_PATH', 'TARGET_PATH']])
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import validate_json
+
+MAP_WITH_ESCAPES = '{\n\t"k\\\\ab": [\n\t\t"x\\\\y",\n\t\t"q\\"uote\\u00e9\\n"\n\t],\n\t"Pack/Item": ["\\/\\t"]\n}\n'
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4, 5, 7, 14, 65536])
+def test_escapes_at_chunk_boundaries(tmp_path, monkeypatch, chunk_size):
+    map_file = tmp_path / 'map.json'
+    map_file.write_text(MAP_WITH_ESCAPES)
+    monkeypatch.setattr(validate_json, 'CHUNK_SIZE', chunk_size)
+
+    _, key_count, issues, _ = validate_json.check_map_file(str(map_file))
+
+    assert issues == []
+    assert key_count == 2
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 65536])
+def test_bad_escape_is_reported(tmp_path, monkeypatch, chunk_size):
+    map_file = tmp_path / 'map.json'
+    map_file.write_text('{\n\t"k\\x": ["x"]\n}\n')
+    monkeypatch.setattr(validate_json, 'CHUNK_SIZE', chunk_size)
+
+    _, _, issues, _ = validate_json.check_map_file(str(map_file))
+
+    assert [issue for _, _, issue, _ in issues] == [validate_json.ConversionMapValidator.ISSUE_SYNTAX_ERROR]
@@ -1,10 +1,401 @@
+import argparse
+import csv
+import datetime
+import hashlib
 import json
+import os
+import re
+import sys
+from functools import partial
+from multiprocessing import Pool
 
-file_path = 'output/shippinglabel_3.0_to_shipment_7.7_conversion.json'
+class ConversionMapValidator:
+    # Constants
+    FILE_COLUMN = 'FILE'
+    LINE_COLUMN = 'LINE'
+    COLUMN_COLUMN = 'COLUMN'
+    ISSUE_COLUMN = 'ISSUE'
+    DETAIL_COLUMN = 'DETAIL'
+    ISSUE_SYNTAX_ERROR = 'SYNTAX_ERROR'
+    ISSUE_DUPLICATE_KEY = 'DUPLICATE_KEY'
+    ISSUE_EMPTY_TARGETS = 'EMPTY_TARGETS'
+    ISSUE_TRAILING_COMMA = 'TRAILING_COMMA'
 
-try:
-    with open(file_path, 'r') as file:
-        json.load(file)
-    print("JSON is valid")
-except json.JSONDecodeError as e:
-    print(f"JSON format error: {e}")
\ No newline at end of file
+    # The issues that make a map invalid. The trailing commas are syntax errors too, unless they are fixed.
+    ERROR_ISSUES = [ISSUE_SYNTAX_ERROR, ISSUE_DUPLICATE_KEY, ISSUE_TRAILING_COMMA]
+
+    DEFAULT_MAPS_DIRECTORY = 'conversion_maps'
+
+    # Number of issues of a map printed in the log (all the issues are in the CSV file)
+    MAX_LOGGED_ISSUES = 20
+
+    # Validate JSON conversion maps without loading them. Each map is read in chunks and tokenized, and the tokens go through
+    # a small parser that keeps only the stack of the open objects and arrays. The parser reports all the syntax errors (it
+    # recovers and goes on), the duplicate keys that json.load would silently merge, the source paths mapped to an empty
+    # array of target paths and the trailing commas before a '}' or a ']'. With fix, the trailing commas are removed from the
+    # maps that have no other syntax error. The maps are validated in parallel.
+    def __init__(self, paths, processes=None, fix=False, log=False):
+        self.paths = paths
+        self.processes = processes
+        self.fix = fix
+        self.log_enabled = log
+
+        # Create the file name with the timestamp
+        current_time = datetime.datetime.now()
+        self.timestamp = current_time.strftime("%Y%m%d_%H%M%S")
+        self.log_file_name = f"logfile_{self.timestamp}.log"
+        os.makedirs('log', exist_ok=True)
+
+        os.makedirs('conversion_analysis', exist_ok=True)
+        self.output_file_name = 'conversion_analysis/map_validation.csv'
+
+    def log(self, message):
+        if self.log_enabled:
+            with open('log/' + self.log_file_name, 'a') as f:
+                print(message, file=f)
+        print(message)
+
+    # The JSON files of the directories and the files given
+    def list_map_files(self):
+        map_files = []
+        for path in self.paths:
+            if os.path.isdir(path):
+                map_files += sorted(os.path.join(path, file_name) for file_name in os.listdir(path) if file_name.lower().endswith('.json'))
+            else:
+                map_files.append(path)
+        return map_files
+
+    # Main processing function. Return the number of maps with errors.
+    def process(self):
+        map_files = self.list_map_files()
+        self.log(f"Validating {len(map_files)} conversion maps.")
+        self.log("...")
+
+        check = partial(check_map_file, fix=self.fix)
+        if len(map_files) <= 1 or self.processes == 1:
+            results = map(check, map_files)
+            pool = None
+        else:
+            pool = Pool(self.processes)
+            results = pool.imap(check, map_files)
+
+        invalid_map_count = 0
+        try:
+            with open(self.output_file_name, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow([self.FILE_COLUMN, self.LINE_COLUMN, self.COLUMN_COLUMN, self.ISSUE_COLUMN, self.DETAIL_COLUMN])
+                for file_name, key_count, issues, fixed in results:
+                    issue_counts = {issue: 0 for issue in [self.ISSUE_SYNTAX_ERROR, self.ISSUE_DUPLICATE_KEY, self.ISSUE_EMPTY_TARGETS, self.ISSUE_TRAILING_COMMA]}
+                    for line, column, issue, detail in issues:
+                        issue_counts[issue] += 1
+                        writer.writerow([file_name, line, column, issue, detail])
+
+                    errors = sum(issue_counts[issue] for issue in self.ERROR_ISSUES if not (fixed and issue == self.ISSUE_TRAILING_COMMA))
+                    if errors > 0:
+                        invalid_map_count += 1
+                    fixed_message = ' (fixed)' if fixed else ''
+                    self.log(f"{file_name}: {'INVALID' if errors > 0 else 'valid'}, {key_count} source paths, "
+                             f"{issue_counts[self.ISSUE_SYNTAX_ERROR]} syntax errors, {issue_counts[self.ISSUE_DUPLICATE_KEY]} duplicate keys, "
+                             f"{issue_counts[self.ISSUE_EMPTY_TARGETS]} empty target arrays, {issue_counts[self.ISSUE_TRAILING_COMMA]} trailing commas{fixed_message}.")
+                    for line, column, issue, detail in issues[:self.MAX_LOGGED_ISSUES]:
+                        self.log(f"    line {line}, column {column}: {issue} {detail}")
+                    if len(issues) > self.MAX_LOGGED_ISSUES:
+                        self.log(f"    ... {len(issues) - self.MAX_LOGGED_ISSUES} more issues in '{self.output_file_name}'.")
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        self.log("...")
+        self.log(f"{len(map_files)} maps validated, {invalid_map_count} invalid.")
+        self.log(f"Processing complete. Results saved to '{self.output_file_name}'.")
+        return invalid_map_count
+
+# Size of the chunks read from a map, in characters
+CHUNK_SIZE = 65536
+
+# JSON tokens. A string with a bad escape or a control character, or a string not closed on its line, is an invalid string.
+# Anything else that is not a JSON token is an invalid word.
+TOKEN_PATTERN = re.compile(r'''
+     (?P<whitespace>[ \t\r\n]+)
+    |(?P<string>"(?:[^"\\\x00-\x1f]|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*")
+    |(?P<punctuation>[{}\[\]:,])
+    |(?P<number>-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)
+    |(?P<literal>true|false|null)
+    |(?P<invalid_string>"(?:[^"\\\n]|\\.)*"?)
+    |(?P<invalid>[^ \t\r\n{}\[\]:,"]+)
+''', re.VERBOSE)
+STRING_KINDS = ('string', 'invalid_string')
+
+# Tokenize a file read in chunks. Yield (kind, text, offset, line, column) for each token except the whitespace. The offset
+# is the position of the token in the file, in characters. Only the current chunk and the token being read are in memory.
+def iter_tokens(file):
+    buffer = ''
+    buffer_offset = 0
+    line = 1
+    line_start_offset = 0
+    end_of_file = False
+    while not end_of_file:
+        chunk = file.read(CHUNK_SIZE)
+        end_of_file = len(chunk) == 0
+        buffer += chunk
+        position = 0
+        while position < len(buffer):
+            match = TOKEN_PATTERN.match(buffer, position)
+            # A token that ends with the buffer can continue in the next chunk. So can a string that ends just before the
+            # last character of the buffer: it stopped before a backslash whose escaped character is in the next chunk.
+            if not end_of_file and (match.end() == len(buffer) or (match.lastgroup in STRING_KINDS and match.end() == len(buffer) - 1)):
+                break
+            kind = match.lastgroup
+            text = match.group()
+            offset = buffer_offset + position
+            if kind != 'whitespace':
+                yield kind, text, offset, line, offset - line_start_offset + 1
+            newline_count = text.count('\n')
+            if newline_count > 0:
+                line += newline_count
+                line_start_offset = offset + text.rindex('\n') + 1
+            position = match.end()
+        buffer = buffer[position:]
+        buffer_offset += position
+
+# States of the parser
+OBJECT = 'object'
+ARRAY = 'array'
+EXPECT_KEY_OR_END = 'key or end'
+EXPECT_KEY = 'key'
+EXPECT_COLON = 'colon'
+EXPECT_VALUE = 'value'
+EXPECT_VALUE_OR_END = 'value or end'
+EXPECT_COMMA_OR_END = 'comma or end'
+
+VALUE_KINDS = ('string', 'number', 'literal')
+
+# An open object or array
+class Container:
+    __slots__ = ('kind', 'state', 'keys', 'key', 'value_count', 'line', 'column')
+
+    def __init__(self, kind, line, column):
+        self.kind = kind
+        self.state = EXPECT_KEY_OR_END if kind == OBJECT else EXPECT_VALUE_OR_END
+        # Digest of each key of an object and the line where it is defined, to find the duplicate keys
+        self.keys = {} if kind == OBJECT else None
+        self.key = None
+        self.value_count = 0
+        self.line = line
+        self.column = column
+
+def key_digest(key):
+    return hashlib.blake2b(key.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+
+def decode_key(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text.strip('"')
+
+# Validate one map (see ConversionMapValidator). Return (file name, number of keys of the top level object, issues, fixed)
+# with the issues as (line, column, issue, detail) tuples in the order of the file.
+def check_map_file(file_name, fix=False):
+    issues = []
+    trailing_comma_offsets = []
+    stack = []
+    root_done = False
+    root_key_count = 0
+    extra_text_reported = False
+    last_comma = None
+    last_position = (1, 1)
+
+    def is_value_start(kind, text):
+        return kind in VALUE_KINDS or text in ('{', '[')
+
+    def expects_value():
+        if len(stack) == 0:
+            return not root_done
+        return stack[-1].state in (EXPECT_VALUE, EXPECT_VALUE_OR_END)
+
+    def syntax_error(line, column, detail):
+        issues.append((line, column, ConversionMapValidator.ISSUE_SYNTAX_ERROR, detail))
+
+    # A value is complete: update the state of its container
+    def value_done():
+        nonlocal root_done
+        if len(stack) == 0:
+            root_done = True
+            return
+        container = stack[-1]
+        container.value_count += 1
+        container.state = EXPECT_COMMA_OR_END
+
+    def start_value(kind, text, line, column):
+        if text == '{':
+            stack.append(Container(OBJECT, line, column))
+        elif text == '[':
+            stack.append(Container(ARRAY, line, column))
+        else:
+            value_done()
+
+    def close_container():
+        nonlocal root_key_count
+        container = stack.pop()
+        if len(stack) == 0 and container.kind == OBJECT:
+            root_key_count = len(container.keys)
+        # The target paths of a source path of the map
+        if container.kind == ARRAY and container.value_count == 0 and len(stack) == 1 and stack[0].kind == OBJECT:
+            issues.append((container.line, container.column, ConversionMapValidator.ISSUE_EMPTY_TARGETS, f"'{stack[0].key}' has no target path"))
+        value_done()
+
+    def trailing_comma(closing):
+        comma_offset, comma_line, comma_column = last_comma
+        trailing_comma_offsets.append(comma_offset)
+        issues.append((comma_line, comma_column, ConversionMapValidator.ISSUE_TRAILING_COMMA, f"',' before '{closing}'"))
+
+    def add_key(container, text, line, column):
+        key = decode_key(text)
+        digest = key_digest(key)
+        if digest in container.keys:
+            issues.append((line, column, ConversionMapValidator.ISSUE_DUPLICATE_KEY, f"'{key}' is already defined at line {container.keys[digest]}"))
+        else:
+            container.keys[digest] = line
+        container.key = key
+        container.state = EXPECT_COLON
+
+    try:
+        with open(file_name, 'r', encoding='utf-8', newline='') as file:
+            for kind, text, offset, line, column in iter_tokens(file):
+                last_position = (line, column + len(text))
+                if kind == 'invalid':
+                    syntax_error(line, column, f"Invalid token '{text[:40]}'")
+                    # Taken as the value that was expected, if any, so the rest of the container is parsed as usual
+                    if expects_value():
+                        value_done()
+                    continue
+                if kind == 'invalid_string':
+                    syntax_error(line, column, f"Invalid string {text[:40]} (not closed, bad escape or control character)")
+                    kind = 'string'
+
+                if len(stack) == 0:
+                    if root_done:
+                        if not extra_text_reported:
+                            syntax_error(line, column, f"Unexpected '{text[:40]}' after the end of the JSON value")
+                            extra_text_reported = True
+                    elif is_value_start(kind, text):
+                        start_value(kind, text, line, column)
+                    else:
+                        syntax_error(line, column, f"Unexpected '{text[:40]}', expecting a value")
+                    continue
+
+                container = stack[-1]
+                state = container.state
+                if container.kind == OBJECT:
+                    if state in (EXPECT_KEY_OR_END, EXPECT_KEY):
+                        if kind == 'string':
+                            add_key(container, text, line, column)
+                        elif text == '}':
+                            if state == EXPECT_KEY:
+                                trailing_comma('}')
+                            close_container()
+                        else:
+                            syntax_error(line, column, f"Unexpected '{text[:40]}', expecting a key")
+                    elif state == EXPECT_COLON:
+                        if text == ':':
+                            container.state = EXPECT_VALUE
+                        elif is_value_start(kind, text):
+                            syntax_error(line, column, f"Missing ':' after the key '{container.key}'")
+                            container.state = EXPECT_VALUE
+                            start_value(kind, text, line, column)
+                        else:
+                            syntax_error(line, column, f"Unexpected '{text[:40]}', expecting ':'")
+                    elif state == EXPECT_VALUE:
+                        if is_value_start(kind, text):
+                            start_value(kind, text, line, column)
+                        elif text == '}':
+                            syntax_error(line, column, f"Missing the value of the key '{container.key}'")
+                            close_container()
+                        else:
+                            syntax_error(line, column, f"Unexpected '{text[:40]}', expecting a value")
+                    else:
+                        if text == ',':
+                            container.state = EXPECT_KEY
+                            last_comma = (offset, line, column)
+                        elif text == '}':
+                            close_container()
+                        elif kind == 'string':
+                            syntax_error(line, column, "Missing ',' between two keys")
+                            add_key(container, text, line, column)
+                        else:
+                            syntax_error(line, column, f"Unexpected '{text[:40]}', expecting ',' or '}}'")
+                else:
+                    if state in (EXPECT_VALUE_OR_END, EXPECT_VALUE):
+                        if is_value_start(kind, text):
+                            start_value(kind, text, line, column)
+                        elif text == ']':
+                            if state == EXPECT_VALUE:
+                                trailing_comma(']')
+                            close_container()
+                        else:
+                            syntax_error(line, column, f"Unexpected '{text[:40]}', expecting a value")
+                    else:
+                        if text == ',':
+                            container.state = EXPECT_VALUE
+                            last_comma = (offset, line, column)
+                        elif text == ']':
+                            close_container()
+                        elif is_value_start(kind, text):
+                            syntax_error(line, column, "Missing ',' between two values")
+                            start_value(kind, text, line, column)
+                        else:
+                            syntax_error(line, column, f"Unexpected '{text[:40]}', expecting ',' or ']'")
+    except UnicodeDecodeError as e:
+        syntax_error(None, None, f"The file is not UTF-8: {e}")
+        return file_name, 0, issues, False
+    except OSError as e:
+        syntax_error(None, None, str(e))
+        return file_name, 0, issues, False
+
+    for container in reversed(stack):
+        syntax_error(*last_position, f"Unexpected end of file: the {container.kind} opened at line {container.line}, column {container.column} is not closed")
+    if not root_done and len(stack) == 0:
+        syntax_error(*last_position, "The file does not contain a JSON value")
+
+    key_count = len(stack[0].keys) if len(stack) > 0 and stack[0].kind == OBJECT else root_key_count
+    issues.sort(key=lambda issue: (issue[0] or 0, issue[1] or 0))
+
+    fixed = False
+    only_trailing_commas = not any(issue[2] == ConversionMapValidator.ISSUE_SYNTAX_ERROR for issue in issues)
+    if fix and len(trailing_comma_offsets) > 0 and only_trailing_commas:
+        remove_characters(file_name, trailing_comma_offsets)
+        fixed = True
+    return file_name, key_count, issues, fixed
+
+# Rewrite a file without the characters at the given offsets, in chunks. The file is replaced only when it is complete.
+def remove_characters(file_name, offsets):
+    offsets = sorted(offsets)
+    temporary_file_name = file_name + '.tmp'
+    with open(file_name, 'r', encoding='utf-8', newline='') as input_file, open(temporary_file_name, 'w', encoding='utf-8', newline='') as output_file:
+        chunk_offset = 0
+        next_offset = 0
+        while True:
+            chunk = input_file.read(CHUNK_SIZE)
+            if len(chunk) == 0:
+                break
+            position = 0
+            while next_offset < len(offsets) and offsets[next_offset] < chunk_offset + len(chunk):
+                removed = offsets[next_offset] - chunk_offset
+                output_file.write(chunk[position:removed])
+                position = removed + 1
+                next_offset += 1
+            output_file.write(chunk[position:])
+            chunk_offset += len(chunk)
+    os.replace(temporary_file_name, file_name)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Validate JSON conversion maps: syntax errors, duplicate keys, empty target arrays and trailing commas.')
+    parser.add_argument('paths', type=str, nargs='*', default=[ConversionMapValidator.DEFAULT_MAPS_DIRECTORY], help=f'JSON files or directories of JSON files to validate (default: {ConversionMapValidator.DEFAULT_MAPS_DIRECTORY})')
+    parser.add_argument('--processes', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--fix', action='store_true', default=False, help='Will remove the trailing commas of the maps that have no other syntax error. (default: False)')
+    parser.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
+    args = parser.parse_args()
+
+    validator = ConversionMapValidator(args.paths, args.processes, args.fix, args.log)
+    sys.exit(1 if validator.process() > 0 else 0)
@@ -0,0 +1,247 @@
+import argparse
+import datetime
+import json
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+
+class XsdPathGraph:
+    # Constants
+    XPATH_SEPARATOR = '/'
+    XSD_NAMESPACE = '{http://www.w3.org/2001/XMLSchema}'
+    QUERY_MODES = ['all', 'any', 'leaf']
+
+    # Type id of the leaf elements (simple types)
+    LEAF_TYPE = -1
+
+    def __init__(self, xsd_file, log=False):
+        self.xsd_file = xsd_file
+        self.log_enabled = log
+
+        # Create the file name with the timestamp
+        current_time = datetime.datetime.now()
+        self.timestamp = current_time.strftime("%Y%m%d_%H%M%S")
+        self.log_file_name = f"logfile_{self.timestamp}.log"
+        os.makedirs('log', exist_ok=True)
+
+        # Content models, parsed once. Identical anonymous complex types (e.g. Address or References re-declared under every
+        # level) are stored once: a type is a tuple of children (name, type id, referenced global element or None) and the
+        # type id of a content model is found by its children (hash consing). A reference to a global element is kept as an
+        # edge to that element, so the schema is stored as a graph of types and not as the list of all its paths.
+        self.types = []
+        self.type_ids = {}
+        self.global_types = {}
+
+        start = time.perf_counter()
+        self.load()
+        self.build_seconds = time.perf_counter() - start
+
+        # Names that can be found under each type (see reachable_names)
+        self.reachable_names_cache = {}
+
+    def log(self, message):
+        if self.log_enabled:
+            with open('log/' + self.log_file_name, 'a') as f:
+                print(message, file=f)
+        print(message)
+
+    # The references to the global elements are followed when the graph is walked (see child_type), so each global element
+    # is parsed once, in any order. Only the types are kept: the parsed schema is released at the end of the load.
+    def load(self):
+        root = ET.parse(self.xsd_file).getroot()
+        for element in root.findall(f'{self.XSD_NAMESPACE}element'):
+            self.global_types[element.get('name')] = self.get_element_type(element)
+
+    # Type id of an element declaration
+    def get_element_type(self, element):
+        complex_type = element.find(f'{self.XSD_NAMESPACE}complexType')
+        if complex_type is None:
+            return self.LEAF_TYPE
+
+        children = []
+        self.collect_children(complex_type, children)
+        children = tuple(children)
+        if children not in self.type_ids:
+            self.type_ids[children] = len(self.types)
+            self.types.append(children)
+        return self.type_ids[children]
+
+    # Flatten the sequences and choices of a content model into its list of child elements
+    def collect_children(self, node, children):
+        for child in node:
+            if child.tag == f'{self.XSD_NAMESPACE}element':
+                if child.get('ref') is not None:
+                    children.append((child.get('ref'), None, child.get('ref')))
+                else:
+                    children.append((child.get('name'), self.get_element_type(child), None))
+            elif child.tag in (f'{self.XSD_NAMESPACE}sequence', f'{self.XSD_NAMESPACE}choice', f'{self.XSD_NAMESPACE}all'):
+                self.collect_children(child, children)
+
+    # Type id of a child, following the reference to a global element
+    def child_type(self, child):
+        name, type_id, ref = child
+        if ref is not None:
+            return self.global_types[ref]
+        return type_id
+
+    def root_type(self, root):
+        if root not in self.global_types:
+            raise ValueError(f"The element '{root}' is not a global element of '{self.xsd_file}'. Global elements: {', '.join(self.global_types)}.")
+        return self.global_types[root]
+
+    # Lazily enumerate the paths under the root element, in schema order. A global element is not expanded again under itself
+    # (e.g. Shipment/OrderLevel/PackLevel/ItemLevel/PackLevel is expanded, but not PackLevel under that second PackLevel), so
+    # the enumeration ends even though the schema is recursive. "prune" is called with (path nodes, type id) before expanding
+    # a node and can return False to skip the node and all its descendants. The paths are yielded as lists of nodes.
+    def iter_paths(self, root='Shipment', prune=None):
+        root_type = self.root_type(root)
+        stack = [([root], root_type, iter(self.types[root_type]) if root_type != self.LEAF_TYPE else iter(()), (root,))]
+        yield [root]
+        while len(stack) > 0:
+            nodes, type_id, children, refs = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                continue
+
+            name, _, ref = child
+            if ref is not None and ref in refs:
+                continue
+            child_nodes = nodes + [name]
+            child_type = self.child_type(child)
+            if prune is not None and not prune(child_nodes, child_type):
+                continue
+            yield child_nodes
+            if child_type != self.LEAF_TYPE:
+                child_refs = refs + (ref,) if ref is not None else refs
+                stack.append((child_nodes, child_type, iter(self.types[child_type]), child_refs))
+
+    # Expand all the paths (only on request: this is what the path lists of path_extracts/ contain)
+    def expand(self, root='Shipment'):
+        return [self.XPATH_SEPARATOR.join(nodes) for nodes in self.iter_paths(root)]
+
+    # Names of all the elements that can be found under a type (memoized per type)
+    def reachable_names(self, type_id):
+        if type_id == self.LEAF_TYPE:
+            return frozenset()
+        if type_id not in self.reachable_names_cache:
+            # Mark the type before computing it, because of the recursive references
+            self.reachable_names_cache[type_id] = frozenset()
+            names = set()
+            for child in self.types[type_id]:
+                names.add(child[0])
+                names.update(self.reachable_names(self.child_type(child)))
+            self.reachable_names_cache[type_id] = frozenset(names)
+        return self.reachable_names_cache[type_id]
+
+    # Same queries as extract_path.py, done lazily over the graph:
+    # all: the paths that contain only the nodes you are looking for.
+    # any: the paths that contain at least one of the nodes you are looking for.
+    # leaf: the paths whose leaf node is one of the nodes you are looking for.
+    # The subtrees that cannot contain a matching path are not expanded.
+    def query(self, nodes, mode, root='Shipment'):
+        if mode not in self.QUERY_MODES:
+            raise ValueError(f"Incorrect query mode '{mode}'. Must be one of {', '.join(self.QUERY_MODES)}.")
+        set_of_nodes = set(nodes)
+
+        if mode == 'all':
+            prune = lambda path_nodes, type_id: path_nodes[-1] in set_of_nodes
+            matches = lambda path_nodes: set(path_nodes) == set_of_nodes
+        elif mode == 'any':
+            prune = lambda path_nodes, type_id: not set_of_nodes.isdisjoint(path_nodes) or not set_of_nodes.isdisjoint(self.reachable_names(type_id))
+            matches = lambda path_nodes: not set_of_nodes.isdisjoint(path_nodes)
+        else:
+            prune = lambda path_nodes, type_id: path_nodes[-1] in set_of_nodes or not set_of_nodes.isdisjoint(self.reachable_names(type_id))
+            matches = lambda path_nodes: path_nodes[-1] in set_of_nodes
+
+        # The root itself is never pruned
+        if mode == 'all' and root not in set_of_nodes:
+            return
+        for path_nodes in self.iter_paths(root, prune):
+            if matches(path_nodes):
+                yield self.XPATH_SEPARATOR.join(path_nodes)
+
+    # Validate a target path (e.g. Shipment/Header/Address[AddressTypeCode='ST']/AddressName) against the schema. The
+    # predicates must be a child element of their node. The recursive references are allowed. Return None if the path is
+    # valid or the reason why it is not.
+    def validate_path(self, xpath):
+        nodes = re.findall(r"[^/\[]+(?:\[[^\]]*\])*", xpath)
+        if len(nodes) == 0:
+            return "Empty path"
+        root = nodes[0].split('[', 1)[0]
+        if root not in self.global_types:
+            return f"'{root}' is not a global element"
+
+        type_id = self.global_types[root]
+        for depth, node in enumerate(nodes):
+            name = node.split('[', 1)[0]
+            if depth > 0:
+                if type_id == self.LEAF_TYPE:
+                    return f"'{self.XPATH_SEPARATOR.join(nodes[:depth])}' is a leaf"
+                child = next((child for child in self.types[type_id] if child[0] == name), None)
+                if child is None:
+                    return f"'{name}' is not a child of '{self.XPATH_SEPARATOR.join(nodes[:depth])}'"
+                type_id = self.child_type(child)
+            for qualifier in re.findall(r"\[([^=\]]+)=", node):
+                if type_id == self.LEAF_TYPE or not any(child[0] == qualifier for child in self.types[type_id]):
+                    return f"The qualifier '{qualifier}' is not a child of '{self.XPATH_SEPARATOR.join(nodes[:depth + 1])}'"
+        return None
+
+    # Target paths of a JSON conversion map, or the paths of a text file (one path per line)
+    def load_paths(self, path_file):
+        if path_file.lower().endswith('.json'):
+            with open(path_file, 'r') as file:
+                return list(dict.fromkeys(target_path for target_paths in json.load(file).values() for target_path in target_paths))
+        with open(path_file, 'r') as file:
+            return [line.strip() for line in file if line.strip()]
+
+    # Main processing function
+    def process(self, mode, nodes=None, path_file=None, root='Shipment'):
+        self.log(f"Parsed '{self.xsd_file}' into {len(self.types)} types for {len(self.global_types)} global elements in {self.build_seconds:.2f} s.")
+
+        if mode == 'validate':
+            paths = self.load_paths(path_file)
+            invalid_count = 0
+            for path in paths:
+                error = self.validate_path(path)
+                if error is not None:
+                    self.log(f"Invalid path '{path}': {error}")
+                    invalid_count += 1
+            self.log(f"{len(paths)} paths of '{path_file}' validated, {invalid_count} invalid.")
+            return
+
+        os.makedirs('path_extracts', exist_ok=True)
+        if mode == 'expand':
+            output_file = f"path_extracts/{root}_from_{os.path.basename(self.xsd_file)}.txt"
+            paths = (self.XPATH_SEPARATOR.join(path_nodes) for path_nodes in self.iter_paths(root))
+        else:
+            nodes = [node.strip() for node in nodes.split(',')]
+            output_file = f"path_extracts/{mode}_{'_'.join(nodes)}_from_{os.path.basename(self.xsd_file)}.txt"
+            paths = self.query(nodes, mode, root)
+
+        start = time.perf_counter()
+        path_count = 0
+        with open(output_file, 'w') as file:
+            for path in paths:
+                print(path, file=file)
+                path_count += 1
+        self.log(f"{path_count} paths found in {time.perf_counter() - start:.2f} s. Results saved to '{output_file}'.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Query the paths of an XSD schema without expanding all of them.')
+    parser.add_argument('xsd_file', type=str, help='Path to the XSD schema, e.g., xsd/Shipments.xsd')
+    parser.add_argument('mode', type=str, choices=XsdPathGraph.QUERY_MODES + ['expand', 'validate'], help='all/any/leaf query (like extract_path.py), expansion of all the paths, or validation of paths')
+    parser.add_argument('--nodes', type=str, default=None, help='Comma separated nodes you are looking for, for the all/any/leaf queries (e.g., OrderLevel,Address)')
+    parser.add_argument('--paths', type=str, default=None, help='Paths to validate: a JSON conversion map (its target paths) or a text file with one path per line')
+    parser.add_argument('--root', type=str, default='Shipment', help='Root element of the paths (default: Shipment)')
+    parser.add_argument('--log', action='store_true', default=False, help='Will log in log subdirectory. (default: False)')
+    args = parser.parse_args()
+
+    if args.mode in XsdPathGraph.QUERY_MODES and args.nodes is None:
+        parser.error(f"--nodes is required for the '{args.mode}' query")
+    if args.mode == 'validate' and args.paths is None:
+        parser.error("--paths is required for the validation")
+
+    graph = XsdPathGraph(args.xsd_file, args.log)
+    graph.process(args.mode, args.nodes, args.paths, args.root)